@@ -1,69 +1,198 @@
-import { useState, useCallback } from 'react';
-import api from '../api';
-
-
-export const useNotifications = () => {
-  const [notifications, setNotifications] = useState([]);
-  const [unreadCount, setUnreadCount] = useState(0);
-  const [notificationAnchor, setNotificationAnchor] = useState(null);
-
-  const loadNotifications = useCallback(async () => {
-    try {
-      const response = await api.get("notifications/");
-      const notificationsData = response.data?.data || response.data;
-      const validNotifications = Array.isArray(notificationsData) ? notificationsData : [];
-      setNotifications(validNotifications);
-      const unreadAmount = validNotifications.filter(notification => !notification.read).length;
-      setUnreadCount(unreadAmount);
-    } catch (error) {
-      console.error("Error loading notifications:", error);
-      setNotifications([]);
-      setUnreadCount(0);
-    }
-  }, []);
-
-  const handleNotificationClick = useCallback(async (event) => {
-    setNotificationAnchor(event.currentTarget);
-
-    try {
-      const response = await api.get("notifications/");
-      const notificationsData = response.data?.data || response.data;
-      const freshNotifications = Array.isArray(notificationsData) ? notificationsData : [];
-      const unreadNotifications = freshNotifications.filter(notification => !notification.read);
-
-      if (unreadNotifications.length > 0) {
-        await Promise.all(
-          unreadNotifications.map(notification =>
-            api.patch(`notifications/${notification.id}/`, { read: true })
-          )
-        );
-        await loadNotifications();
-      }
-    } catch (error) {
-
-    }
-  }, [loadNotifications]);
-
-  const handleNotificationClose = useCallback(() => {
-    setNotificationAnchor(null);
-  }, []);
-
-  const markNotificationAsRead = useCallback(async (notificationId) => {
-    try {
-      await api.patch(`notifications/${notificationId}/`, { read: true });
-      await loadNotifications();
-    } catch (error) {
-
-    }
-  }, [loadNotifications]);
-
-  return {
-    notifications,
-    unreadCount,
-    notificationAnchor,
-    loadNotifications,
-    handleNotificationClick,
-    handleNotificationClose,
-    markNotificationAsRead
-  };
+import { useState, useCallback, useEffect, useRef } from 'react';
+import api from '../api';
+
+
+const MAX_NOTIFICATIONS = 100;
+const POLL_INTERVAL_MS = 30000;
+const STREAM_RECONNECT_MS = 5000;
+
+const mergeNotifications = (current, incoming) => {
+  const incomingIds = new Set(incoming.map(notification => notification.id));
+  return [...incoming, ...current.filter(notification => !incomingIds.has(notification.id))]
+    .slice(0, MAX_NOTIFICATIONS);
+};
+
+export const useNotifications = () => {
+  const [notifications, setNotifications] = useState([]);
+  const [unreadCount, setUnreadCount] = useState(0);
+  const [notificationAnchor, setNotificationAnchor] = useState(null);
+  const latestIdRef = useRef(null);
+  const notificationsRef = useRef([]);
+
+  // Keeps a ref in step with state so async handlers see the current list after an await
+  const updateNotifications = useCallback((update) => {
+    const next = typeof update === "function" ? update(notificationsRef.current) : update;
+    notificationsRef.current = next;
+    setNotifications(next);
+  }, []);
+
+  // First call downloads the latest page; later calls only fetch notifications newer than the last one seen.
+  // The starting point comes from the list itself: the summary is fetched in parallel, so a notification
+  // created between the two responses would otherwise sit below its latest_id and never be fetched
+  const loadNotifications = useCallback(async () => {
+    try {
+      if (latestIdRef.current === null) {
+        const [listResponse, summaryResponse] = await Promise.all([
+          api.get("notifications/"),
+          api.get("notifications/summary/")
+        ]);
+        const notificationsData = listResponse.data?.data || listResponse.data;
+        const validNotifications = Array.isArray(notificationsData) ? notificationsData : [];
+        updateNotifications(validNotifications);
+        setUnreadCount(summaryResponse.data?.data?.unread_count ?? 0);
+        latestIdRef.current = validNotifications.reduce((latest, notification) => Math.max(latest, notification.id), 0);
+        return;
+      }
+
+      // Deltas arrive oldest first, capped per response; keep asking from the last row until none remain
+      let since = latestIdRef.current;
+      let newNotifications = [];
+      let delta;
+      do {
+        const response = await api.get(`notifications/?since=${since}`);
+        delta = response.data?.data || {};
+        const page = Array.isArray(delta.results) ? delta.results : [];
+        newNotifications = [...page.reverse(), ...newNotifications];
+        if (!delta.latest_id || delta.latest_id <= since) {
+          break;
+        }
+        since = delta.latest_id;
+      } while (delta.has_more);
+
+      if (newNotifications.length > 0) {
+        updateNotifications(current => mergeNotifications(current, newNotifications));
+      }
+      setUnreadCount(delta.unread_count ?? 0);
+      latestIdRef.current = since;
+    } catch (error) {
+      console.error("Error loading notifications:", error);
+      latestIdRef.current = null;
+      updateNotifications([]);
+      setUnreadCount(0);
+    }
+  }, [updateNotifications]);
+
+  // Polls for new notifications, or receives them over the server-sent event stream when the
+  // server offers one (it only does under ASGI); a closed stream is reopened with a fresh ticket
+  useEffect(() => {
+    if (!localStorage.getItem("access")) {
+      return undefined;
+    }
+
+    let source = null;
+    let pollTimer = null;
+    let reconnectTimer = null;
+    let stopped = false;
+
+    const startPolling = () => {
+      pollTimer = setInterval(loadNotifications, POLL_INTERVAL_MS);
+    };
+
+    const receive = (event) => {
+      try {
+        const notification = JSON.parse(event.data);
+        const isNew = notification.id > (latestIdRef.current ?? 0);
+        updateNotifications(current => mergeNotifications(current, [notification]));
+        if (isNew && !notification.read) {
+          setUnreadCount(count => count + 1);
+        }
+        latestIdRef.current = Math.max(latestIdRef.current ?? 0, notification.id);
+      } catch (error) {
+        console.error("Error reading notification event:", error);
+      }
+    };
+
+    const connect = async () => {
+      let ticket;
+      try {
+        const response = await api.post("notifications/stream/ticket/");
+        ticket = response.data?.data?.ticket;
+      } catch (error) {
+        ticket = null;
+      }
+      if (stopped) {
+        return;
+      }
+      if (!ticket || typeof EventSource === "undefined") {
+        startPolling();
+        return;
+      }
+
+      const lastEventId = latestIdRef.current ?? 0;
+      source = new EventSource(
+        `/api/notifications/stream/?ticket=${encodeURIComponent(ticket)}&last_event_id=${lastEventId}`
+      );
+      source.addEventListener("notification", receive);
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED && !stopped) {
+          source.close();
+          reconnectTimer = setTimeout(connect, STREAM_RECONNECT_MS);
+        }
+      };
+    };
+
+    connect();
+
+    return () => {
+      stopped = true;
+      clearInterval(pollTimer);
+      clearTimeout(reconnectTimer);
+      if (source) {
+        source.close();
+      }
+    };
+  }, [loadNotifications, updateNotifications]);
+
+  const markLocallyRead = useCallback((ids) => {
+    const idSet = new Set(ids);
+    updateNotifications(current => current.map(notification =>
+      idSet.has(notification.id) ? { ...notification, read: true } : notification
+    ));
+  }, [updateNotifications]);
+
+  // Opening the menu marks only the notifications it shows; older unread ones stay unread
+  const handleNotificationClick = useCallback(async (event) => {
+    setNotificationAnchor(event.currentTarget);
+
+    try {
+      await loadNotifications();
+      const unreadIds = notificationsRef.current
+        .filter(notification => !notification.read)
+        .map(notification => notification.id);
+      if (unreadIds.length > 0) {
+        const response = await api.post("notifications/mark-read/", { ids: unreadIds });
+        const updated = response.data?.data?.updated ?? unreadIds.length;
+        markLocallyRead(unreadIds);
+        setUnreadCount(count => Math.max(0, count - updated));
+      }
+    } catch (error) {
+
+    }
+  }, [loadNotifications, markLocallyRead]);
+
+  const handleNotificationClose = useCallback(() => {
+    setNotificationAnchor(null);
+  }, []);
+
+  const markNotificationAsRead = useCallback(async (notificationId) => {
+    try {
+      const response = await api.post("notifications/mark-read/", { ids: [notificationId] });
+      if (response.data?.data?.updated) {
+        markLocallyRead([notificationId]);
+        setUnreadCount(count => Math.max(0, count - 1));
+      }
+    } catch (error) {
+
+    }
+  }, [markLocallyRead]);
+
+  return {
+    notifications,
+    unreadCount,
+    notificationAnchor,
+    loadNotifications,
+    handleNotificationClick,
+    handleNotificationClose,
+    markNotificationAsRead
+  };
 };
\ No newline at end of file
@@ -14,6 +14,7 @@ import {
 } from '@mui/material';
 import { LockOutlined as LockOutlinedIcon } from '@mui/icons-material';
 import api from "../api";
+import { decodeTokenClaims } from "../utils/common";
 
 export default function Login() {
   const [email, setEmail] = useState("");
@@ -49,31 +50,9 @@ export default function Login() {
       localStorage.setItem("access", access);
       localStorage.setItem("refresh", refresh);
 
-      await new Promise(resolve => setTimeout(resolve, 100));
-
-      let role = null;
-      try {
-        const profileResponse = await api.get("profile/");
-
-        let profileData;
-        if (profileResponse.data.success) {
-          profileData = profileResponse.data.data;
-        } else {
-          profileData = profileResponse.data;
-        }
-
-        role = profileData.role || "individual";
-        localStorage.setItem("role", role);
-      } catch (profileErr) {
-        console.error("Profile fetch error:", profileErr);
-
-        if (profileErr.response?.status === 401) {
-          throw new Error("Authentication failed - invalid token");
-        }
-
-        role = "individual";
-        localStorage.setItem("role", role);
-      }
+      // The access token carries the profile's role, so no profile request is needed here
+      const role = decodeTokenClaims(access).role || "individual";
+      localStorage.setItem("role", role);
 
       navigate("/dashboard");
     } catch (err) {
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useLocation, useNavigate } from 'react-router-dom';
 import {
   Box,
@@ -40,6 +40,8 @@ export default function People() {
   const [searchResults, setSearchResults] = useState([]);
   const [loading, setLoading] = useState(false);
   const [hasSearched, setHasSearched] = useState(false);
+  const typeaheadTimer = useRef(null);
+  const latestSearch = useRef(0);
   
 
   const [profileData, setProfileData] = useState(null);
@@ -78,7 +80,8 @@ export default function People() {
     }
   }, [location.search]);
 
-  const performSearch = async (query) => {
+  const performSearch = async (query, prefix = false) => {
+    const searchId = ++latestSearch.current;
     if (!query || query.trim().length < 1) {
       setSearchResults([]);
       setHasSearched(false);
@@ -87,21 +90,35 @@ export default function People() {
 
     setLoading(true);
     try {
-      const response = await api.get(`search/users/?q=${encodeURIComponent(query.trim())}`);
+      const mode = prefix ? '&mode=prefix' : '';
+      const response = await api.get(`search/users/?q=${encodeURIComponent(query.trim())}${mode}`);
+      if (searchId !== latestSearch.current) return;
       const extractedData = response.data?.data || response.data;
       setSearchResults(Array.isArray(extractedData) ? extractedData : []);
       setHasSearched(true);
     } catch (err) {
+      if (searchId !== latestSearch.current) return;
       console.error('Search error:', err);
       setSearchResults([]);
       setHasSearched(true);
     } finally {
-      setLoading(false);
+      if (searchId === latestSearch.current) setLoading(false);
     }
   };
 
+  const handleSearchChange = (e) => {
+    const value = e.target.value;
+    setSearchQuery(value);
+    setHasSearched(false);
+    clearTimeout(typeaheadTimer.current);
+    typeaheadTimer.current = setTimeout(() => performSearch(value, true), 200);
+  };
+
+  useEffect(() => () => clearTimeout(typeaheadTimer.current), []);
+
   const handleSearchSubmit = (e) => {
     e.preventDefault();
+    clearTimeout(typeaheadTimer.current);
     if (searchQuery.trim()) {
 
       navigate(`/people?q=${encodeURIComponent(searchQuery.trim())}`);
@@ -269,10 +286,7 @@ export default function People() {
               fullWidth
               placeholder="Search for people by name..."
               value={searchQuery}
-              onChange={(e) => {
-                setSearchQuery(e.target.value);
-                setHasSearched(false);
-              }}
+              onChange={handleSearchChange}
               InputProps={{
                 startAdornment: (
                   <InputAdornment position="start">
@@ -7,3 +7,7 @@ class ApiConfig(AppConfig):
     
     def ready(self):
         import api.signals
+        from .warmup import get_warmup_settings, warm_up
+
+        if get_warmup_settings()['ENABLED']:
+            warm_up()
@@ -0,0 +1,309 @@
+import atexit
+import itertools
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BACKGROUND': True,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,
+    'SPOOL_DIR': None,
+    'FSYNC': False,
+}
+
+
+def get_pipeline_settings():
+    return {**DEFAULTS, **getattr(settings, 'AUDIT_PIPELINE', {})}
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AuditPipeline:
+    """Buffers redemption audits in memory and writes them with bulk_create.
+
+    Every record is appended to a per-process spool file before it is buffered.
+    A flush rotates the spool into a batch segment, inserts the buffered records
+    and then removes the segment, so records survive a crash until they are
+    written. Segments left behind by failed flushes or dead processes are
+    replayed by the next flush of any live pipeline sharing the spool directory.
+    A crash between the insert and the removal replays a segment that was
+    already written, so every record carries an event id that is unique on
+    Audit and replayed duplicates are skipped. Without background, nothing
+    runs on a thread: a full batch is flushed by the record() that fills it,
+    and the rest by explicit flush() calls.
+
+    Reads of audits are eventually consistent across processes: a redemption
+    buffered by another worker shows up in redemption lists once that worker
+    flushes, normally within flush_interval. Only this process's buffer can
+    be flushed before a read.
+    """
+
+    SPOOL_SUFFIX = '.spool'
+    BATCH_SUFFIX = '.batch'
+
+    def __init__(self, spool_dir, batch_size=500, flush_interval=1.0, fsync=False, background=True):
+        self.spool_dir = Path(spool_dir)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.background = background
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._buffer = []
+        self._thread = None
+        self._pid = None
+        self._spool_file = None
+
+    # Queues one redemption audit; the spool append makes it durable before returning
+    def record(self, share_code_id, requester, requester_user_id=None, ts=None):
+        entry = {
+            'event_id': uuid.uuid4().hex,
+            'share_code_id': share_code_id,
+            'requester': requester,
+            'requester_user_id': requester_user_id,
+            'ts': (ts or timezone.now()).isoformat(),
+        }
+
+        with self._lock:
+            self._ensure_spool()
+            self._spool_file.write(json.dumps(entry) + '\n')
+            self._spool_file.flush()
+            if self.fsync:
+                os.fsync(self._spool_file.fileno())
+            self._buffer.append(entry)
+            batch_full = len(self._buffer) >= self.batch_size
+
+        if batch_full:
+            if self.background:
+                self._wakeup.set()
+            else:
+                self.flush()
+
+    # Writes every buffered and left-over spooled record, returning how many were sent to the database,
+    # including replayed duplicates it skipped
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                self._ensure_spool()
+                entries, self._buffer = self._buffer, []
+                segment = self._rotate_spool()
+
+            written = 0
+            if entries:
+                written += self._insert(entries)
+                segment.unlink()
+
+            self._claim_orphans()
+            for leftover in sorted(self.spool_dir.glob(f"{self._prefix()}-*{self.BATCH_SUFFIX}")):
+                written += self._replay(leftover)
+            return written
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    # Starts the background worker that drains the buffer on size or interval
+    def start(self):
+        with self._lock:
+            self._ensure_spool()
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-pipeline', daemon=True)
+            self._thread.start()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def stop(self, flush=True):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self._thread = None
+        if flush:
+            self.flush()
+        with self._lock:
+            if self._spool_file is not None:
+                self._spool_file.close()
+                self._spool_file = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Audit pipeline flush failed; records remain spooled")
+            finally:
+                close_old_connections()
+
+    def _prefix(self):
+        return f"audit-{self._pid}-{self._token}"
+
+    # Opens a fresh spool file, re-initialising after a fork so children never share the parent's file
+    def _ensure_spool(self):
+        if self._spool_file is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._token = uuid.uuid4().hex[:8]
+        self._sequence = itertools.count()
+        self._buffer = []
+        self._thread = None
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._spool_path = self.spool_dir / f"{self._prefix()}{self.SPOOL_SUFFIX}"
+        self._spool_file = open(self._spool_path, 'a', encoding='utf-8')
+
+    # Moves the current spool aside as a batch segment and starts a new one
+    def _rotate_spool(self):
+        self._spool_file.close()
+        segment = self._segment_path()
+        self._spool_path.rename(segment)
+        self._spool_file = open(self._spool_path, 'a', encoding='utf-8')
+        if not segment.stat().st_size:
+            segment.unlink()
+        return segment
+
+    def _segment_path(self):
+        return self.spool_dir / f"{self._prefix()}-{next(self._sequence):08d}{self.BATCH_SUFFIX}"
+
+    # Takes ownership of spool files and segments whose writer process is no longer running
+    def _claim_orphans(self):
+        for path in self.spool_dir.iterdir():
+            if path.suffix not in (self.SPOOL_SUFFIX, self.BATCH_SUFFIX):
+                continue
+            if path.name.startswith(f"{self._prefix()}-") or path == self._spool_path:
+                continue
+            try:
+                pid = int(path.name.split('-')[1])
+            except (IndexError, ValueError):
+                continue
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+            try:
+                path.rename(self._segment_path())
+            except FileNotFoundError:
+                continue
+
+    def _replay(self, segment):
+        with open(segment, encoding='utf-8') as handle:
+            entries = [json.loads(line) for line in handle if line.strip()]
+        written = self._insert(entries)
+        segment.unlink()
+        return written
+
+    # Inserts audits for share codes that still exist; codes deleted since the redemption are skipped
+    # and requesters deleted since then are recorded by email only
+    def _insert(self, entries):
+        from .models import Audit, ShareCode, User
+
+        share_code_ids = {entry['share_code_id'] for entry in entries}
+        existing_codes = set(
+            ShareCode.objects.filter(id__in=share_code_ids).values_list('id', flat=True)
+        )
+        user_ids = {entry.get('requester_user_id') for entry in entries} - {None}
+        existing_users = set(
+            User.objects.filter(id__in=user_ids).values_list('id', flat=True)
+        ) if user_ids else set()
+
+        audits = [
+            Audit(
+                share_code_id=entry['share_code_id'],
+                requester=entry['requester'],
+                requester_user_id=entry.get('requester_user_id') if entry.get('requester_user_id') in existing_users else None,
+                ts=parse_datetime(entry['ts']),
+                event_id=entry.get('event_id'),
+            )
+            for entry in entries
+            if entry['share_code_id'] in existing_codes
+        ]
+        Audit.objects.bulk_create(audits, batch_size=self.batch_size, ignore_conflicts=True)
+        return len(audits)
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+# Returns the process-wide pipeline, or None when audits are written synchronously
+def get_audit_pipeline():
+    global _pipeline
+    config = get_pipeline_settings()
+    if not config['ENABLED']:
+        return None
+
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = AuditPipeline(
+                    spool_dir=config['SPOOL_DIR'] or Path(settings.BASE_DIR) / 'audit_spool',
+                    batch_size=config['BATCH_SIZE'],
+                    flush_interval=config['FLUSH_INTERVAL'],
+                    fsync=config['FSYNC'],
+                    background=config['BACKGROUND'],
+                )
+                atexit.register(_pipeline.stop)
+    return _pipeline
+
+
+# Stops and discards the process-wide pipeline so the next use picks up current settings
+def reset_audit_pipeline(flush=True):
+    global _pipeline
+    with _pipeline_lock:
+        pipeline, _pipeline = _pipeline, None
+    if pipeline is not None:
+        atexit.unregister(pipeline.stop)
+        pipeline.stop(flush=flush)
+
+
+# Records a redemption audit through the pipeline, falling back to a direct insert when disabled
+def record_redemption(share_code, requester, requester_user=None):
+    from .models import Audit
+
+    pipeline = get_audit_pipeline()
+    if pipeline is None:
+        return Audit.objects.create(
+            share_code=share_code, requester=requester, requester_user=requester_user
+        )
+
+    if pipeline.background and not pipeline.is_running():
+        pipeline.start()
+    pipeline.record(share_code.pk, requester, requester_user_id=getattr(requester_user, 'pk', None))
+    return None
+
+
+# Makes audits buffered by this process visible to the current request before it reads them; other
+# workers' buffers are not reached, so deployments that need exact lists set AUDIT_PIPELINE['ENABLED'] False
+def flush_pending_audits():
+    pipeline = get_audit_pipeline()
+    if pipeline is None or (pipeline.background and not pipeline.is_running()):
+        return
+    try:
+        pipeline.flush()
+    except Exception:
+        logger.exception("Flush-before-read of pending audits failed")
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .hashers import check_password_hash, hash_password
+
+
+class BoundedModelBackend(ModelBackend):
+    """ModelBackend whose password hashing runs on the bounded hash pool.
+
+    The user is loaded and saved in the request thread; only the hash work
+    is handed to the pool. A hash made by an older hasher or with other
+    parameters is replaced on a successful login, which is how existing
+    PBKDF2 hashes migrate to the configured hasher.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown and known emails take about the same time
+            hash_password(password)
+            return None
+
+        is_correct, must_update = check_password_hash(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+
+        if must_update:
+            user.password = hash_password(password)
+            user.save(update_fields=['password'])
+        return user
@@ -0,0 +1,66 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .caching import instance_from_values
+
+# Profile fields copied into tokens when they are issued, so clients need not fetch the profile after
+# signing in. They are hints, not authority: refreshed access tokens carry them over unchanged
+PROFILE_CLAIMS = ('role', 'profile_completed', 'is_public_profile')
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """Authenticates reads from the access token's claims without loading the user.
+
+    On safe methods request.user is a User holding only the id and email
+    from the token. Every other field is deferred, so views that only filter
+    by the user or read its email run no authentication query. The first
+    deferred read loads the whole row and fails authentication with a 401
+    if the user was deleted or deactivated. Writes may store the user in a
+    foreign key or save rows derived from its email, so they load and check
+    the row as simplejwt does. So do views that set load_user = True because
+    they write on safe methods, tokens without an email claim, and every
+    token when CHECK_REVOKE_TOKEN is on. The trade-off: a read that
+    touches no deferred field is answered for a deleted or deactivated user,
+    with the token's email, until the access token expires.
+    """
+
+    load_user = False
+
+    def authenticate(self, request):
+        view = (getattr(request, 'parser_context', None) or {}).get('view')
+        self.load_user = request.method not in SAFE_METHODS or getattr(view, 'load_user', False)
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        # Revocation checks compare against the stored password hash, so they need the row
+        email = validated_token.get('email')
+        if email is None or self.load_user or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        user = instance_from_values(get_user_model(), {api_settings.USER_ID_FIELD: user_id, 'email': email})
+        user.refresh_from_db = partial(refresh_token_user, user, user.refresh_from_db)
+        return user
+
+
+# Loads every deferred field of a user built from token claims at once, failing authentication
+# when the row is gone or deactivated instead of surfacing DoesNotExist as a server error
+def refresh_token_user(user, refresh_from_db, using=None, fields=None):
+    if fields is not None:
+        fields = set(fields) | user.get_deferred_fields()
+    try:
+        refresh_from_db(using=using, fields=fields)
+    except user.DoesNotExist:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+    if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
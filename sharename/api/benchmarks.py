@@ -0,0 +1,545 @@
+import statistics
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+BENCHMARKS = {}
+
+
+# Registers a benchmark suite under a name usable from the run_benchmarks command
+def benchmark(name):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+# Runs a callable repeatedly and reports latency percentiles and queries per call
+def measure(label, func, iterations):
+    durations = []
+    with CaptureQueriesContext(connection) as ctx:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - start)
+
+    return {
+        'label': label,
+        'iterations': iterations,
+        'queries_per_call': len(ctx.captured_queries) / iterations if iterations else 0,
+        'mean_ms': statistics.fmean(durations) * 1000 if durations else 0.0,
+        'p50_ms': percentile(durations, 50) * 1000,
+        'p99_ms': percentile(durations, 99) * 1000,
+        'ops_per_sec': iterations / sum(durations) if sum(durations) else 0.0,
+    }
+
+
+def format_result(result):
+    return (
+        f"{result['label']:<40} "
+        f"queries/call={result['queries_per_call']:.2f}  "
+        f"mean={result['mean_ms']:.3f}ms  "
+        f"p50={result['p50_ms']:.3f}ms  "
+        f"p99={result['p99_ms']:.3f}ms  "
+        f"ops/s={result['ops_per_sec']:.0f}"
+    )
+
+
+def _create_owner(email):
+    from .models import User
+    return User.objects.create_user(email=email, password=None)
+
+
+@benchmark('redeem')
+def redeem_benchmark(iterations):
+    from django.core.cache import cache
+    from django.test import override_settings
+    from rest_framework.exceptions import NotFound
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from .audit_pipeline import flush_pending_audits
+    from .models import Context, ShareCode, Audit, ConsentRequest
+    from .services import NotificationService
+    from .response_serializers import create_success_response
+    from .views import RedeemCode
+
+    owner = _create_owner('bench-owner@example.com')
+    redeemer = _create_owner('bench-redeemer@example.com')
+    context = Context.objects.create(
+        user=owner, label='Campaign', visibility='code', given='Bench', family='Mark'
+    )
+    consent_context = Context.objects.create(
+        user=owner, label='Gated', visibility='consent', given='Bench', family='Gate'
+    )
+    code = ShareCode.objects.create(context=context).code
+    consent_code = ShareCode.objects.create(context=consent_context).code
+    ConsentRequest.objects.create(context=consent_context, requester=redeemer, status='approved')
+
+    factory = APIRequestFactory()
+
+    # Pre-change view body: ShareCode+Context, ConsentRequest, then the lazy owner load
+    class LegacyRedeemCode(RedeemCode):
+        def get(self, request, code):
+            try:
+                share_code = ShareCode.objects.select_related("context").get(code=code)
+            except ShareCode.DoesNotExist:
+                raise NotFound("Code not found")
+            context_obj = share_code.context
+            if context_obj.visibility == 'consent':
+                ConsentRequest.objects.get(
+                    context=context_obj, requester=request.user, status='approved'
+                )
+                context_obj.user.email
+            requester = request.user.email if request.user.is_authenticated else 'anon'
+            Audit.objects.create(share_code=share_code, requester=requester)
+            if request.user.is_authenticated:
+                NotificationService.create_redemption_notification(context_obj, request.user.email)
+            return create_success_response(data={"label": context_obj.label})
+
+    def runner(view):
+        def redeem(code_value, user=None):
+            request = factory.get(f'/api/codes/{code_value}/')
+            if user is not None:
+                force_authenticate(request, user=user)
+            response = view(request, code=code_value)
+            assert response.status_code == 200, response.data
+        return redeem
+
+    legacy = runner(LegacyRedeemCode.as_view())
+    redeem = runner(RedeemCode.as_view())
+
+    # Writes the audits a case buffered, so they are neither timed in nor left to the next case
+    def case(*args):
+        result = measure(*args)
+        flush_pending_audits()
+        return result
+
+    results = [
+        case('legacy code redemption', lambda: legacy(code), iterations),
+        case('legacy consent redemption', lambda: legacy(consent_code, redeemer), iterations),
+    ]
+
+    with override_settings(SHARECODE_CACHE_TIMEOUT=0):
+        cache.clear()
+        results.append(case('code redemption (cache disabled)', lambda: redeem(code), iterations))
+
+    cache.clear()
+    redeem(code)
+    redeem(consent_code, redeemer)
+    results.append(case('code redemption (cache warm)', lambda: redeem(code), iterations))
+    results.append(case(
+        'consent redemption (cache warm)', lambda: redeem(consent_code, redeemer), iterations
+    ))
+    return results
+
+
+@benchmark('sharecodes')
+def sharecode_benchmark(iterations):
+    import secrets
+    from .code_allocator import CodeAllocator
+    from .models import ALPHABET, Context, ShareCode, generate_code
+
+    owner = _create_owner('bench-codes@example.com')
+    context = Context.objects.create(user=owner, label='Minted', visibility='code', given='Bench')
+
+    # Pre-change generator: one secrets.choice call per character
+    def legacy_generate_code():
+        return "".join(secrets.choice(ALPHABET) for _ in range(8))
+
+    allocator = CodeAllocator(batch_size=max(iterations, 100), low_water=0, background=False)
+    allocator.refill()
+
+    return [
+        measure('legacy generate_code', legacy_generate_code, iterations * 10),
+        measure('generate_code', generate_code, iterations * 10),
+        measure('mint (default code)', lambda: ShareCode.objects.create(context=context), iterations),
+        measure(
+            'mint (pooled code)',
+            lambda: ShareCode.objects.create(context=context, code=allocator.allocate()),
+            iterations
+        ),
+    ]
+
+
+@benchmark('bulk-mint')
+def bulk_mint_benchmark(iterations):
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from .models import Context, ShareCode
+    from .views import BulkShareCodeCreate
+
+    owner = _create_owner('bench-bulk@example.com')
+    context = Context.objects.create(user=owner, label='Badges', visibility='code', given='Bench')
+    factory = APIRequestFactory()
+    view = BulkShareCodeCreate.as_view()
+
+    def mint(count, output):
+        request = factory.post('/api/sharecodes/bulk/', {
+            'context_id': context.id, 'count': count, 'format': output
+        }, format='json')
+        force_authenticate(request, user=owner)
+        response = view(request)
+        assert response.status_code == 201
+        b''.join(response.streaming_content)
+
+    def one_at_a_time(count):
+        for _ in range(count):
+            ShareCode.objects.create(context=context)
+
+    return [
+        measure('1k codes, one create per code', lambda: one_at_a_time(1000), 1),
+        measure('1k codes, bulk (jsonl)', lambda: mint(1000, 'jsonl'), max(1, iterations // 100)),
+        measure('100k codes, bulk (csv)', lambda: mint(100000, 'csv'), 1),
+    ]
+
+
+@benchmark('redeem-404')
+def redeem_not_found_benchmark(iterations):
+    from django.test import override_settings
+    from rest_framework.test import APIRequestFactory
+    from .code_filter import ShareCodeFilter, reset_code_filter
+    from .models import Context, ShareCode, generate_code
+    from .views import RedeemCode
+
+    owner = _create_owner('bench-404@example.com')
+    context = Context.objects.create(user=owner, label='Issued', visibility='code', given='Bench')
+    ShareCode.objects.bulk_create([ShareCode(context=context) for _ in range(50000)], batch_size=1000)
+
+    factory = APIRequestFactory()
+    view = RedeemCode.as_view()
+    unknown = [generate_code() for _ in range(iterations)]
+
+    def redeem_unknown(codes):
+        supply = iter(codes)
+
+        def redeem():
+            code = next(supply)
+            response = view(factory.get(f'/api/codes/{code}/'), code=code)
+            assert response.status_code == 404
+        return redeem
+
+    code_filter = ShareCodeFilter()
+    results = [measure('filter build (50k codes)', code_filter.build, 1)]
+    report = code_filter.report()
+    print(f"  filter memory: {report['memory_bytes'] / 1024:.1f} KiB, "
+          f"estimated false-positive rate {report['estimated_error_rate']:.4%}")
+
+    with override_settings(SHARECODE_FILTER={'ENABLED': False}):
+        results.append(measure('unknown code (no filter)', redeem_unknown(unknown), iterations))
+
+    # Catch-ups belong to the worker thread in production; inline here, they are held off while measuring
+    reset_code_filter()
+    with override_settings(SHARECODE_FILTER={'ENABLED': True, 'BACKGROUND': False, 'CATCH_UP_INTERVAL': 3600}):
+        redeem_unknown([generate_code()])()
+        results.append(measure('unknown code (filter)', redeem_unknown(unknown), iterations))
+    reset_code_filter()
+    return results
+
+
+@benchmark('expiry')
+def expiry_benchmark(iterations):
+    from datetime import timedelta
+    from django.utils import timezone
+    from .expiry import ExpirationEngine
+    from .models import Context, ShareCode
+
+    owner = _create_owner('bench-expiry@example.com')
+    now = timezone.now()
+    live = Context.objects.bulk_create(
+        [Context(user=owner, label=f'Live {i}', visibility='code', given='Bench') for i in range(20000)],
+        batch_size=1000
+    )
+    ShareCode.objects.bulk_create(
+        [ShareCode(context=context, expires_at=now + timedelta(days=30)) for context in live], batch_size=1000
+    )
+    expired = Context.objects.bulk_create(
+        [Context(user=owner, label=f'Expired {i}', visibility='code', given='Bench', auto_archive_expired=True)
+         for i in range(2000)],
+        batch_size=1000
+    )
+    ShareCode.objects.bulk_create(
+        [ShareCode(context=context, expires_at=now - timedelta(days=1)) for context in expired], batch_size=1000
+    )
+
+    first = ExpirationEngine().run_incremental()
+    print(f"  initial run: {first.processed} contexts from {first.codes_scanned} codes")
+
+    return [
+        measure('full sweep, nothing new (22k contexts)', lambda: ExpirationEngine().run(), iterations),
+        measure('incremental, nothing new (22k contexts)', lambda: ExpirationEngine().run_incremental(), iterations),
+    ]
+
+
+@benchmark('search')
+def search_benchmark(iterations):
+    from django.db.models import Q
+    from .models import Profile, User
+    from .prefix_index import ProfilePrefixIndex
+    from .search import build_search_text, rebuild_search_index, search_profiles
+
+    first_names = ['John', 'Maria', 'Chen', 'Aisha', 'Lukas', 'Sofia', 'Omar', 'Ines']
+    last_names = ['Doe', 'Garcia', 'Wang', 'Okafor', 'Muller', 'Rossi', 'Haddad', 'Silva']
+    users = User.objects.bulk_create(
+        [User(email=f'bench-search-{i}@example.com') for i in range(100000)],
+        batch_size=1000
+    )
+    profiles = []
+    for i, user in enumerate(users):
+        profile = Profile(
+            user=user, role='individual', is_public_profile=i % 2 == 0,
+            first_name=first_names[i % 8], last_name=f'{last_names[i // 8 % 8]}{i}',
+        )
+        profile.search_text = build_search_text(profile, user.email)
+        profiles.append(profile)
+    Profile.objects.bulk_create(profiles, batch_size=1000)
+    # bulk_create skips the signals that maintain the full-text index
+    rebuild_search_index()
+
+    def legacy(query):
+        return list(Profile.objects.filter(is_public_profile=True).filter(
+            Q(first_name__icontains=query) | Q(last_name__icontains=query) |
+            Q(user__email__istartswith=query) | Q(company_name__icontains=query)
+        ).select_related('user')[:20])
+
+    results = [
+        measure('icontains scan, rare term (100k)', lambda: legacy('wang4242'), iterations),
+        measure('trigram index, rare term (100k)', lambda: search_profiles('wang4242'), iterations),
+        measure('icontains scan, common term (100k)', lambda: legacy('john'), iterations),
+        measure('trigram index, common term (100k)', lambda: search_profiles('john'), iterations),
+    ]
+
+    index = ProfilePrefixIndex(refresh_interval=3600, background=False)
+    results.append(measure('prefix index build (100k)', index.build, 1))
+    report = index.report()
+    print(f"  prefix index: {report['tokens']} tokens, {report['memory_bytes'] / 1024 / 1024:.1f} MiB "
+          f"for {report['profiles']} public profiles ({report['bytes_per_profile']:.0f} bytes each)")
+    results += [
+        measure('icontains scan, typeahead "wan" (100k)', lambda: legacy('wan'), iterations),
+        measure('prefix index, typeahead "wan" (100k)', lambda: index.search('wan'), iterations),
+        measure('prefix index, typeahead "john wang42" (100k)', lambda: index.search('john wang42'), iterations),
+    ]
+    return results
+
+
+@benchmark('country')
+def country_benchmark(iterations):
+    import pycountry
+    from .countries import CountryIndex, get_country_index, normalize_country_name
+
+    inputs = ['United States', 'germany', 'UK', 'Bavaria', 'cote d', 'New Zealand', 'Testcountry', 'Ontario']
+
+    def cycle(func):
+        supply = iter(range(iterations))
+
+        def call():
+            value = inputs[next(supply) % len(inputs)]
+            try:
+                func(value)
+            except LookupError:
+                pass
+        return call
+
+    results = [measure('search_fuzzy', cycle(pycountry.countries.search_fuzzy), iterations)]
+    index = CountryIndex()
+    results.append(measure('country index build', CountryIndex, 1))
+    results.append(measure('country index, uncached', cycle(index.search), iterations))
+    get_country_index()
+    normalize_country_name.cache_clear()
+    results.append(measure('country index, LRU cached', cycle(normalize_country_name), iterations))
+    return results
+
+
+@benchmark('startup')
+def startup_benchmark(iterations):
+    import os
+    import subprocess
+    import sys
+    from django.conf import settings
+
+    setup = (
+        "import os, django; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sharename.settings'); "
+        "django.setup(); import api.urls"
+    )
+
+    def run(*args, env=None):
+        def call():
+            subprocess.run(
+                [sys.executable, *args], cwd=settings.BASE_DIR, env={**os.environ, **(env or {})},
+                check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+        return call
+
+    return [
+        measure('import api.urls', run('-c', setup), iterations),
+        measure('import api.urls (warm-up on)', run('-c', setup, env={'SHARENAME_WARMUP': '1'}), iterations),
+        measure('handle_expired_contexts --help', run('manage.py', 'handle_expired_contexts', '--help'), iterations),
+    ]
+
+
+@benchmark('validators')
+def validators_benchmark(iterations):
+    from rest_framework import serializers
+    from . import models
+    from .validators import CommonValidators
+
+    cases = [
+        ('phone', CommonValidators.validate_phone_number, '+14155550100'),
+        ('phone, local fallback', CommonValidators.validate_phone_number, '(415) 555-0100'),
+        ('name, single token', CommonValidators.validate_name_field, 'maria'),
+        ('name, several tokens', CommonValidators.validate_name_field, "jean-pierre o'neil"),
+        ('name, accented', CommonValidators.validate_name_field, 'josé'),
+        ('country', CommonValidators.validate_country_name, 'germany'),
+        ('company name', CommonValidators.validate_company_name, 'Acme & Sons (Europe) Ltd.'),
+        ('website', CommonValidators.validate_website_url, 'example.com/about'),
+        ('founding year', CommonValidators.validate_founding_year, 1999),
+        ('text', CommonValidators.validate_text_field, 'A short biography. ' * 10),
+        ('email', CommonValidators.validate_email_field, 'Maria.Garcia@example.com'),
+        ('password', CommonValidators.validate_password_strength, 'Correct-Horse-9'),
+        ('context label', CommonValidators.validate_context_label, 'Work contacts-2024'),
+        ('model name chars', models.validate_name_chars, "Jean-Pierre O'Neil"),
+        ('model country chars', models.validate_country_chars, 'New Zealand'),
+        ('model company chars', models.validate_company_name_chars, 'Acme & Sons (Europe) Ltd.'),
+        ('model label chars', models.validate_context_label_chars, 'Work contacts-2024'),
+    ]
+
+    def call(func, value):
+        def validate():
+            try:
+                func(value)
+            except serializers.ValidationError:
+                pass
+        return validate
+
+    results = []
+    for label, func, value in cases:
+        call(func, value)()
+        results.append(measure(label, call(func, value), iterations))
+    return results
+
+
+@benchmark('phone')
+def phone_benchmark(iterations):
+    from .models import Profile
+    from .serializers_modules.profile_serializers import PersonalDetailsSerializer
+    from .validators import normalize_phone_number
+
+    uncached = normalize_phone_number.__wrapped__
+    results = [
+        measure('international number, uncached', lambda: uncached('+49 30 1234567'), iterations),
+        measure('national number, no region', lambda: uncached('(030) 1234567'), iterations),
+        measure('national number, region DE', lambda: uncached('(030) 1234567', 'DE'), iterations),
+        measure('national number, LRU cached', lambda: normalize_phone_number('(030) 1234567', 'DE'), iterations),
+    ]
+
+    owner = _create_owner('bench-phone@example.com')
+    profile = Profile.objects.get(user=owner)
+    profile.country = 'Germany'
+    profile.phone = '+49301234567'
+    profile.save()
+    numbers = iter(f'(030) {1000000 + i}' for i in range(iterations))
+
+    def patch(phone):
+        serializer = PersonalDetailsSerializer(profile, data={'phone': phone()}, partial=True)
+        assert serializer.is_valid(), serializer.errors
+
+    results += [
+        measure('PATCH phone, unchanged', lambda: patch(lambda: '+49301234567'), iterations),
+        measure('PATCH phone, new number', lambda: patch(lambda: next(numbers)), iterations),
+    ]
+    return results
+
+
+@benchmark('login')
+def login_benchmark(iterations):
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+    from django.contrib.auth.hashers import make_password
+    from django.test import override_settings
+    from rest_framework.test import APIRequestFactory
+    from .hashers import reset_hash_pool
+    from .models import User
+    from .views import CustomTokenObtainPairView
+
+    factory = APIRequestFactory()
+    view = CustomTokenObtainPairView.as_view()
+    password = 'Bench-Pass-123!'
+
+    def login(email):
+        def call():
+            response = view(factory.post('/api/token/', {'email': email, 'password': password}, format='json'))
+            assert response.status_code == 200, response.status_code
+        return call
+
+    profiles = [
+        ('PBKDF2 720k iterations', ['django.contrib.auth.hashers.PBKDF2PasswordHasher']),
+        ('tuned scrypt', ['api.hashers.TunedScryptPasswordHasher']),
+    ]
+    cores = os.cpu_count() or 1
+    results = []
+    for index, (label, hashers) in enumerate(profiles):
+        with override_settings(PASSWORD_HASHERS=hashers):
+            email = f'bench-login-{index}@example.com'
+            User.objects.create(email=email, password=make_password(password))
+            reset_hash_pool()
+            result = measure(f'login, {label}', login(email), iterations)
+            results.append(result)
+            print(f"  {label}: {result['ops_per_sec'] / cores:.1f} logins/s per core ({cores} cores)")
+
+    # A burst larger than the pool and its queue: excess logins get 503 instead of waiting
+    with override_settings(PASSWORD_HASHING={'WORKERS': 2, 'QUEUE_SIZE': 4, 'TIMEOUT': 10}):
+        reset_hash_pool()
+        email = 'bench-login-1@example.com'
+
+        def burst_login(_):
+            response = view(factory.post('/api/token/', {'email': email, 'password': password}, format='json'))
+            return response.status_code
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            codes = list(executor.map(burst_login, range(32)))
+        print(f"  burst of 32 concurrent logins, 2 workers + 4 queued: "
+              f"{codes.count(200)} succeeded, {codes.count(503)} shed with 503")
+    reset_hash_pool()
+    return results
+
+
+@benchmark('auth')
+def auth_benchmark(iterations):
+    from rest_framework.test import APIRequestFactory
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from .authentication import StatelessJWTAuthentication
+    from .models import Notification
+    from .serializers import CustomTokenObtainPairSerializer
+    from .views import MyProfileView, NotificationSummaryView, PersonalDetailsView
+
+    owner = _create_owner('bench-auth@example.com')
+    Notification.objects.bulk_create([
+        Notification(user=owner, title='Bench', message='Bench notification') for _ in range(20)
+    ])
+    token = str(CustomTokenObtainPairSerializer.get_token(owner).access_token)
+    factory = APIRequestFactory()
+
+    def get(view_class, authentication, path):
+        view = view_class.as_view(authentication_classes=[authentication])
+
+        def call():
+            response = view(factory.get(path, HTTP_AUTHORIZATION=f'Bearer {token}'))
+            assert response.status_code == 200, response.status_code
+        return call
+
+    results = []
+    for label, view_class, path in (
+        ('profile', MyProfileView, '/api/profile/'),
+        ('personal details', PersonalDetailsView, '/api/personal-details/'),
+        ('notification summary', NotificationSummaryView, '/api/notifications/summary/'),
+    ):
+        results.append(measure(f'{label}, JWTAuthentication', get(view_class, JWTAuthentication, path), iterations))
+        results.append(measure(f'{label}, stateless', get(view_class, StatelessJWTAuthentication, path), iterations))
+    return results
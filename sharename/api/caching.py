@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Context, ShareCode, User
+
+
+# Builds a model instance from a partial set of column values; any other field is deferred
+# and loaded from the database only if it is accessed
+def instance_from_values(model, values):
+    field_names = [f.attname for f in model._meta.concrete_fields if f.attname in values]
+    return model.from_db(DEFAULT_DB_ALIAS, field_names, [values[name] for name in field_names])
+
+
+class ShareCodeCache:
+    """Read-through cache of what a redemption needs to know about a code.
+
+    The cached entry holds the code, its context and owner, so a warm lookup
+    runs no query. Expiry is checked against the cached expires_at at
+    redemption time, so it needs no invalidation. Revocation and every other
+    change go through the ShareCode, Context and User signals, which delete
+    the affected entries now and again on commit. Invalidation reaches other
+    workers only through a shared cache backend (Redis, Memcached); with the
+    default per-process cache, another worker keeps serving its entry,
+    revoked or not, for up to SHARECODE_CACHE_TIMEOUT. Writes that skip
+    signals (queryset.update(), raw SQL) must call invalidate themselves.
+    """
+
+    KEY_PREFIX = 'sharecode_meta'
+
+    # Columns needed to redeem a code: the code itself, its context and the context owner
+    FIELDS = (
+        'id', 'code', 'expires_at', 'revoked',
+        'context_id', 'context__label', 'context__given', 'context__family',
+        'context__visibility', 'context__notify_on_redeem',
+        'context__user_id', 'context__user__email',
+    )
+
+    @classmethod
+    def key(cls, code):
+        return f"{cls.KEY_PREFIX}:{code}"
+
+    @staticmethod
+    def timeout():
+        return getattr(settings, 'SHARECODE_CACHE_TIMEOUT', 300)
+
+    # Returns a hydrated ShareCode (with context and owner attached) or None if the code does not exist
+    @classmethod
+    def get(cls, code):
+        key = cls.key(code)
+        meta = cache.get(key)
+
+        if meta is None:
+            meta = cls.load(code)
+            if meta is None:
+                return None
+            cache.set(key, meta, cls.timeout())
+
+        return cls.hydrate(meta)
+
+    # Resolves code -> context -> owner with a single joined query
+    @classmethod
+    def load(cls, code):
+        return ShareCode.objects.filter(code=code).values(*cls.FIELDS).first()
+
+    # Builds model instances from cached metadata without touching the database
+    @staticmethod
+    def hydrate(meta):
+        owner = instance_from_values(User, {
+            'id': meta['context__user_id'],
+            'email': meta['context__user__email'],
+        })
+        context = instance_from_values(Context, {
+            'id': meta['context_id'],
+            'user_id': meta['context__user_id'],
+            'label': meta['context__label'],
+            'given': meta['context__given'],
+            'family': meta['context__family'],
+            'visibility': meta['context__visibility'],
+            'notify_on_redeem': meta['context__notify_on_redeem'],
+        })
+        context.user = owner
+
+        share_code = instance_from_values(ShareCode, {
+            'id': meta['id'],
+            'context_id': meta['context_id'],
+            'code': meta['code'],
+            'expires_at': meta['expires_at'],
+            'revoked': meta['revoked'],
+        })
+        share_code.context = context
+        return share_code
+
+    @classmethod
+    def invalidate(cls, *codes):
+        keys = [cls.key(code) for code in codes if code]
+        if keys:
+            cache.delete_many(keys)
+
+    # Drops cached metadata for every code belonging to the given contexts
+    @classmethod
+    def invalidate_contexts(cls, context_ids):
+        codes = ShareCode.objects.filter(context_id__in=context_ids).values_list('code', flat=True)
+        cls.invalidate(*codes)
+
+    # Drops cached metadata for every code owned by the given user
+    @classmethod
+    def invalidate_owner(cls, user_id):
+        codes = ShareCode.objects.filter(context__user_id=user_id).values_list('code', flat=True)
+        cls.invalidate(*codes)
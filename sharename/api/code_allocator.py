@@ -0,0 +1,213 @@
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BATCH_SIZE': 1000,
+    'LOW_WATER': 200,
+    'BACKGROUND': True,
+}
+
+# Candidate codes checked against the database per query, below SQLite's parameter limit
+LOOKUP_CHUNK = 500
+
+
+def get_pool_settings():
+    return {**DEFAULTS, **getattr(settings, 'SHARE_CODE_POOL', {})}
+
+
+class CodeAllocator:
+    """Hands out pre-generated share codes that were unused when the batch was made.
+
+    Codes are generated in batches, de-duplicated in memory and checked against
+    the database with one query per chunk. allocate() pops from the pool in O(1);
+    once the pool drops below the low-water mark it is refilled, by a background
+    thread when one is enabled or inline otherwise. Another process can still mint
+    the same code in the meantime, so callers must treat IntegrityError as a retry.
+    """
+
+    def __init__(self, batch_size=1000, low_water=200, background=True, generator=None):
+        self.batch_size = batch_size
+        self.low_water = low_water
+        self.background = background
+        self.generator = generator
+
+        self._lock = threading.Lock()
+        self._refill_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pool = deque()
+        self._thread = None
+        self._pid = os.getpid()
+        self.refills = 0
+        self.rejected = 0
+
+    def allocate(self):
+        self._check_fork()
+        with self._lock:
+            code = self._pool.popleft() if self._pool else None
+            remaining = len(self._pool)
+
+        if code is None:
+            self.refill()
+            with self._lock:
+                code = self._pool.popleft() if self._pool else None
+            if code is None:
+                return self._generate()
+            remaining = len(self._pool)
+
+        if remaining < self.low_water:
+            self._request_refill()
+        return code
+
+    # Takes count codes at once: pooled codes first, then fresh unused batches generated for the request
+    def allocate_many(self, count):
+        self._check_fork()
+        with self._lock:
+            taken = min(count, len(self._pool))
+            codes = [self._pool.popleft() for _ in range(taken)]
+
+        seen = set(codes)
+        while len(codes) < count:
+            for code in self._unused_batch(count - len(codes)):
+                if code not in seen:
+                    seen.add(code)
+                    codes.append(code)
+
+        if self.available() < self.low_water:
+            self._request_refill()
+        return codes[:count]
+
+    def available(self):
+        with self._lock:
+            return len(self._pool)
+
+    def stats(self):
+        return {'available': self.available(), 'refills': self.refills, 'rejected': self.rejected}
+
+    # Tops the pool up with one batch of codes that are unique in memory and unused in the database
+    def refill(self):
+        with self._refill_lock:
+            # Another caller may have refilled while this one waited for the lock
+            if self.available() > self.low_water:
+                return 0
+            batch = self._unused_batch(self.batch_size)
+            with self._lock:
+                known = set(self._pool)
+                fresh = [code for code in batch if code not in known]
+                self._pool.extend(fresh)
+            self.refills += 1
+            return len(fresh)
+
+    def clear(self):
+        with self._lock:
+            self._pool.clear()
+
+    def stop(self):
+        self.background = False
+        self._wakeup.set()
+
+    def _unused_batch(self, size):
+        from .models import ShareCode
+
+        candidates = set()
+        while len(candidates) < size:
+            candidates.update(self._generate() for _ in range(size - len(candidates)))
+
+        candidates = list(candidates)
+        unused = []
+        for start in range(0, len(candidates), LOOKUP_CHUNK):
+            chunk = candidates[start:start + LOOKUP_CHUNK]
+            taken = set(ShareCode.objects.filter(code__in=chunk).values_list('code', flat=True))
+            self.rejected += len(taken)
+            unused.extend(code for code in chunk if code not in taken)
+        return unused
+
+    def _generate(self):
+        if self.generator is not None:
+            return self.generator()
+        from .models import generate_code
+        return generate_code()
+
+    def _request_refill(self):
+        if not self.background:
+            self.refill()
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='share-code-allocator', daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        from django.db import close_old_connections
+
+        while self.background:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if not self.background:
+                return
+            try:
+                self.refill()
+            except Exception:
+                logger.exception("Share code pool refill failed; codes are generated on demand")
+            finally:
+                close_old_connections()
+
+    # A forked child must not hand out the parent's codes, so it starts with an empty pool
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = None
+            self._wakeup = threading.Event()
+            self.clear()
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+# Returns the process-wide allocator, or None when codes are generated on demand
+def get_code_allocator():
+    global _allocator
+    config = get_pool_settings()
+    if not config['ENABLED']:
+        return None
+
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                _allocator = CodeAllocator(
+                    batch_size=config['BATCH_SIZE'],
+                    low_water=config['LOW_WATER'],
+                    background=config['BACKGROUND'],
+                )
+    return _allocator
+
+
+def reset_code_allocator():
+    global _allocator
+    with _allocator_lock:
+        allocator, _allocator = _allocator, None
+    if allocator is not None:
+        allocator.stop()
+
+
+def allocate_code():
+    allocator = get_code_allocator()
+    if allocator is None:
+        from .models import generate_code
+        return generate_code()
+    return allocator.allocate()
+
+
+def allocate_codes(count):
+    allocator = get_code_allocator()
+    if allocator is None:
+        allocator = CodeAllocator(low_water=0, background=False)
+    return allocator.allocate_many(count)
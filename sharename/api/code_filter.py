@@ -0,0 +1,261 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ERROR_RATE': 0.01,
+    'MIN_CAPACITY': 100000,
+    'REBUILD_INTERVAL': 3600,
+    'CATCH_UP_INTERVAL': 1.0,
+    'CATCH_UP_OVERLAP': 500,
+    'BACKGROUND': True,
+}
+
+
+def get_filter_settings():
+    return {**DEFAULTS, **getattr(settings, 'SHARECODE_FILTER', {})}
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing of one blake2b digest."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    # False-positive rate expected at the current fill level
+    def estimated_error_rate(self):
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    def memory_bytes(self):
+        return len(self.bits)
+
+
+class ShareCodeFilter:
+    """Membership filter over every issued ShareCode.code.
+
+    Lookups only read the current filter: a positive answer sends the code
+    down the usual cached path and a negative one is a 404 without a query.
+    Until the first build finishes every code is reported as possibly
+    present. Building, rebuilding and catching up run on one worker thread,
+    so requests never wait for them and keep using the previous filter until
+    the new one is swapped in. Codes saved in this process are added by
+    signals. Codes inserted by other processes are caught up every
+    catch_up_interval by reading rows whose id is past the highest one seen;
+    the last catch_up_overlap ids are read again so rows committed out of id
+    order are not skipped. A rebuild every rebuild_interval, or once the
+    filter is past capacity, drops deleted codes and resizes it. Without
+    background the same maintenance runs inline in the lookup that finds it
+    due, which is what tests and benchmarks on an in-memory database need.
+    """
+
+    def __init__(self, error_rate=0.01, min_capacity=100000, rebuild_interval=3600,
+                 catch_up_interval=1.0, catch_up_overlap=500, background=True):
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+        self.rebuild_interval = rebuild_interval
+        self.catch_up_interval = catch_up_interval
+        self.catch_up_overlap = catch_up_overlap
+        self.background = background
+
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._bloom = None
+        self._seen_id = 0
+        self._rebuild_due = False
+        self._built_monotonic = 0.0
+        self._caught_up_monotonic = 0.0
+        self._thread = None
+        self._pid = None
+        self.built_at = None
+
+    def might_exist(self, code):
+        if not self.background:
+            self.maintain()
+        elif not self.is_running():
+            self.start()
+        bloom = self._bloom
+        return bloom is None or code in bloom
+
+    def add(self, *codes):
+        with self._lock:
+            bloom = self._bloom
+            if bloom is None:
+                return
+            for code in codes:
+                if code:
+                    bloom.add(code)
+            if bloom.count > bloom.capacity:
+                # Past capacity the error rate climbs, so the next maintenance sizes a new filter
+                self._rebuild_due = True
+
+    # Builds the filter when it is missing or due for a rebuild, otherwise catches up when that is due
+    def maintain(self):
+        now = time.monotonic()
+        if self._bloom is None or self._rebuild_due or now - self._built_monotonic >= self.rebuild_interval:
+            self.build()
+        elif now - self._caught_up_monotonic >= self.catch_up_interval:
+            self.catch_up()
+
+    # Loads every issued code with one streamed query and swaps in a filter sized for them
+    def build(self):
+        from django.db.models import Max
+        from .models import ShareCode
+
+        with self._build_lock:
+            started = time.perf_counter()
+            seen_id = ShareCode.objects.aggregate(seen_id=Max('id'))['seen_id'] or 0
+            total = ShareCode.objects.count()
+            bloom = BloomFilter(max(self.min_capacity, total * 2), self.error_rate)
+            for code in ShareCode.objects.values_list('code', flat=True).iterator(chunk_size=10000):
+                bloom.add(code)
+
+            with self._lock:
+                self._bloom = bloom
+                self._seen_id = seen_id
+                self._rebuild_due = False
+                self._built_monotonic = time.monotonic()
+                self.built_at = time.time()
+            # Codes added to the previous filter while this one was loading are read again here
+            self.catch_up()
+            logger.info(
+                "Built share code filter: %s codes, %.1f KiB, in %.1f ms",
+                bloom.count, bloom.memory_bytes() / 1024, (time.perf_counter() - started) * 1000
+            )
+            return bloom
+
+    # Adds codes inserted since the highest id seen, re-reading the overlap; returns how many were read
+    def catch_up(self):
+        from .models import ShareCode
+
+        since = max(0, self._seen_id - self.catch_up_overlap)
+        rows = list(ShareCode.objects.filter(id__gt=since).order_by('id').values_list('id', 'code'))
+        self.add(*(code for _, code in rows))
+        with self._lock:
+            if rows:
+                self._seen_id = max(self._seen_id, rows[-1][0])
+            self._caught_up_monotonic = time.monotonic()
+        return len(rows)
+
+    # Starts the maintenance thread; a forked child starts its own
+    def start(self):
+        with self._lock:
+            if self.is_running():
+                return
+            self._pid = os.getpid()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='code-filter', daemon=True)
+            self._thread.start()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        from django.db import close_old_connections
+
+        while not self._stopped.is_set():
+            try:
+                self.maintain()
+            except Exception:
+                logger.exception("Share code filter maintenance failed; the previous filter stays in use")
+            finally:
+                close_old_connections()
+            self._stopped.wait(self.catch_up_interval)
+
+    def report(self):
+        bloom = self._bloom or self.build()
+        return {
+            'codes': bloom.count,
+            'capacity': bloom.capacity,
+            'bits': bloom.size,
+            'hashes': bloom.hashes,
+            'memory_bytes': bloom.memory_bytes(),
+            'bits_per_code': bloom.size / bloom.count if bloom.count else 0.0,
+            'target_error_rate': bloom.error_rate,
+            'estimated_error_rate': bloom.estimated_error_rate(),
+        }
+
+
+_filter = None
+_filter_lock = threading.Lock()
+
+
+# Returns the process-wide share code filter, or None when disabled
+def get_code_filter():
+    global _filter
+    config = get_filter_settings()
+    if not config['ENABLED']:
+        return None
+
+    if _filter is None:
+        with _filter_lock:
+            if _filter is None:
+                _filter = ShareCodeFilter(
+                    error_rate=config['ERROR_RATE'],
+                    min_capacity=config['MIN_CAPACITY'],
+                    rebuild_interval=config['REBUILD_INTERVAL'],
+                    catch_up_interval=config['CATCH_UP_INTERVAL'],
+                    catch_up_overlap=config['CATCH_UP_OVERLAP'],
+                    background=config['BACKGROUND'],
+                )
+    return _filter
+
+
+def reset_code_filter():
+    global _filter
+    with _filter_lock:
+        code_filter, _filter = _filter, None
+    if code_filter is not None:
+        code_filter.stop()
+
+
+# Starts building the filter off the request path, so the first lookups are not the ones that wait
+def start_code_filter():
+    code_filter = get_code_filter()
+    if code_filter is not None and code_filter.background:
+        code_filter.start()
+
+
+# False when the filter has not seen the code, answered from memory without a query; codes issued by
+# other processes are seen within CATCH_UP_INTERVAL
+def code_might_exist(code):
+    code_filter = get_code_filter()
+    return code_filter is None or code_filter.might_exist(code)
+
+
+def remember_codes(*codes):
+    code_filter = get_code_filter()
+    if code_filter is not None:
+        code_filter.add(*codes)
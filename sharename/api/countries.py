@@ -0,0 +1,162 @@
+import threading
+from bisect import bisect_right
+from functools import lru_cache
+
+# Recent validator inputs kept with their resolved country name
+CACHE_SIZE = 1024
+
+# Points pycountry's search_fuzzy awards per tier, kept so results rank identically
+EXACT_POINTS = 50
+SUBDIVISION_EXACT_POINTS = 49
+
+_SEPARATOR = '\n'
+
+
+def _fold(value):
+    from pycountry import remove_accents
+
+    return remove_accents(value.lower())
+
+
+class _PartialIndex:
+    """Lowercased names joined into one string, so a substring scan over
+    thousands of names is a handful of str.find calls instead of a Python
+    loop. Each hit is mapped back to its name by bisection on name offsets."""
+
+    def __init__(self, names):
+        self.names = names
+        self.starts = []
+        offset = 0
+        for name in names:
+            self.starts.append(offset)
+            offset += len(name) + len(_SEPARATOR)
+        self.text = _SEPARATOR.join(names)
+
+    # Yields (name index, position of the first occurrence) for every name containing query
+    def matches(self, query):
+        if not query:
+            yield from ((index, 0) for index in range(len(self.names)))
+            return
+        if _SEPARATOR in query:
+            return
+        text, starts = self.text, self.starts
+        position = text.find(query)
+        while position != -1:
+            index = bisect_right(starts, position) - 1
+            yield index, position - starts[index]
+            position = text.find(query, starts[index] + len(self.names[index]) + 1)
+
+
+class CountryIndex:
+    """Precomputed equivalent of pycountry.countries.search_fuzzy.
+
+    search_fuzzy re-lowercases and scans every country and all ~5000
+    subdivisions on each call. Here the exact tiers (country codes, names,
+    official and common names, and subdivision names and codes) are dict
+    lookups and the partial tiers are scans of prebuilt folded text. Points
+    and ordering follow search_fuzzy, so the best match is the same country.
+    """
+
+    def __init__(self):
+        import pycountry
+
+        self._countries = {country.alpha_2: country for country in pycountry.countries}
+
+        # Exact names: the first pycountry index to hold a value wins, as in Database.lookup
+        self._exact = {}
+        for values in pycountry.countries.indices.values():
+            for value, country in values.items():
+                self._exact.setdefault(value, country.alpha_2)
+
+        # Every ;-separated alternative of every subdivision field, once per field that has it
+        self._subdivision_exact = {}
+        subdivision_names = []
+        subdivision_countries = []
+        for subdivision in pycountry.subdivisions:
+            for value in subdivision._fields.values():
+                if value is None:
+                    continue
+                for alternative in set(_fold(value).split(';')):
+                    self._subdivision_exact.setdefault(alternative, []).append(subdivision.country_code)
+            subdivision_names.append(_fold(subdivision._fields.get('name')))
+            subdivision_countries.append(subdivision.country_code)
+
+        # Common name first, then official name, then comment; only the first containing field scores
+        self._country_names = [
+            (
+                country.alpha_2,
+                tuple(
+                    _fold(value)
+                    for value in (
+                        country._fields.get('name'),
+                        country._fields.get('official_name'),
+                        country._fields.get('comment'),
+                    )
+                    if value is not None
+                ),
+            )
+            for country in pycountry.countries
+        ]
+        self._subdivision_partial = _PartialIndex(subdivision_names)
+        self._subdivision_countries = subdivision_countries
+
+    # Countries matching query, best first, as search_fuzzy would rank them
+    def search(self, query):
+        from pycountry import remove_accents
+
+        query = remove_accents(query.strip().lower())
+        results = {}
+
+        def add_result(alpha_2, points):
+            results[alpha_2] = results.get(alpha_2, 0) + points
+
+        alpha_2 = self._exact.get(query)
+        if alpha_2 is not None:
+            add_result(alpha_2, EXACT_POINTS)
+
+        for alpha_2 in self._subdivision_exact.get(query, ()):
+            add_result(alpha_2, SUBDIVISION_EXACT_POINTS)
+
+        for alpha_2, names in self._country_names:
+            for name in names:
+                if query in name:
+                    add_result(alpha_2, max(5, 30 - 2 * name.find(query)))
+                    break
+
+        for index, position in self._subdivision_partial.matches(query):
+            add_result(self._subdivision_countries[index], max(1, 5 - position))
+
+        return [
+            self._countries[alpha_2]
+            for alpha_2, _ in sorted(results.items(), key=lambda item: (-item[1], item[0]))
+        ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+# Builds the index on first use; loading pycountry's databases is the expensive part
+def get_country_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = CountryIndex()
+    return _index
+
+
+# Name of the country value most likely refers to, or None when nothing matches
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_country_name(value):
+    countries = get_country_index().search(value)
+    return countries[0].name if countries else None
+
+
+# ISO 3166 alpha-2 code of the country value most likely refers to, or None; used as a phone region
+@lru_cache(maxsize=CACHE_SIZE)
+def country_code(value):
+    if not value:
+        return None
+    countries = get_country_index().search(value)
+    return countries[0].alpha_2 if countries else None
@@ -0,0 +1,222 @@
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BACKGROUND': True,
+    'TIMEOUT': 5,
+    'CACHE_TTL': 86400,
+    'UNKNOWN_TTL': 300,
+    'RESOLVER': None,
+}
+
+DELIVERABLE = 'deliverable'
+UNDELIVERABLE = 'undeliverable'
+UNKNOWN = 'unknown'
+
+
+def get_deliverability_settings():
+    return {**DEFAULTS, **getattr(settings, 'EMAIL_DELIVERABILITY', {})}
+
+
+class DeliverabilityQueue:
+    """Checks that email domains accept mail, off the request path.
+
+    Registration validates only the syntax of an address and submits the new
+    user here. The domain's MX (or A/AAAA fallback) records are then looked
+    up, by a background thread when one is enabled or inline otherwise, and
+    the outcome is stored on User.email_deliverable. Outcomes are cached per
+    domain in the Django cache, so a burst of signups on one domain costs one
+    lookup. Timeouts and resolver failures are cached briefly and leave the
+    flag unset. The queue lives in memory, so checks still queued at a
+    restart are lost; sweep_unchecked_emails finds those users again. The
+    resolver is anything with dnspython's resolve(name, rdtype), so a local
+    stub can stand in for DNS.
+    """
+
+    KEY_PREFIX = 'email_deliverability'
+
+    def __init__(self, resolver=None, timeout=5, cache_ttl=86400, unknown_ttl=300, background=True):
+        self.resolver = resolver
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.unknown_ttl = unknown_ttl
+        self.background = background
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = os.getpid()
+        self.lookups = 0
+
+    @classmethod
+    def key(cls, domain):
+        return f"{cls.KEY_PREFIX}:{domain}"
+
+    # Queues a user's address for a deliverability check
+    def submit(self, user_id, email):
+        self._check_fork()
+        if not self.background:
+            self.process(user_id, email)
+            return
+        self._queue.put((user_id, email))
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='email-deliverability', daemon=True)
+            self._thread.start()
+
+    # Processes everything queued so far in the calling thread, returning how many checks ran
+    def drain(self):
+        processed = 0
+        while True:
+            try:
+                user_id, email = self._queue.get_nowait()
+            except queue.Empty:
+                return processed
+            try:
+                self.process(user_id, email)
+                processed += 1
+            finally:
+                self._queue.task_done()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    # Flags the user with the outcome for their address, unless the address changed since it was queued
+    def process(self, user_id, email):
+        from django.utils import timezone
+        from .models import User
+
+        status, reason = self.check_domain(email.rsplit('@', 1)[-1])
+        if status == UNDELIVERABLE:
+            logger.info("Email for user %s is undeliverable: %s", user_id, reason)
+        User.objects.filter(pk=user_id, email=email).update(
+            email_deliverable={DELIVERABLE: True, UNDELIVERABLE: False}.get(status),
+            email_checked_at=timezone.now(),
+        )
+        return status
+
+    # Returns (status, reason) for a domain, from the cache when it was checked recently
+    def check_domain(self, domain):
+        domain = domain.lower()
+        key = self.key(domain)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = self._lookup(domain)
+        cache.set(key, result, self.unknown_ttl if result[0] == UNKNOWN else self.cache_ttl)
+        return result
+
+    def _lookup(self, domain):
+        from email_validator import EmailUndeliverableError
+        from email_validator.deliverability import caching_resolver, validate_email_deliverability
+
+        self.lookups += 1
+        if self.resolver is None:
+            self.resolver = caching_resolver(timeout=self.timeout)
+        try:
+            info = validate_email_deliverability(domain, domain, dns_resolver=self.resolver)
+        except EmailUndeliverableError as exc:
+            return UNDELIVERABLE, str(exc)
+        if 'unknown-deliverability' in info:
+            return UNKNOWN, info['unknown-deliverability']
+        return DELIVERABLE, ''
+
+    def stop(self):
+        self.background = False
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+
+    def _run(self):
+        from django.db import close_old_connections
+
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self.process(*item)
+            except Exception:
+                logger.exception("Email deliverability check failed; the user stays unflagged")
+            finally:
+                self._queue.task_done()
+                close_old_connections()
+
+    # A forked child starts with its own empty queue and no worker
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = None
+            self._queue = queue.Queue()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+# Returns the process-wide queue, or None when deliverability is not checked
+def get_deliverability_queue():
+    global _queue
+    config = get_deliverability_settings()
+    if not config['ENABLED']:
+        return None
+
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                resolver = None
+                if config['RESOLVER']:
+                    from django.utils.module_loading import import_string
+                    resolver = import_string(config['RESOLVER'])()
+                _queue = DeliverabilityQueue(
+                    resolver=resolver,
+                    timeout=config['TIMEOUT'],
+                    cache_ttl=config['CACHE_TTL'],
+                    unknown_ttl=config['UNKNOWN_TTL'],
+                    background=config['BACKGROUND'],
+                )
+    return _queue
+
+
+def reset_deliverability_queue():
+    global _queue
+    with _queue_lock:
+        deliverability_queue, _queue = _queue, None
+    if deliverability_queue is not None:
+        deliverability_queue.stop()
+
+
+def check_email_deliverability(user):
+    deliverability_queue = get_deliverability_queue()
+    if deliverability_queue is not None:
+        deliverability_queue.submit(user.pk, user.email)
+
+
+# Queues users whose address was never checked, for example because the process restarted with the check
+# still queued, and users whose last check was inconclusive longer than UNKNOWN_TTL ago. Returns how many
+# were queued
+def sweep_unchecked_emails(deliverability_queue, limit=None):
+    from datetime import timedelta
+    from django.db.models import Q
+    from django.utils import timezone
+    from .models import User
+
+    retry_before = timezone.now() - timedelta(seconds=deliverability_queue.unknown_ttl)
+    queryset = User.objects.filter(
+        Q(email_checked_at__isnull=True) | Q(email_deliverable__isnull=True, email_checked_at__lt=retry_before)
+    ).order_by('pk').values_list('pk', 'email')
+    if limit:
+        queryset = queryset[:limit]
+
+    queued = 0
+    for user_id, email in queryset.iterator(chunk_size=1000):
+        deliverability_queue.submit(user_id, email)
+        queued += 1
+    return queued
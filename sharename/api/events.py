@@ -0,0 +1,327 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'ENABLED': False,
+    'BROKER': 'api.events.DatabaseBroker',
+    'HEARTBEAT_INTERVAL': 15,
+    'QUEUE_SIZE': 100,
+    'REPLAY_BATCH_SIZE': 100,
+    'POLL_INTERVAL': 2,
+    'POLL_OVERLAP': 60,
+    'TICKET_MAX_AGE': 60,
+}
+
+TICKET_SALT = 'api.events.stream-ticket'
+
+
+def get_stream_settings():
+    return {**DEFAULTS, **getattr(settings, 'NOTIFICATION_STREAM', {})}
+
+
+# Streams hold their connection open, which only an ASGI server can do without tying up a worker;
+# a WSGI server would buffer the endless response and never send it
+def stream_available(request):
+    request = getattr(request, '_request', request)
+    return get_stream_settings()['ENABLED'] and isinstance(request, ASGIRequest)
+
+
+# Short-lived signed ticket that lets an EventSource, which cannot send headers, open the stream
+# without putting the long-lived access token in the URL
+def issue_stream_ticket(user_id):
+    return signing.dumps(user_id, salt=TICKET_SALT)
+
+
+# User id from a stream ticket, or None when it is forged or older than TICKET_MAX_AGE
+def read_stream_ticket(ticket):
+    try:
+        return signing.loads(ticket, salt=TICKET_SALT, max_age=get_stream_settings()['TICKET_MAX_AGE'])
+    except signing.BadSignature:
+        return None
+
+
+class Subscription:
+    """One stream's view of the broker: a bounded queue owned by the stream's event loop.
+
+    When the queue is full, further events are dropped and `overflowed` is set;
+    the stream then resynchronises from the database instead of blocking publishers.
+    """
+
+    def __init__(self, user_id, loop, maxsize):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class InMemoryBroker:
+    """Delivers events to subscribers in the current process.
+
+    Publishing is thread-safe and never blocks: events are handed to each
+    subscriber's loop with call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id, maxsize=100, loop=None):
+        subscription = Subscription(user_id, loop or asyncio.get_running_loop(), maxsize)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def has_subscribers(self, user_id):
+        return bool(self._subscriptions.get(user_id))
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # The stream's loop has closed without unsubscribing
+                self.unsubscribe(subscription)
+
+
+class DatabaseBroker(InMemoryBroker):
+    """Delivers notifications created by any process, read back from the database.
+
+    Notifications published in this process are delivered at once. A
+    background thread also polls the notifications table every
+    poll_interval for rows of users with a stream open here, so rows written
+    by other workers or by management commands arrive within one interval.
+    Each poll re-reads the last poll_overlap seconds, which catches rows
+    whose transactions committed after a later poll had already run; rows
+    already delivered are skipped.
+    """
+
+    def __init__(self, poll_interval=2, poll_overlap=60):
+        super().__init__()
+        self.poll_interval = poll_interval
+        self.poll_overlap = timedelta(seconds=poll_overlap)
+        self._delivered = {}
+        self._since = None
+        self._thread = None
+        self._pid = os.getpid()
+        self._wakeup = threading.Event()
+
+    @classmethod
+    def from_settings(cls, config):
+        return cls(poll_interval=config['POLL_INTERVAL'], poll_overlap=config['POLL_OVERLAP'])
+
+    def subscribe(self, user_id, maxsize=100, loop=None):
+        subscription = super().subscribe(user_id, maxsize=maxsize, loop=loop)
+        self._ensure_poller()
+        return subscription
+
+    def publish(self, user_id, event):
+        with self._lock:
+            if event['id'] in self._delivered:
+                return
+            self._delivered[event['id']] = timezone.now()
+        super().publish(user_id, event)
+
+    # Publishes notifications created since the previous poll, less the overlap, to local subscribers
+    def poll(self):
+        from .models import Notification
+
+        with self._lock:
+            user_ids = list(self._subscriptions)
+        started = timezone.now()
+        since = (self._since or started) - self.poll_overlap
+        self._since = started
+        if user_ids:
+            notifications = [
+                notification for notification in Notification.objects.filter(
+                    user_id__in=user_ids, created_at__gte=since
+                ).order_by('id')
+                if notification.id not in self._delivered
+            ]
+            if notifications:
+                for notification, event in zip(notifications, serialize_notifications(notifications)):
+                    self.publish(notification.user_id, dict(event))
+
+        with self._lock:
+            self._delivered = {
+                event_id: delivered_at for event_id, delivered_at in self._delivered.items()
+                if delivered_at >= since
+            }
+
+    def stop(self):
+        self._wakeup.set()
+
+    def _ensure_poller(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = None
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._wakeup.clear()
+        self._thread = threading.Thread(target=self._run, name='notification-poller', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        from django.db import close_old_connections
+
+        while not self._wakeup.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Polling for new notifications failed")
+            finally:
+                close_old_connections()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+# Returns the process-wide broker configured by NOTIFICATION_STREAM['BROKER']
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = get_stream_settings()
+                broker_class = import_string(config['BROKER'])
+                if hasattr(broker_class, 'from_settings'):
+                    _broker = broker_class.from_settings(config)
+                else:
+                    _broker = broker_class()
+    return _broker
+
+
+def reset_broker():
+    global _broker
+    with _broker_lock:
+        broker, _broker = _broker, None
+    if broker is not None and hasattr(broker, 'stop'):
+        broker.stop()
+
+
+# Serializes notifications for the stream, loading contexts in one query only for rows that need them
+def serialize_notifications(notifications):
+    from .models import Notification
+    from .serializers import NotificationSerializer
+
+    pending = [
+        notification.pk for notification in notifications
+        if notification.context_id is not None and not Notification.context.is_cached(notification)
+    ]
+    if pending:
+        loaded = Notification.objects.select_related('context').in_bulk(pending)
+        notifications = [loaded.get(notification.pk, notification) for notification in notifications]
+
+    return NotificationSerializer(notifications, many=True).data
+
+
+# Publishes saved notifications to any connected streams of their recipients
+def publish_notifications(notifications):
+    if not get_stream_settings()['ENABLED']:
+        return
+    broker = get_broker()
+    notifications = [
+        notification for notification in notifications
+        if notification.pk is not None and broker.has_subscribers(notification.user_id)
+    ]
+    if not notifications:
+        return
+
+    try:
+        events = serialize_notifications(notifications)
+    except Exception:
+        logger.exception("Failed to serialize notifications for the stream")
+        return
+
+    for notification, event in zip(notifications, events):
+        broker.publish(notification.user_id, dict(event))
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: notification\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+@sync_to_async
+def load_notifications_after(user_id, last_id, limit):
+    from .models import Notification
+
+    notifications = list(
+        Notification.objects.filter(user_id=user_id, id__gt=last_id).select_related('context').order_by('id')[:limit]
+    )
+    return serialize_notifications(notifications)
+
+
+async def notification_stream(subscription, last_event_id=0, heartbeat_interval=15, replay_batch_size=100):
+    """Yields SSE frames: a replay of rows after last_event_id, then live events and heartbeats.
+
+    The caller subscribes before starting the stream so nothing published during the
+    replay is lost; events already sent by the replay are skipped.
+    """
+    last_id = last_event_id
+    sent = deque(maxlen=1000)
+
+    async def replay():
+        nonlocal last_id
+        while True:
+            events = await load_notifications_after(subscription.user_id, last_id, replay_batch_size)
+            for event in events:
+                if event['id'] not in sent:
+                    sent.append(event['id'])
+                    yield format_event(event)
+                last_id = max(last_id, event['id'])
+            if len(events) < replay_batch_size:
+                return
+
+    yield f"retry: {int(heartbeat_interval * 1000)}\n\n"
+    async for frame in replay():
+        yield frame
+
+    while True:
+        try:
+            event = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat_interval)
+        except asyncio.TimeoutError:
+            yield ": heartbeat\n\n"
+            continue
+
+        if event['id'] not in sent:
+            sent.append(event['id'])
+            last_id = max(last_id, event['id'])
+            yield format_event(event)
+
+        if subscription.overflowed:
+            subscription.overflowed = False
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            async for frame in replay():
+                yield frame
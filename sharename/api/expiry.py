@@ -0,0 +1,319 @@
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from .leases import Lease
+from .models import Audit, Context, JobCheckpoint, Notification, ShareCode
+from .services import NotificationService
+
+
+DEFAULTS = {
+    'SHARDS': 4,
+    'LEASE_TTL': 60,
+    'CHANGE_OVERLAP': 300,
+}
+
+
+def get_expiry_settings():
+    return {**DEFAULTS, **getattr(settings, 'EXPIRY_LOCK', {})}
+
+
+class ExpirationReport:
+    def __init__(self):
+        self.batches = 0
+        self.processed = 0
+        self.archived = 0
+        self.deleted = 0
+        self.notifications = 0
+        self.skipped_shards = []
+        self.codes_scanned = 0
+        self.candidates = 0
+        self.watermark = None
+        self.timed_out = False
+        self.timings = defaultdict(float)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - start
+
+    @property
+    def total_time(self):
+        return sum(self.timings.values())
+
+
+class ExpirationEngine:
+    """Set-based processing of contexts whose share codes have expired.
+
+    Each batch costs a fixed number of queries regardless of its size: one
+    annotated select, one audit/user lookup for redeemers, one notification
+    bulk_create, one archive UPDATE and one cascading delete.
+    """
+
+    def __init__(self, batch_size=500, now=None):
+        self.batch_size = batch_size
+        self.now = now or timezone.now()
+
+    # Non-archived, unprocessed contexts with at least one code that expired before `now`
+    def expired_contexts(self):
+        expired_codes = ShareCode.objects.filter(context=OuterRef('pk'), expires_at__lt=self.now)
+        return Context.objects.filter(
+            archived=False,
+            expiration_processed=False,
+        ).annotate(
+            has_expired_code=Exists(expired_codes)
+        ).filter(has_expired_code=True)
+
+    # Processes every expired context, or only those in context_ids, batch by batch.
+    # shard=(index, count) restricts the run to contexts whose id % count == index; with a lease,
+    # it is renewed before each batch and the run stops if another worker has taken it over
+    def run(self, context_ids=None, report=None, shard=None, lease=None):
+        report = report or ExpirationReport()
+        last_pk = 0
+
+        while True:
+            if lease is not None and not lease.renew():
+                return report
+
+            with report.phase('select'):
+                queryset = self.expired_contexts().filter(pk__gt=last_pk)
+                if context_ids is not None:
+                    queryset = queryset.filter(pk__in=context_ids)
+                if shard is not None:
+                    queryset = queryset.alias(shard=Mod(F('pk'), shard[1])).filter(shard=shard[0])
+                batch = list(
+                    queryset.only('id', 'user_id', 'label', 'auto_archive_expired').order_by('pk')[:self.batch_size]
+                )
+
+            if not batch:
+                return report
+
+            with transaction.atomic():
+                self.process_batch(batch, report)
+            last_pk = batch[-1].pk
+
+            if len(batch) < self.batch_size:
+                return report
+
+    # Runs each shard under its own database lease so concurrent workers split a sweep instead of
+    # repeating it. Shards held by another worker are skipped and listed in report.skipped_shards
+    def run_sharded(self, context_ids=None, report=None, shards=None, lease_ttl=None, owner=None):
+        config = get_expiry_settings()
+        shards = shards or config['SHARDS']
+        lease_ttl = lease_ttl or config['LEASE_TTL']
+        report = report or ExpirationReport()
+
+        if context_ids is not None:
+            indexes = sorted({context_id % shards for context_id in context_ids})
+        else:
+            # Start at a random shard so workers sweeping together spread out rather than queue
+            offset = random.randrange(shards)
+            indexes = [(offset + i) % shards for i in range(shards)]
+
+        for index in indexes:
+            lease = Lease(f'expire-contexts:{index}/{shards}', ttl=lease_ttl, owner=owner)
+            with report.phase('lease'):
+                acquired = lease.acquire()
+            if not acquired:
+                report.skipped_shards.append(index)
+                continue
+            try:
+                self.run(context_ids=context_ids, report=report, shard=(index, shards), lease=lease)
+            finally:
+                lease.release()
+
+        return report
+
+    # Codes that expired before `now` and after the (expires_at, id) position, in watermark order
+    def expired_codes_after(self, position=None):
+        codes = ShareCode.objects.filter(expires_at__lt=self.now)
+        if position is not None:
+            codes = codes.filter(Q(expires_at__gt=position[0]) | Q(expires_at=position[0], id__gt=position[1]))
+        return codes.order_by('expires_at', 'id')
+
+    # Expired codes of unprocessed contexts saved since `since`, in (updated_at, id) order; these include
+    # codes whose expiry was moved behind the watermark and codes created already expired
+    def changed_codes_since(self, since, position=None):
+        codes = ShareCode.objects.filter(
+            updated_at__gte=since,
+            expires_at__lt=self.now,
+            context__archived=False,
+            context__expiration_processed=False,
+        )
+        if position is not None:
+            codes = codes.filter(Q(updated_at__gt=position[0]) | Q(updated_at=position[0], id__gt=position[1]))
+        return codes.order_by('updated_at', 'id')
+
+    # Processes only contexts whose codes expired after the persisted (expires_at, id) watermark,
+    # so a run costs in proportion to newly expired codes. The watermark advances after each batch
+    # is fully processed; a batch with a shard leased elsewhere is left for the next run. A complete
+    # run then re-scans codes saved since the previous complete run, which the watermark cannot see
+    def run_incremental(self, report=None, max_runtime=None, dry_run=False, checkpoint='expire-contexts'):
+        report = report or ExpirationReport()
+        started = time.monotonic()
+        scan_started = timezone.now()
+        complete = True
+        candidates = set()
+        position = JobCheckpoint.objects.filter(name=checkpoint).values_list('position_at', 'position_id').first()
+        if position is None or position[0] is None:
+            position = None
+
+        while True:
+            with report.phase('scan'):
+                batch = list(
+                    self.expired_codes_after(position).values_list('expires_at', 'id', 'context_id')[:self.batch_size]
+                )
+
+            if not batch:
+                break
+
+            report.codes_scanned += len(batch)
+            context_ids = {context_id for _, _, context_id in batch}
+            if dry_run:
+                candidates.update(self.expired_contexts().filter(pk__in=context_ids).values_list('pk', flat=True))
+                report.candidates = len(candidates)
+            else:
+                skipped = len(report.skipped_shards)
+                self.run_sharded(context_ids=context_ids, report=report)
+                if len(report.skipped_shards) > skipped:
+                    complete = False
+                    break
+                self.advance_checkpoint(checkpoint, batch[-1][:2])
+            position = batch[-1][:2]
+
+            if len(batch) < self.batch_size:
+                break
+            if max_runtime is not None and time.monotonic() - started >= max_runtime:
+                report.timed_out = True
+                complete = False
+                break
+
+        report.watermark = position
+        if complete:
+            self.rescan_changed_codes(f'{checkpoint}:changes', scan_started, report, dry_run, candidates)
+        return report
+
+    # Processes expired codes saved since the previous complete run, less CHANGE_OVERLAP for saves that
+    # committed late, then records this run's start. The first run only records it, since its watermark
+    # scan started from the beginning
+    def rescan_changed_codes(self, checkpoint, scan_started, report, dry_run, candidates):
+        since = JobCheckpoint.objects.filter(name=checkpoint).values_list('position_at', flat=True).first()
+        if since is not None:
+            since -= timedelta(seconds=get_expiry_settings()['CHANGE_OVERLAP'])
+            position = None
+            while True:
+                with report.phase('scan'):
+                    batch = list(
+                        self.changed_codes_since(since, position).values_list(
+                            'updated_at', 'id', 'context_id'
+                        )[:self.batch_size]
+                    )
+                if not batch:
+                    break
+
+                report.codes_scanned += len(batch)
+                context_ids = {context_id for _, _, context_id in batch}
+                if dry_run:
+                    candidates.update(self.expired_contexts().filter(pk__in=context_ids).values_list('pk', flat=True))
+                    report.candidates = len(candidates)
+                else:
+                    skipped = len(report.skipped_shards)
+                    self.run_sharded(context_ids=context_ids, report=report)
+                    if len(report.skipped_shards) > skipped:
+                        return
+                position = batch[-1][:2]
+                if len(batch) < self.batch_size:
+                    break
+
+        if not dry_run:
+            self.advance_checkpoint(checkpoint, (scan_started, 0))
+
+    # Moves the watermark forward only, so concurrent runs can never rewind it
+    @staticmethod
+    def advance_checkpoint(name, position):
+        expires_at, code_id = position
+        JobCheckpoint.objects.get_or_create(name=name)
+        JobCheckpoint.objects.filter(name=name).filter(
+            Q(position_at__isnull=True) | Q(position_at__lt=expires_at) | Q(position_at=expires_at, position_id__lt=code_id)
+        ).update(position_at=expires_at, position_id=code_id, updated_at=timezone.now())
+
+    def process_batch(self, contexts, report):
+        with report.phase('redeemers'):
+            redeemers = self.redeemers_by_context([context.pk for context in contexts])
+
+        with report.phase('notify'):
+            notifications = []
+            for context in contexts:
+                notifications.append(self.owner_notification(context))
+                for user_id in redeemers.get(context.pk, ()):
+                    if user_id != context.user_id:
+                        notifications.append(self.redeemer_notification(context, user_id))
+            Notification.objects.bulk_create(notifications, batch_size=self.batch_size)
+            NotificationService.publish(notifications)
+
+        archive_ids = [context.pk for context in contexts if context.auto_archive_expired]
+        delete_ids = [context.pk for context in contexts if not context.auto_archive_expired]
+
+        with report.phase('archive'):
+            if archive_ids:
+                Context.objects.filter(pk__in=archive_ids).update(
+                    archived=True,
+                    archived_at=timezone.now(),
+                    expiration_processed=True,
+                )
+
+        with report.phase('delete'):
+            if delete_ids:
+                Context.objects.filter(pk__in=delete_ids).delete()
+
+        report.batches += 1
+        report.processed += len(contexts)
+        report.archived += len(archive_ids)
+        report.deleted += len(delete_ids)
+        report.notifications += len(notifications)
+
+    # Maps context id -> ids of users who redeemed one of its codes, resolved in one query
+    def redeemers_by_context(self, context_ids):
+        redemptions = Audit.objects.filter(
+            share_code__context_id__in=context_ids,
+            requester_user__isnull=False,
+        ).values_list('share_code__context_id', 'requester_user_id').distinct()
+
+        redeemers = defaultdict(set)
+        for context_id, user_id in redemptions:
+            redeemers[context_id].add(user_id)
+        return redeemers
+
+    @staticmethod
+    def owner_notification(context):
+        outcome = 'It has been archived.' if context.auto_archive_expired else 'It has been deleted.'
+        return Notification(
+            user_id=context.user_id,
+            type="context_expired",
+            title=f"Context '{context.label}' has expired",
+            message=f"Your context '{context.label}' has expired and all associated codes are no longer valid. "
+                    f"{outcome}",
+            context_id=context.pk if context.auto_archive_expired else None,
+        )
+
+    @staticmethod
+    def redeemer_notification(context, user_id):
+        return Notification(
+            user_id=user_id,
+            type="context_expired",
+            title=f"Access to '{context.label}' has expired",
+            message=f"The context '{context.label}' you previously accessed has expired. "
+                    f"Your access to this information is no longer valid.",
+            context_id=context.pk if context.auto_archive_expired else None,
+        )
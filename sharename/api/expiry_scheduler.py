@@ -0,0 +1,278 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'HORIZON': 3600,
+    'RETRY_DELAY': 5,
+    'MAX_BACKOFF': 300,
+}
+
+
+def get_scheduler_settings():
+    return {**DEFAULTS, **getattr(settings, 'EXPIRY_SCHEDULER', {})}
+
+
+class ExpiryScheduler:
+    """One background thread per process that expires contexts when their codes do.
+
+    Deadlines sit in a min-heap keyed by expires_at; the thread sleeps until the
+    earliest one and then runs the expiration engine for just the contexts that
+    are due. A context already scheduled at or before a new deadline is not pushed
+    again, and any number of sweep requests made while one is pending collapse
+    into a single incremental run from the persisted watermark. Deadlines further out than the horizon are loaded
+    from the database when the horizon rolls over rather than held in memory.
+    Runs go through the engine's shard leases, so workers whose schedules
+    overlap process each context once.
+    When a run fails, the deadlines it took are put back and the thread
+    waits retry_delay, doubling up to max_backoff while failures continue.
+    Without a background thread the caller drives it with run_once().
+    """
+
+    def __init__(self, horizon=3600, retry_delay=5, max_backoff=300, background=True):
+        self.horizon = timedelta(seconds=horizon)
+        self.retry_delay = timedelta(seconds=retry_delay)
+        self.max_backoff = max_backoff
+        self.background = background
+
+        self._condition = threading.Condition()
+        self._heap = []
+        self._scheduled = {}
+        self._sweep_requested = False
+        self._horizon_end = None
+        self._thread = None
+        self._pid = None
+        self._stopped = False
+        self.runs = 0
+
+    def schedule(self, context_id, expires_at):
+        with self._condition:
+            self._ensure_thread()
+            if self._horizon_end is not None and expires_at > self._horizon_end:
+                return False
+            current = self._scheduled.get(context_id)
+            if current is not None and current <= expires_at:
+                return False
+            self._scheduled[context_id] = expires_at
+            heapq.heappush(self._heap, (expires_at, context_id))
+            self._condition.notify()
+            return True
+
+    # Requests a run over codes expired since the watermark; repeated requests before it runs coalesce
+    def request_sweep(self):
+        with self._condition:
+            self._ensure_thread()
+            self._sweep_requested = True
+            self._condition.notify()
+
+    def pending(self):
+        with self._condition:
+            return len(self._scheduled)
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    # Pops every context whose deadline has passed, dropping heap entries superseded by earlier ones
+    def due(self, now):
+        with self._condition:
+            context_ids = set()
+            while self._heap and self._heap[0][0] < now:
+                deadline, context_id = heapq.heappop(self._heap)
+                if self._scheduled.get(context_id) == deadline:
+                    del self._scheduled[context_id]
+                    context_ids.add(context_id)
+            return context_ids
+
+    # Seconds until the next deadline or horizon reload, or None to wait for a trigger
+    def _wait_time(self, now):
+        candidates = []
+        if self._heap:
+            candidates.append(self._heap[0][0])
+        if self._horizon_end is not None:
+            candidates.append(self._horizon_end)
+        if not candidates:
+            return None
+        return max(0.0, (min(candidates) - now).total_seconds())
+
+    # Loads deadlines of unprocessed contexts up to the new horizon, including those already past
+    def load_upcoming(self, now):
+        from django.db.models import Min
+        from .models import ShareCode
+
+        horizon_end = now + self.horizon
+        deadlines = ShareCode.objects.filter(
+            expires_at__isnull=False,
+            expires_at__lte=horizon_end,
+            context__archived=False,
+            context__expiration_processed=False,
+        ).values('context_id').annotate(deadline=Min('expires_at')).values_list('context_id', 'deadline')
+
+        with self._condition:
+            self._horizon_end = horizon_end
+            for context_id, deadline in deadlines:
+                current = self._scheduled.get(context_id)
+                if current is None or deadline < current:
+                    self._scheduled[context_id] = deadline
+                    heapq.heappush(self._heap, (deadline, context_id))
+
+    def run_once(self, now=None):
+        from .expiry import ExpirationEngine
+
+        now = now or timezone.now()
+        with self._condition:
+            sweep, self._sweep_requested = self._sweep_requested, False
+            reload = self._horizon_end is None or now >= self._horizon_end
+
+        if reload:
+            self.load_upcoming(now)
+
+        engine = ExpirationEngine(now=now)
+        if sweep:
+            self.due(now)
+            try:
+                report = engine.run_incremental()
+            except Exception:
+                with self._condition:
+                    self._sweep_requested = True
+                raise
+        else:
+            context_ids = self.due(now)
+            if not context_ids:
+                return None
+            try:
+                report = engine.run_sharded(context_ids=context_ids)
+            except Exception:
+                self._requeue(context_ids, now)
+                raise
+            self._retry_skipped(context_ids, report, now)
+
+        self.runs += 1
+        return report
+
+    # Puts deadlines taken by a failed run back on the heap, bypassing the horizon check
+    def _requeue(self, context_ids, deadline):
+        with self._condition:
+            for context_id in context_ids:
+                current = self._scheduled.get(context_id)
+                if current is None or deadline < current:
+                    self._scheduled[context_id] = deadline
+                    heapq.heappush(self._heap, (deadline, context_id))
+
+    # Seconds to wait after the given number of consecutive failures
+    def backoff(self, failures):
+        return min(self.max_backoff, self.retry_delay.total_seconds() * 2 ** (failures - 1))
+
+    # Contexts in shards another worker was holding are retried shortly, in case that run missed them
+    def _retry_skipped(self, context_ids, report, now):
+        from .expiry import get_expiry_settings
+
+        if not report.skipped_shards:
+            return
+        shards = get_expiry_settings()['SHARDS']
+        retry_at = now + self.retry_delay
+        for context_id in context_ids:
+            if context_id % shards in report.skipped_shards:
+                self.schedule(context_id, retry_at)
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self._condition:
+                while not self._stopped and not self._sweep_requested:
+                    timeout = self._wait_time(timezone.now()) if self._horizon_end is not None else 0
+                    if timeout == 0:
+                        break
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+
+            try:
+                self.run_once()
+                failures = 0
+            except Exception:
+                failures += 1
+                delay = self.backoff(failures)
+                logger.exception("Scheduled expiration run failed; retrying in %.0f s", delay)
+                self._sleep(delay)
+            finally:
+                close_old_connections()
+
+    # Waits out a backoff; new deadlines do not cut it short, only stop() does
+    def _sleep(self, seconds):
+        wake_at = time.monotonic() + seconds
+        with self._condition:
+            while not self._stopped:
+                remaining = wake_at - time.monotonic()
+                if remaining <= 0:
+                    return
+                self._condition.wait(remaining)
+
+    # Starts the worker on first use, and again in a forked child, which inherits no running thread
+    def _ensure_thread(self):
+        if not self.background:
+            return
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        if self._pid != os.getpid():
+            self._heap = []
+            self._scheduled = {}
+            self._horizon_end = None
+        self._pid = os.getpid()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='expiry-scheduler', daemon=True)
+        self._thread.start()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+# Returns the process-wide scheduler, or None when scheduled expiry is disabled
+def get_expiry_scheduler():
+    global _scheduler
+    config = get_scheduler_settings()
+    if not config['ENABLED']:
+        return None
+
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = ExpiryScheduler(
+                    horizon=config['HORIZON'], retry_delay=config['RETRY_DELAY'], max_backoff=config['MAX_BACKOFF']
+                )
+    return _scheduler
+
+
+def reset_expiry_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        scheduler, _scheduler = _scheduler, None
+    if scheduler is not None:
+        scheduler.stop()
+
+
+def schedule_expiry(context_id, expires_at):
+    scheduler = get_expiry_scheduler()
+    if scheduler is not None and expires_at is not None:
+        scheduler.schedule(context_id, expires_at)
+
+
+def request_expiry_sweep():
+    scheduler = get_expiry_scheduler()
+    if scheduler is not None:
+        scheduler.request_sweep()
@@ -0,0 +1,61 @@
+import re
+
+from django.core.validators import URLValidator
+
+
+class CharacterClass:
+    """Characters for which a str predicate holds, plus a few extra characters.
+
+    fullmatch(value) is all(predicate(c) or c in extra for c in value) and
+    search(value) is its any() counterpart. ASCII input, which is nearly all
+    input, is answered by one precompiled regex. Other input falls back to
+    the per-character check, because regex classes such as [^\\W\\d_]
+    disagree with str.isalpha on characters like '½'.
+    """
+
+    ASCII_RANGES = {
+        None: '',
+        str.isalpha: 'A-Za-z',
+        str.isalnum: 'A-Za-z0-9',
+        str.isdigit: '0-9',
+        str.isupper: 'A-Z',
+        str.islower: 'a-z',
+    }
+
+    def __init__(self, predicate=None, extra=''):
+        self.predicate = predicate
+        self.extra = extra
+        pattern = f'[{self.ASCII_RANGES[predicate]}{re.escape(extra)}]'
+        self._fullmatch = re.compile(f'{pattern}*').fullmatch
+        self._search = re.compile(pattern).search
+        # Without a predicate the class is just the extra characters, which the regex matches exactly
+        self._exact = predicate is None
+
+    def _matches(self, char):
+        return (self.predicate is not None and self.predicate(char)) or char in self.extra
+
+    def fullmatch(self, value):
+        if self._exact or value.isascii():
+            return self._fullmatch(value) is not None
+        return all(self._matches(char) for char in value)
+
+    def search(self, value):
+        if self._exact or value.isascii():
+            return self._search(value) is not None
+        return any(self._matches(char) for char in value)
+
+
+NAME_CHARS = CharacterClass(str.isalpha, " -'")
+COUNTRY_CHARS = CharacterClass(str.isalpha, ' -')
+COMPANY_NAME_CHARS = CharacterClass(str.isalnum, " -&.',()")
+CONTEXT_LABEL_CHARS = CharacterClass(str.isalnum, ' -_')
+PHONE_CHARS = CharacterClass(str.isdigit, ' -()+')
+
+PASSWORD_SPECIAL_CHARS = '!@#$%^&*(),.?":{}|<>'
+UPPERCASE = CharacterClass(str.isupper)
+LOWERCASE = CharacterClass(str.islower)
+DIGITS = CharacterClass(str.isdigit)
+PASSWORD_SPECIALS = CharacterClass(extra=PASSWORD_SPECIAL_CHARS)
+
+# Shared by every website check; URLValidator keeps no per-call state
+url_validator = URLValidator()
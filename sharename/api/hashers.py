@@ -0,0 +1,177 @@
+import base64
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, ScryptPasswordHasher, make_password, verify_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+# scrypt at N=2**15, r=8, p=1 takes about 105 ms and 32 MiB per hash, roughly 9.5 logins/s per core
+# on the benchmark host, twice Django's stock cost (N=2**14: 45 ms, 22 logins/s per core). Re-tune
+# with `run_benchmarks login`, which prints logins/s per core for each hasher
+DEFAULTS = {
+    'SCRYPT_WORK_FACTOR': 2 ** 15,
+    'SCRYPT_BLOCK_SIZE': 8,
+    'SCRYPT_PARALLELISM': 1,
+    'ARGON2_TIME_COST': 2,
+    'ARGON2_MEMORY_COST': 102400,
+    'ARGON2_PARALLELISM': 8,
+    'WORKERS': 2,
+    'QUEUE_SIZE': 32,
+    'TIMEOUT': 10,
+}
+
+
+def get_hashing_settings():
+    return {**DEFAULTS, **getattr(settings, 'PASSWORD_HASHING', {})}
+
+
+# Headroom over scrypt's 128·N·r·p bytes for OpenSSL's own buffers
+SCRYPT_MAXMEM_HEADROOM = 2 ** 20
+
+
+# Same "scrypt" algorithm as Django's hasher, so hashes are interchangeable; hashes made with other
+# parameters report must_update and are re-made at login
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    # Django passes maxmem=0, which leaves OpenSSL's 32 MiB limit in place and fails every hash with
+    # N·r of 2**15·8 or more, so the limit is derived from the parameters of each hash instead
+    def encode(self, password, salt, n=None, r=None, p=None):
+        self._check_encode_args(password, salt)
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(), salt=salt.encode(), n=n, r=r, p=p,
+            maxmem=128 * n * r * p + SCRYPT_MAXMEM_HEADROOM, dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash_)
+
+    @property
+    def work_factor(self):
+        return get_hashing_settings()['SCRYPT_WORK_FACTOR']
+
+    @property
+    def block_size(self):
+        return get_hashing_settings()['SCRYPT_BLOCK_SIZE']
+
+    @property
+    def parallelism(self):
+        return get_hashing_settings()['SCRYPT_PARALLELISM']
+
+
+# Needs argon2-cffi, like Django's own Argon2PasswordHasher
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return get_hashing_settings()['ARGON2_TIME_COST']
+
+    @property
+    def memory_cost(self):
+        return get_hashing_settings()['ARGON2_MEMORY_COST']
+
+    @property
+    def parallelism(self):
+        return get_hashing_settings()['ARGON2_PARALLELISM']
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins are in progress. Please try again shortly.'
+    default_code = 'password_hashing_busy'
+    wait = 1
+
+
+class HashPool:
+    """Runs password hashing on a fixed number of threads.
+
+    hashlib's scrypt and PBKDF2 release the GIL, so the workers use up to
+    that many cores while other requests keep the rest. Up to queue_size
+    more requests may wait for a worker; beyond that, or after waiting
+    longer than timeout, PasswordHashingBusy is raised so a login burst is
+    answered with 503s instead of tying up every request thread. With no
+    workers, hashing runs inline in the calling thread.
+    """
+
+    def __init__(self, workers=2, queue_size=32, timeout=10):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = None
+        self._pid = None
+        self.rejected = 0
+
+    def run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        if not self._slots.acquire(blocking=False):
+            raise self._reject()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise self._reject()
+
+    # Counts a rejection; requests reject from many threads at once
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+        return PasswordHashingBusy()
+
+    def stop(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    # Worker threads do not survive a fork, so a forked child starts its own executor
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+            return self._executor
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hash_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = get_hashing_settings()
+                _pool = HashPool(workers=config['WORKERS'], queue_size=config['QUEUE_SIZE'], timeout=config['TIMEOUT'])
+    return _pool
+
+
+def reset_hash_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.stop()
+
+
+# Hashes a new password on the pool
+def hash_password(raw_password):
+    return get_hash_pool().run(make_password, raw_password)
+
+
+# Returns (is_correct, must_update) for a stored hash, verified on the pool
+def check_password_hash(raw_password, encoded):
+    return get_hash_pool().run(verify_password, raw_password, encoded)
@@ -0,0 +1,77 @@
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+# Identifies this worker process; a forked child gets its own owner id
+def default_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Lease:
+    """A named job lease in the JobLease table that at most one worker holds at a time.
+
+    Acquiring is a single conditional UPDATE that only matches a row that is free,
+    expired or already held by this owner, so it is atomic on SQLite and Postgres
+    alike without advisory locks. A holder must renew before the TTL runs out; a
+    worker that crashes simply stops renewing and the next acquirer takes over.
+    """
+
+    def __init__(self, name, ttl=60, owner=None):
+        self.name = name
+        self.ttl = timedelta(seconds=ttl)
+        self.owner = owner or default_owner()
+        self.held = False
+
+    def acquire(self):
+        from .models import JobLease
+
+        now = timezone.now()
+        claimed = JobLease.objects.filter(name=self.name).filter(
+            Q(owner=self.owner) | Q(owner='') | Q(expires_at__lte=now)
+        ).update(owner=self.owner, expires_at=now + self.ttl, acquired_at=now)
+
+        if not claimed:
+            try:
+                with transaction.atomic():
+                    JobLease.objects.create(
+                        name=self.name, owner=self.owner, expires_at=now + self.ttl, acquired_at=now
+                    )
+                claimed = 1
+            except IntegrityError:
+                # The row exists and another worker holds it
+                claimed = 0
+
+        self.held = bool(claimed)
+        return self.held
+
+    # Extends the lease; False means it expired and another worker has taken it over
+    def renew(self):
+        from .models import JobLease
+
+        self.held = bool(JobLease.objects.filter(name=self.name, owner=self.owner).update(
+            expires_at=timezone.now() + self.ttl
+        ))
+        if not self.held:
+            logger.warning("Lost lease %s held by %s", self.name, self.owner)
+        return self.held
+
+    def release(self):
+        from .models import JobLease
+
+        JobLease.objects.filter(name=self.name, owner=self.owner).update(owner='', expires_at=timezone.now())
+        self.held = False
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        if self.held:
+            self.release()
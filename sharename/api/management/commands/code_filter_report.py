@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from api.code_filter import ShareCodeFilter, get_filter_settings
+
+
+class Command(BaseCommand):
+    help = 'Build the share code membership filter from the database and report its size and error rate'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--error-rate', type=float, help='Target false-positive rate (default: SHARECODE_FILTER setting)')
+
+    def handle(self, *args, **options):
+        config = get_filter_settings()
+        code_filter = ShareCodeFilter(
+            error_rate=options['error_rate'] or config['ERROR_RATE'],
+            min_capacity=config['MIN_CAPACITY'],
+        )
+        report = code_filter.report()
+
+        self.stdout.write(f"codes                {report['codes']}")
+        self.stdout.write(f"capacity             {report['capacity']}")
+        self.stdout.write(f"bits / hashes        {report['bits']} / {report['hashes']}")
+        self.stdout.write(f"memory               {report['memory_bytes'] / 1024:.1f} KiB "
+                          f"({report['bits_per_code']:.1f} bits per code)")
+        self.stdout.write(f"false-positive rate  target {report['target_error_rate']:.4%}, "
+                          f"estimated {report['estimated_error_rate']:.4%}")
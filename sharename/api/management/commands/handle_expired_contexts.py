@@ -1,114 +1,78 @@
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from api.models import Context, Notification, User
-
-
-class Command(BaseCommand):
-    help = 'Handle expired contexts - send notifications and archive/delete as configured'
+import time
 
-    def handle(self, *args, **options):
-        now = timezone.now()
-        processed_count = 0
-        
-
-        contexts_with_expired_codes = Context.objects.filter(
-            archived=False
-        )
-        
-        for context in contexts_with_expired_codes:
-            if context.has_expired_codes():
-                self.stdout.write(f"Processing expired context: {context.label} (ID: {context.id})")
-                
+from django.core.management.base import BaseCommand
 
-                self.send_owner_notification(context)
-                
+from api.expiry import ExpirationEngine
 
-                self.send_redeemer_notifications(context)
-                
 
-                if context.auto_archive_expired:
-                    self.archive_context(context)
-                else:
-                    self.delete_context(context)
+class Command(BaseCommand):
+    help = (
+        'Handle expired contexts - send notifications and archive/delete as configured. '
+        'Only codes that expired since the last run are considered unless --full is given'
+    )
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Codes scanned and contexts processed per batch')
+        parser.add_argument('--max-runtime', type=float, default=None, help='Stop after this many seconds; the next run resumes')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be processed without changing anything')
+        parser.add_argument('--full', action='store_true', help='Sweep every expired context, ignoring the watermark')
 
-                if not context.auto_archive_expired:
+    def handle(self, *args, **options):
+        engine = ExpirationEngine(batch_size=options['batch_size'])
+        started = time.perf_counter()
+
+        if options['full'] and options['dry_run']:
+            report = None
+            candidates = engine.expired_contexts().count()
+        elif options['full']:
+            report = engine.run_sharded()
+        else:
+            report = engine.run_incremental(max_runtime=options['max_runtime'], dry_run=options['dry_run'])
+            candidates = report.candidates
 
-                    pass
-                else:
+        elapsed = time.perf_counter() - started
 
-                    context.expiration_processed = True
-                    context.save()
+        if options['dry_run']:
+            self.stdout.write(f'Dry run: {candidates} expired contexts would be processed')
+            if report is not None:
+                self.write_throughput(report, elapsed)
+            return
 
-                processed_count += 1
-        
-        if processed_count > 0:
+        if report.processed > 0:
             self.stdout.write(
-                self.style.SUCCESS(f'Successfully processed {processed_count} expired contexts')
+                self.style.SUCCESS(
+                    f'Successfully processed {report.processed} expired contexts '
+                    f'({report.archived} archived, {report.deleted} deleted, '
+                    f'{report.notifications} notifications in {report.batches} batches)'
+                )
             )
         else:
             self.stdout.write('No expired contexts found to process')
 
-    def send_owner_notification(self, context):
-        """Send notification to context owner about expiration"""
-        try:
-            Notification.objects.create(
-                user=context.user,
-                type="context_expired",
-                title=f"Context '{context.label}' has expired",
-                message=f"Your context '{context.label}' has expired and all associated codes are no longer valid. "
-                       f"{'It has been archived.' if context.auto_archive_expired else 'It has been deleted.'}",
-                context=context if context.auto_archive_expired else None
-            )
-            self.stdout.write(f"  [OK] Sent expiration notification to owner: {context.user.username}")
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f"  [ERROR] Failed to send notification to owner {context.user.username}: {e}")
-            )
-
-    def send_redeemer_notifications(self, context):
-        """Send notifications to all users who redeemed codes for this context"""
-        redeemers = context.get_users_with_redemptions()
-        
-        for user in redeemers:
-
-            if user == context.user:
-                continue
-                
-            try:
-                Notification.objects.create(
-                    user=user,
-                    type="context_expired",
-                    title=f"Access to '{context.label}' has expired",
-                    message=f"The context '{context.label}' you previously accessed has expired. "
-                           f"Your access to this information is no longer valid.",
-                    context=context if context.auto_archive_expired else None
-                )
-                self.stdout.write(f"  [OK] Sent expiration notification to redeemer: {user.username}")
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f"  [ERROR] Failed to send notification to redeemer {user.username}: {e}")
-                )
-
-    def archive_context(self, context):
-        """Archive the context instead of deleting it"""
-        try:
-            context.archived = True
-            context.archived_at = timezone.now()
-            context.save()
-            self.stdout.write(f"  [OK] Archived context: {context.label}")
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f"  [ERROR] Failed to archive context {context.label}: {e}")
-            )
-
-    def delete_context(self, context):
-        """Delete the context entirely"""
-        try:
-            context_label = context.label
-            context.delete()
-            self.stdout.write(f"  [OK] Deleted context: {context_label}")
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f"  [ERROR] Failed to delete context {context.label}: {e}")
-            )
\ No newline at end of file
+        if report.skipped_shards:
+            shards = ', '.join(str(index) for index in sorted(set(report.skipped_shards)))
+            self.stdout.write(f'Skipped shards held by another worker: {shards}')
+        if report.timed_out:
+            self.stdout.write('Stopped at --max-runtime; the next run resumes from the watermark')
+
+        self.write_throughput(report, elapsed)
+        self.write_timings(report)
+
+    def write_throughput(self, report, elapsed):
+        """Report codes scanned and contexts processed per second, and where the watermark stands"""
+        if not report.codes_scanned and not report.processed:
+            return
+        elapsed = max(elapsed, 1e-9)
+        self.stdout.write(
+            f"  {report.codes_scanned} codes scanned ({report.codes_scanned / elapsed:.0f}/s), "
+            f"{report.processed} contexts processed ({report.processed / elapsed:.0f}/s)"
+        )
+        if report.watermark is not None:
+            expires_at, code_id = report.watermark
+            self.stdout.write(f"  watermark {expires_at.isoformat()} #{code_id}")
+
+    def write_timings(self, report):
+        """Report time spent in each phase of the run"""
+        for phase, seconds in report.timings.items():
+            self.stdout.write(f"  {phase:<10} {seconds * 1000:10.1f} ms")
+        self.stdout.write(f"  {'total':<10} {report.total_time * 1000:10.1f} ms")
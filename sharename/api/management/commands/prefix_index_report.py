@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.prefix_index import ProfilePrefixIndex
+
+
+class Command(BaseCommand):
+    help = 'Build the typeahead prefix index from the database and report its size and memory use'
+
+    def handle(self, *args, **options):
+        index = ProfilePrefixIndex()
+        started = time.perf_counter()
+        index.build()
+        elapsed = time.perf_counter() - started
+        report = index.report()
+
+        self.stdout.write(f"profiles             {report['profiles']}")
+        self.stdout.write(f"tokens               {report['tokens']}")
+        self.stdout.write(f"build time           {elapsed * 1000:.1f} ms")
+        self.stdout.write(f"memory               {report['memory_bytes'] / 1024 / 1024:.1f} MiB "
+                          f"(keys {report['key_bytes'] / 1024 / 1024:.1f}, ids {report['id_bytes'] / 1024 / 1024:.1f}, "
+                          f"results {report['entry_bytes'] / 1024 / 1024:.1f})")
+        self.stdout.write(f"per profile          {report['bytes_per_profile']:.0f} bytes "
+                          f"({report['bytes_per_profile'] * 100000 / 1024 / 1024:.1f} MiB per 100k profiles)")
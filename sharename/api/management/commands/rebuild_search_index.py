@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute profile search text and rebuild the full-text search index. Only Profile.save() keeps '
+        'the index current: queryset.update() or bulk_update() on Profile, and any change to a user\'s '
+        'email, leave it stale until this command runs'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Profiles updated per query')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        updated = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt search index ({updated} profiles updated) in {(time.perf_counter() - started) * 1000:.1f} ms'
+        ))
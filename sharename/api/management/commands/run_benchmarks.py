@@ -0,0 +1,48 @@
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.audit_pipeline import reset_audit_pipeline
+from api.benchmarks import BENCHMARKS, format_result
+from api.code_allocator import reset_code_allocator
+from api.code_filter import reset_code_filter
+
+
+class Command(BaseCommand):
+    help = 'Run performance benchmarks against a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('suites', nargs='*', help=f"Suites to run (default: all). Available: {', '.join(sorted(BENCHMARKS))}")
+        parser.add_argument('--iterations', type=int, default=200, help='Iterations per measurement')
+
+    def handle(self, *args, **options):
+        suites = options['suites'] or sorted(BENCHMARKS)
+        unknown = [name for name in suites if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f"Unknown benchmark suite(s): {', '.join(unknown)}")
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        spool_dir = tempfile.TemporaryDirectory()
+        try:
+            # Background workers cannot share the in-memory test database, so audit flushes, pool
+            # refills and share code filter builds run inline
+            pipeline = {**getattr(settings, 'AUDIT_PIPELINE', {}), 'SPOOL_DIR': spool_dir.name, 'BACKGROUND': False}
+            code_pool = {**getattr(settings, 'SHARE_CODE_POOL', {}), 'BACKGROUND': False}
+            code_filter = {**getattr(settings, 'SHARECODE_FILTER', {}), 'BACKGROUND': False}
+            with override_settings(AUDIT_PIPELINE=pipeline, SHARE_CODE_POOL=code_pool, SHARECODE_FILTER=code_filter):
+                for name in suites:
+                    self.stdout.write(self.style.MIGRATE_HEADING(f"== {name} =="))
+                    for result in BENCHMARKS[name](options['iterations']):
+                        self.stdout.write(format_result(result))
+                    reset_audit_pipeline()
+                    reset_code_allocator()
+                    reset_code_filter()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            spool_dir.cleanup()
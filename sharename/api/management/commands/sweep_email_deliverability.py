@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.email_deliverability import get_deliverability_queue, sweep_unchecked_emails
+
+
+class Command(BaseCommand):
+    help = 'Check the email deliverability of users never checked or left inconclusive, e.g. from cron after restarts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Most users checked in this run')
+
+    def handle(self, *args, **options):
+        deliverability_queue = get_deliverability_queue()
+        if deliverability_queue is None:
+            self.stdout.write('Email deliverability checks are disabled')
+            return
+
+        # The command exits when it returns, so the checks run inline rather than on a worker thread
+        deliverability_queue.stop()
+        started = time.perf_counter()
+        checked = sweep_unchecked_emails(deliverability_queue, limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} email addresses in {(time.perf_counter() - started) * 1000:.1f} ms'
+        ))
@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-17 06:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_add_expiration_processed_field'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='audit',
+            name='ts',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
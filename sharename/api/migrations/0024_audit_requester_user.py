@@ -0,0 +1,40 @@
+# Generated by Django 5.0 on 2026-10-17 06:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_requester_user(apps, schema_editor):
+    """
+    Link existing audits to the user whose email matches the requester string,
+    resolved with a single correlated UPDATE instead of one lookup per row.
+    """
+    Audit = apps.get_model('api', 'Audit')
+    User = apps.get_model('api', 'User')
+
+    Audit.objects.filter(requester_user__isnull=True).update(
+        requester_user=Subquery(
+            User.objects.filter(email=OuterRef('requester')).values('id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_audit_ts_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audit',
+            name='requester_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='redemptions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(
+            backfill_requester_user,
+            migrations.RunPython.noop
+        ),
+    ]
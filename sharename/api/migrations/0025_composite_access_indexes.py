@@ -0,0 +1,64 @@
+# Generated by Django 5.0 on 2026-10-17 06:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_audit_requester_user'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='audit',
+            name='share_code',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.sharecode'),
+        ),
+        migrations.AlterField(
+            model_name='consentrequest',
+            name='requester',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='context',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='sharecode',
+            name='context',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.context'),
+        ),
+        migrations.AddIndex(
+            model_name='audit',
+            index=models.Index(fields=['requester', '-ts', 'revoked'], name='audit_requester_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='audit',
+            index=models.Index(fields=['share_code', '-ts', 'revoked'], name='audit_code_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consentrequest',
+            index=models.Index(fields=['requester', 'status', '-created_at'], name='consent_req_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='context',
+            index=models.Index(fields=['user', 'archived'], name='context_user_archived_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', 'read'], name='notification_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sharecode',
+            index=models.Index(fields=['context', 'expires_at', 'revoked'], name='sharecode_ctx_exp_rev_idx'),
+        ),
+    ]
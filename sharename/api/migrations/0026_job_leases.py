@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-17 06:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_composite_access_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('owner', models.CharField(blank=True, max_length=100)),
+                ('expires_at', models.DateTimeField()),
+                ('acquired_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
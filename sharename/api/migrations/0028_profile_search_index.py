@@ -0,0 +1,82 @@
+# Generated by Django 5.0 on 2026-10-17 07:07
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Lowercases and strips accents; a copy of the normalization at the time of this migration
+def normalize(value):
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    return ' '.join(''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower().split())
+
+
+def backfill_search_text(apps, schema_editor):
+    """
+    Fill search_text for existing profiles: names, company and the local
+    part of the email, normalized as the signals do on save.
+    """
+    Profile = apps.get_model('api', 'Profile')
+
+    batch = []
+    for profile in Profile.objects.select_related('user').iterator(chunk_size=1000):
+        profile.search_text = normalize(' '.join([
+            profile.first_name, profile.last_name, profile.company_name, (profile.user.email or '').split('@')[0],
+        ]))
+        batch.append(profile)
+        if len(batch) >= 1000:
+            Profile.objects.bulk_update(batch, ['search_text'])
+            batch = []
+    Profile.objects.bulk_update(batch, ['search_text'])
+
+
+def create_search_index(apps, schema_editor):
+    """
+    SQLite: a standalone FTS5 table with the trigram tokenizer over public
+    profiles, written by the Profile signals. Triggers are not used because
+    SQLite drops them whenever a migration rebuilds api_profile.
+    Postgres: a pg_trgm GIN index, which serves LIKE '%term%' directly.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("CREATE VIRTUAL TABLE api_profile_search USING fts5(search_text, tokenize='trigram')")
+        schema_editor.execute(
+            "INSERT INTO api_profile_search(rowid, search_text) "
+            "SELECT id, search_text FROM api_profile WHERE is_public_profile"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX profile_search_trgm_idx ON api_profile USING gin (search_text gin_trgm_ops)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS api_profile_search")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS profile_search_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_expiry_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(
+            backfill_search_text,
+            migrations.RunPython.noop
+        ),
+        migrations.RunPython(
+            create_search_index,
+            drop_search_index
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-17 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_profile_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='email_deliverable',
+            field=models.BooleanField(blank=True, default=None, null=True),
+        ),
+    ]
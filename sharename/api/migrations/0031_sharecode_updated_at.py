@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-17 12:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_email_deliverability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sharecode',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='sharecode',
+            index=models.Index(fields=['updated_at', 'id'], name='sharecode_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_sharecode_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audit',
+            name='event_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -7,26 +7,27 @@ from django.utils import timezone
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import EmailValidator, URLValidator
-from phonenumber_field.modelfields import PhoneNumberField
-import phonenumbers
+from .field_checks import NAME_CHARS, COUNTRY_CHARS, COMPANY_NAME_CHARS, CONTEXT_LABEL_CHARS
 
 def validate_name_chars(value):
-    if value and not all(c.isalpha() or c in " -'" for c in value):
+    if value and not NAME_CHARS.fullmatch(value):
         raise ValidationError('Name can only contain letters, spaces, hyphens, and apostrophes.')
 
 def validate_country_chars(value):
-    if value and not all(c.isalpha() or c in ' -' for c in value):
+    if value and not COUNTRY_CHARS.fullmatch(value):
         raise ValidationError('Country can only contain letters, spaces, and hyphens.')
 
 def validate_company_name_chars(value):
-    if value and not all(c.isalnum() or c in " -&.',() " for c in value):
+    if value and not COMPANY_NAME_CHARS.fullmatch(value):
         raise ValidationError('Company name contains invalid characters.')
 
 def validate_context_label_chars(value):
-    if value and not all(c.isalnum() or c in ' -_' for c in value):
+    if value and not CONTEXT_LABEL_CHARS.fullmatch(value):
         raise ValidationError('Label can only contain letters, numbers, spaces, hyphens, and underscores.')
 
 ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 8
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH
 
 class Profile(models.Model):
     ROLE_CHOICES = [
@@ -98,6 +99,10 @@ class Profile(models.Model):
     company_description = models.TextField(max_length=1000, blank=True)
     
     profile_completed = models.BooleanField(default=False)
+
+    # Normalized names and email kept in sync by signals; the full-text index is built over it
+    search_text = models.TextField(blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     # Returns the appropriate display name based on user role (individual name or company name)
     def get_display_name(self):
@@ -111,13 +116,17 @@ class Profile(models.Model):
 
 
 class CustomUserManager(BaseUserManager):
-    # Creates a new user with email as the primary identifier
-    def create_user(self, email, password=None, **extra_fields):
+    # Creates a new user with email as the primary identifier; password_hash is stored as given,
+    # for callers that hashed the password already
+    def create_user(self, email, password=None, password_hash=None, **extra_fields):
         if not email:
             raise ValueError('The Email field must be set')
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
-        user.set_password(password)
+        if password_hash is not None:
+            user.password = password_hash
+        else:
+            user.set_password(password)
         user.save(using=self._db)
         return user
 
@@ -143,6 +152,9 @@ class User(AbstractUser):
         null=False,
         validators=[EmailValidator(message='Please enter a valid email address')]
     )
+    # Set by the background deliverability check; None until the domain has been looked up
+    email_deliverable = models.BooleanField(null=True, blank=True, default=None)
+    email_checked_at = models.DateTimeField(null=True, blank=True)
 
     objects = CustomUserManager()
 
@@ -171,7 +183,7 @@ class Context(models.Model):
         ("code", "Code-protected"),
         ("consent", "Consent-gate"),
     ]
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     label = models.CharField(
         max_length=40,
         validators=[validate_context_label_chars]
@@ -193,6 +205,11 @@ class Context(models.Model):
     archived_at = models.DateTimeField(null=True, blank=True)
     expiration_processed = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'archived'], name='context_user_archived_idx'),
+        ]
+
     # Checks if this context has any expired share codes that haven't been processed yet
     def has_expired_codes(self):
         from django.utils import timezone
@@ -211,36 +228,42 @@ class Context(models.Model):
     
     # Finds all users who have redeemed codes for this context
     def get_users_with_redemptions(self):
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-
-        audits = Audit.objects.filter(share_code__context=self)
-
-        user_ids = []
-        for audit in audits:
-            if hasattr(audit, 'requester') and audit.requester:
-                try:
-                    user = User.objects.get(email=audit.requester)
-                    user_ids.append(user.id)
-                except User.DoesNotExist:
-                    continue
-
-        return User.objects.filter(id__in=user_ids).distinct()
+        return User.objects.filter(redemptions__share_code__context=self).distinct()
 
     def __str__(self):
         return f"{self.user.email}/{self.label}"
 
 
-# Generates a random 8-character alphanumeric share code
+# Generates a random 8-character alphanumeric share code from a single draw over the whole keyspace
 def generate_code() -> str:
-    return "".join(secrets.choice(ALPHABET) for _ in range(8))
+    value = secrets.randbelow(CODE_SPACE)
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, index = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[index])
+    return "".join(chars)
 
 
 class ShareCode(models.Model):
-    context = models.ForeignKey(Context, on_delete=models.CASCADE)
+    context = models.ForeignKey(Context, on_delete=models.CASCADE, db_index=False)
     code = models.CharField(max_length=8, default=generate_code, unique=True)
     expires_at = models.DateTimeField(null=True, blank=True)
     revoked = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['context', 'expires_at', 'revoked'], name='sharecode_ctx_exp_rev_idx'),
+            models.Index(fields=['expires_at', 'id'], name='sharecode_expires_idx'),
+            models.Index(fields=['updated_at', 'id'], name='sharecode_updated_idx'),
+        ]
+
+    # Remembers the code as loaded so cache entries for a changed code can be invalidated
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_code = instance.__dict__.get('code')
+        return instance
 
     # Checks if the share code is still valid (not revoked and not expired)
     def valid(self):
@@ -253,10 +276,27 @@ class ShareCode(models.Model):
 
 
 class Audit(models.Model):
-    share_code = models.ForeignKey(ShareCode, on_delete=models.CASCADE)
+    share_code = models.ForeignKey(ShareCode, on_delete=models.CASCADE, db_index=False)
     requester = models.CharField(max_length=120, default="anon")
-    ts = models.DateTimeField(auto_now_add=True)
+    requester_user = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='redemptions'
+    )
+    ts = models.DateTimeField(default=timezone.now, editable=False)
     revoked = models.BooleanField(default=False)
+    # Set by the audit pipeline so a replayed spool segment cannot insert the same redemption twice
+    event_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+
+    # Boolean flags go last: SQLite compiles flag=False to NOT flag, which cannot match an index
+    # column by equality, so a leading flag would stop the index serving the ORDER BY
+    class Meta:
+        indexes = [
+            models.Index(fields=['requester', '-ts', 'revoked'], name='audit_requester_ts_idx'),
+            models.Index(fields=['share_code', '-ts', 'revoked'], name='audit_code_ts_idx'),
+        ]
 
 
 class ConsentRequest(models.Model):
@@ -267,7 +307,7 @@ class ConsentRequest(models.Model):
     ]
     
     context = models.ForeignKey(Context, on_delete=models.CASCADE)
-    requester = models.ForeignKey(User, on_delete=models.CASCADE)
+    requester = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
     message = models.TextField(
         blank=True,
@@ -278,6 +318,9 @@ class ConsentRequest(models.Model):
     
     class Meta:
         unique_together = ('context', 'requester')
+        indexes = [
+            models.Index(fields=['requester', 'status', '-created_at'], name='consent_req_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.requester.email} -> {self.context.label} ({self.status})"
@@ -293,7 +336,7 @@ class Notification(models.Model):
         ("context_expired", "Context Expired"),
     ]
     
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     type = models.CharField(max_length=20, choices=TYPE_CHOICES)
     title = models.CharField(max_length=100)
     message = models.TextField()
@@ -303,6 +346,29 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', 'read'], name='notification_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.title}"
+
+
+class JobLease(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    owner = models.CharField(max_length=100, blank=True)
+    expires_at = models.DateTimeField()
+    acquired_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.owner or 'free'})"
+
+
+class JobCheckpoint(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    position_at = models.DateTimeField(null=True, blank=True)
+    position_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position_at} #{self.position_id}"
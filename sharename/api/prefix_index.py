@@ -0,0 +1,316 @@
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+
+from .search import normalize_search_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'REFRESH_INTERVAL': 1.0,
+    'REFRESH_OVERLAP': 60,
+    'REBUILD_INTERVAL': 300,
+    'BACKGROUND': True,
+}
+
+
+def get_prefix_index_settings():
+    return {**DEFAULTS, **getattr(settings, 'PROFILE_PREFIX_INDEX', {})}
+
+
+# The tokens a public profile is found by: words of its display name and its email.
+# Tokens are interned so a name shared by many profiles is stored once
+def profile_tokens(profile, email):
+    words = set(normalize_search_text(profile.get_display_name()).split()) | {email.lower()}
+    return tuple(sorted(sys.intern(word) for word in words))
+
+
+ENTRY_FIELDS = ('id', 'email', 'display_name', 'role', 'profile_picture')
+
+
+# Kept as a tuple in the index, which costs far less per profile than a dict
+def profile_entry(profile, email):
+    return (
+        profile.user_id,
+        email,
+        profile.get_display_name(),
+        profile.role,
+        profile.profile_picture.url if profile.profile_picture else None,
+    )
+
+
+class ProfilePrefixIndex:
+    """Typeahead index over public profiles, answered entirely from memory.
+
+    The trie is flattened into two parallel sorted arrays, token keys and
+    profile ids, so every node's subtree is one contiguous range found by
+    bisection. This keeps one pointer per token instead of a dict per
+    character. Each profile also keeps the search result it renders to.
+    Profiles saved in this process are re-indexed by signals. Changes made by
+    other processes are picked up by re-reading profiles whose updated_at
+    moved, at most once per refresh interval. Each refresh re-reads the last
+    refresh_overlap seconds again, so a save committed after a later one is
+    not skipped. Deletes leave no row to re-read, so the index is rebuilt
+    from scratch every rebuild_interval, which bounds how long a profile
+    deleted by another process stays listed. Builds and refreshes run on one
+    worker thread and read the database without holding the index lock;
+    only swapping in the new arrays or applying the changed rows takes it,
+    so searches keep reading the current snapshot meanwhile. Without
+    background the same maintenance runs inline in the search that finds
+    it due.
+    """
+
+    def __init__(self, refresh_interval=1.0, refresh_overlap=60, rebuild_interval=300, background=True):
+        self.refresh_interval = refresh_interval
+        self.refresh_overlap = refresh_overlap
+        self.rebuild_interval = rebuild_interval
+        self.background = background
+
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._keys = []
+        self._ids = []
+        self._entries = {}
+        self._tokens = {}
+        self._built = False
+        self._seen_until = None
+        self._last_refresh = 0.0
+        self._last_build = 0.0
+
+    # Returns None until the first build has finished, so callers can answer from the database instead
+    def search(self, query, limit=20):
+        if not self.background:
+            self.maintain()
+        elif not self.is_running():
+            self.start()
+        if not self._built:
+            return None
+        terms = normalize_search_text(query).split()
+        if not terms:
+            return []
+
+        # Walk the range of the longest term; other terms must prefix one of the profile's tokens
+        anchor = max(terms, key=len)
+        others = [term for term in terms if term is not anchor]
+        results = []
+        seen = set()
+        with self._lock:
+            position = bisect_left(self._keys, anchor)
+            while position < len(self._keys) and self._keys[position].startswith(anchor):
+                profile_id = self._ids[position]
+                position += 1
+                if profile_id in seen:
+                    continue
+                seen.add(profile_id)
+                tokens = self._tokens[profile_id]
+                if all(any(token.startswith(term) for token in tokens) for term in others):
+                    results.append(dict(zip(ENTRY_FIELDS, self._entries[profile_id])))
+                    if len(results) >= limit:
+                        break
+        return results
+
+    # Indexes a public profile, or drops it when it is private
+    def update(self, profile, email=None):
+        if not self._built:
+            return
+        email = email if email is not None else profile.user.email
+        with self._lock:
+            self._remove(profile.pk)
+            if profile.is_public_profile:
+                self._add(profile.pk, profile_tokens(profile, email), profile_entry(profile, email))
+
+    def remove(self, profile_id):
+        if not self._built:
+            return
+        with self._lock:
+            self._remove(profile_id)
+
+    def _add(self, profile_id, tokens, entry):
+        for token in tokens:
+            position = bisect_left(self._keys, token)
+            self._keys.insert(position, token)
+            self._ids.insert(position, profile_id)
+        self._tokens[profile_id] = tokens
+        self._entries[profile_id] = entry
+
+    def _remove(self, profile_id):
+        tokens = self._tokens.pop(profile_id, None)
+        if tokens is None:
+            return
+        self._entries.pop(profile_id, None)
+        for token in tokens:
+            position = bisect_left(self._keys, token)
+            while position < len(self._keys) and self._keys[position] == token:
+                if self._ids[position] == profile_id:
+                    del self._keys[position]
+                    del self._ids[position]
+                    break
+                position += 1
+
+    # Rebuilds the index when it is missing or due, otherwise refreshes it when that is due. Returns
+    # at once when another thread is already maintaining the index
+    def maintain(self):
+        if not self._build_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if not self._built or now - self._last_build >= self.rebuild_interval:
+                self._build()
+            elif now - self._last_refresh >= self.refresh_interval:
+                self._refresh()
+        finally:
+            self._build_lock.release()
+
+    def build(self):
+        with self._build_lock:
+            self._build()
+
+    def refresh(self):
+        with self._build_lock:
+            self._refresh()
+
+    # Loads every public profile with one streamed query and swaps in freshly sorted arrays
+    def _build(self):
+        from django.utils import timezone
+        from .models import Profile
+
+        started = timezone.now()
+        pairs = []
+        entries = {}
+        tokens_by_profile = {}
+        queryset = Profile.objects.filter(is_public_profile=True).select_related('user')
+        for profile in queryset.iterator(chunk_size=2000):
+            email = profile.user.email
+            tokens = profile_tokens(profile, email)
+            tokens_by_profile[profile.pk] = tokens
+            entries[profile.pk] = profile_entry(profile, email)
+            pairs.extend((token, profile.pk) for token in tokens)
+        pairs.sort()
+
+        with self._lock:
+            self._keys = [token for token, _ in pairs]
+            self._ids = [profile_id for _, profile_id in pairs]
+            self._entries = entries
+            self._tokens = tokens_by_profile
+            self._seen_until = started
+            self._last_refresh = self._last_build = time.monotonic()
+            self._built = True
+
+    # Re-indexes profiles other processes changed since the last build or refresh, less the overlap
+    def _refresh(self):
+        from django.utils import timezone
+        from .models import Profile
+
+        started = timezone.now()
+        self._last_refresh = time.monotonic()
+        since = self._seen_until - timedelta(seconds=self.refresh_overlap)
+        changed = list(Profile.objects.filter(updated_at__gte=since).select_related('user'))
+        with self._lock:
+            for profile in changed:
+                self.update(profile, profile.user.email)
+            self._seen_until = started
+
+    # Starts the maintenance thread; a forked child starts its own
+    def start(self):
+        with self._lock:
+            if self.is_running():
+                return
+            self._pid = os.getpid()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='prefix-index', daemon=True)
+            self._thread.start()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        from django.db import close_old_connections
+
+        while not self._stopped.is_set():
+            try:
+                self.maintain()
+            except Exception:
+                logger.exception("Prefix index maintenance failed; the current snapshot stays in use")
+            finally:
+                close_old_connections()
+            self._stopped.wait(self.refresh_interval)
+
+    def report(self):
+        if not self._built:
+            self.build()
+        with self._lock:
+            unique_keys = {id(key): key for key in self._keys}.values()
+            key_bytes = sys.getsizeof(self._keys) + sum(sys.getsizeof(key) for key in unique_keys)
+            id_bytes = sys.getsizeof(self._ids) + sum(sys.getsizeof(pk) for pk in set(self._ids))
+            entry_bytes = sys.getsizeof(self._entries) + sys.getsizeof(self._tokens) + sum(
+                sys.getsizeof(entry) + sum(sys.getsizeof(value) for value in entry)
+                + sys.getsizeof(self._tokens[pk])
+                for pk, entry in self._entries.items()
+            )
+            profiles = len(self._entries)
+            total = key_bytes + id_bytes + entry_bytes
+            return {
+                'profiles': profiles,
+                'tokens': len(self._keys),
+                'key_bytes': key_bytes,
+                'id_bytes': id_bytes,
+                'entry_bytes': entry_bytes,
+                'memory_bytes': total,
+                'bytes_per_profile': total / profiles if profiles else 0.0,
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+# Returns the process-wide prefix index, or None when typeahead falls back to the database
+def get_prefix_index():
+    global _index
+    config = get_prefix_index_settings()
+    if not config['ENABLED']:
+        return None
+
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ProfilePrefixIndex(
+                    refresh_interval=config['REFRESH_INTERVAL'],
+                    refresh_overlap=config['REFRESH_OVERLAP'],
+                    rebuild_interval=config['REBUILD_INTERVAL'],
+                    background=config['BACKGROUND'],
+                )
+    return _index
+
+
+def reset_prefix_index():
+    global _index
+    with _index_lock:
+        index, _index = _index, None
+    if index is not None:
+        index.stop()
+
+
+def index_profile(profile):
+    index = get_prefix_index()
+    if index is not None:
+        index.update(profile)
+
+
+def forget_profile(profile_id):
+    index = get_prefix_index()
+    if index is not None:
+        index.remove(profile_id)
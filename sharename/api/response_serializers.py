@@ -1,7 +1,10 @@
 
+from django.db.models import Q
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed, NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class StandardResponseSerializer(serializers.Serializer):
@@ -43,6 +46,131 @@ class StandardPagination(PageNumberPagination):
         return timezone.now().isoformat()
 
 
+class KeysetPagination(StandardPagination):
+    """Page-number pagination with an opt-in keyset mode.
+
+    Passing ?cursor= (empty for the first page) switches to keyset pagination
+    over the view's cursor_ordering, e.g. ('-ts', '-id'). Each page is a single
+    indexed range query: no OFFSET scan and no COUNT(*) unless ?count=true is
+    given. Keyset pages only move forward through the returned next cursor.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    default_cursor_ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = tuple(getattr(view, 'cursor_ordering', self.default_cursor_ordering))
+        position = self.decode_cursor(request.query_params[self.cursor_query_param], queryset.model)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes'):
+            self.count = queryset.count()
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(position))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.has_previous = position is not None
+        results = results[:self.page_size]
+
+        self.next_cursor = None
+        if self.has_next:
+            self.next_cursor = self.encode_cursor([
+                getattr(results[-1], field.lstrip('-')) for field in self.ordering
+            ])
+        return results
+
+    # Rows strictly after the position in cursor order: (a < x) or (a = x and b < y) ...
+    def keyset_filter(self, position):
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {prior.lstrip('-'): value for prior, value in zip(self.ordering[:index], position[:index])}
+            condition |= Q(**equal, **{f'{name}__{lookup}': position[index]})
+        return condition
+
+    # Datetimes keep full precision (DjangoJSONEncoder would truncate to milliseconds and break the tie-break)
+    def encode_cursor(self, values):
+        import base64
+        import json
+
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+        payload = json.dumps(values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    # Each value is checked against its ordering field, so a crafted cursor is a 404 rather than a
+    # database error
+    def decode_cursor(self, cursor, model):
+        import base64
+        import binascii
+        import json
+        from django.core.exceptions import FieldDoesNotExist, ValidationError
+
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound('Invalid cursor')
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+
+        position = []
+        for field_name, value in zip(self.ordering, values):
+            if not isinstance(value, (str, int)) or isinstance(value, bool):
+                raise NotFound('Invalid cursor')
+            try:
+                field = model._meta.get_field(field_name.lstrip('-'))
+                value = field.to_python(value)
+                field.run_validators(value)
+            except (FieldDoesNotExist, ValidationError, TypeError, ValueError, OverflowError):
+                raise NotFound('Invalid cursor')
+            if value is None:
+                raise NotFound('Invalid cursor')
+            position.append(value)
+        return position
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+
+        return Response({
+            'success': True,
+            'data': data,
+            'pagination': {
+                'count': self.count,
+                'pages': None,
+                'current_page': None,
+                'page_size': self.page_size,
+                'next': self.get_next_link(),
+                'previous': None,
+                'has_next': self.has_next,
+                'has_previous': self.has_previous,
+                'next_cursor': self.next_cursor
+            },
+            'timestamp': self.get_timestamp()
+        })
+
+
 def create_success_response(data=None, message=None, status_code=200):
     from django.utils import timezone
     from rest_framework.response import Response
@@ -167,6 +295,9 @@ class RetrieveResponseMixin:
                 data=serializer.data,
                 message="Retrieved successfully"
             )
+        # Claims-built users are checked on first load, which can happen here; that stays a 401
+        except AuthenticationFailed:
+            raise
         except Exception as e:
             return create_error_response(
                 message="Resource not found",
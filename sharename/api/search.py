@@ -0,0 +1,158 @@
+import unicodedata
+
+from django.db import connection
+
+# Shortest term the trigram index can match; shorter terms are filtered on the joined row
+TRIGRAM_MIN_LENGTH = 3
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Matches ranked per query; bm25 costs one evaluation per match, so very common terms rank a
+# bounded window of candidates instead of every row that contains them
+RANK_WINDOW = 1000
+
+FTS_TABLE = 'api_profile_search'
+
+
+# Lowercases and strips accents so "José" and "jose" index and match alike
+def normalize_search_text(value):
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    return ' '.join(''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower().split())
+
+
+# The denormalized text a profile is found by: its names, company and the local part of the email
+def build_search_text(profile, email=None):
+    if email is None:
+        email = profile.user.email
+    return normalize_search_text(' '.join([
+        profile.first_name, profile.last_name, profile.company_name, (email or '').split('@')[0],
+    ]))
+
+
+def search_terms(query):
+    return [term.split('@')[0] or term for term in normalize_search_text(query).split()]
+
+
+def clamp_limit(value):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+# Returns up to `limit` public profiles matching every term, best match first
+def search_profiles(query, limit=DEFAULT_LIMIT):
+    from .models import Profile
+
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    if connection.vendor == 'sqlite':
+        ids = _sqlite_ranked_ids(terms, limit)
+    elif connection.vendor == 'postgresql':
+        ids = _postgres_ranked_ids(terms, limit)
+    else:
+        ids = None
+
+    if ids is None:
+        return list(_substring_queryset(terms)[:limit])
+
+    profiles = Profile.objects.filter(is_public_profile=True).select_related('user').in_bulk(ids)
+    return [profiles[pk] for pk in ids if pk in profiles]
+
+
+# Ranks trigram FTS5 matches with bm25; None when no term is long enough to use the index
+def _sqlite_ranked_ids(terms, limit, window=RANK_WINDOW):
+    indexed = [term for term in terms if len(term) >= TRIGRAM_MIN_LENGTH]
+    if not indexed:
+        return None
+
+    match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in indexed)
+    short = [term for term in terms if len(term) < TRIGRAM_MIN_LENGTH]
+    extra = ''.join(" AND search_text LIKE %s ESCAPE '\\'" for _ in short)
+    params = [match, *(f'%{_escape_like(term)}%' for term in short), max(window, limit), limit]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM ("
+            f"SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s{extra} LIMIT %s"
+            f") ORDER BY rank, rowid LIMIT %s",
+            params,
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+# pg_trgm serves the substring filter from its GIN index and ranks by similarity
+def _postgres_ranked_ids(terms, limit):
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    queryset = _substring_queryset(terms).annotate(
+        similarity=TrigramSimilarity('search_text', ' '.join(terms))
+    ).order_by('-similarity', 'id')
+    return list(queryset.values_list('id', flat=True)[:limit])
+
+
+def _substring_queryset(terms):
+    from .models import Profile
+
+    queryset = Profile.objects.filter(is_public_profile=True)
+    for term in terms:
+        queryset = queryset.filter(search_text__contains=term)
+    return queryset.select_related('user').order_by('id')
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+# Keeps the SQLite full-text row of one profile in step with it; only public profiles are indexed.
+# Postgres needs nothing here, as its trigram index is on the column itself
+def update_search_index(profile):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [profile.pk])
+        if profile.is_public_profile:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (%s, %s)", [profile.pk, profile.search_text]
+            )
+
+
+def remove_from_search_index(profile_id):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [profile_id])
+
+
+# Recomputes search_text for every profile and rebuilds the full-text index from it
+def rebuild_search_index(batch_size=1000):
+    from .models import Profile
+
+    updated = 0
+    queryset = Profile.objects.select_related('user').only(
+        'id', 'first_name', 'last_name', 'company_name', 'search_text', 'user__email'
+    ).order_by('id')
+    batch = []
+    for profile in queryset.iterator(chunk_size=batch_size):
+        text = build_search_text(profile)
+        if text != profile.search_text:
+            profile.search_text = text
+            batch.append(profile)
+        if len(batch) >= batch_size:
+            updated += Profile.objects.bulk_update(batch, ['search_text'])
+            batch = []
+    if batch:
+        updated += Profile.objects.bulk_update(batch, ['search_text'])
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}(rowid, search_text) "
+                f"SELECT id, search_text FROM api_profile WHERE is_public_profile"
+            )
+    return updated
@@ -6,7 +6,8 @@ from .serializers_modules.auth_serializers import (
 
 from .serializers_modules.context_serializers import (
     ContextSerializer,
-    ShareCodeSerializer
+    ShareCodeSerializer,
+    BulkShareCodeSerializer
 )
 
 from .serializers_modules.profile_serializers import (
@@ -39,6 +40,7 @@ __all__ = [
     'MyProfileSerializer',
     'ContextSerializer',
     'ShareCodeSerializer',
+    'BulkShareCodeSerializer',
     'PersonalDetailsSerializer',
     'CompanyDetailsSerializer',
     'RedemptionSerializer',
@@ -2,7 +2,28 @@ from rest_framework import serializers
 from api.models import Audit
 
 
-class RedemptionSerializer(serializers.ModelSerializer):
+class ExpiresAtMixin:
+
+    # Uses the code's own expiry, else the context's most recent expiring code; querysets from
+    # AuditQueryService carry that fallback as fallback_expires_at so no per-row query is needed
+    def get_expires_at(self, obj):
+        if obj.share_code.expires_at:
+            return obj.share_code.expires_at.isoformat()
+
+        if hasattr(obj, 'fallback_expires_at'):
+            fallback = obj.fallback_expires_at
+        else:
+            from api.models import ShareCode
+            recent_share_code = ShareCode.objects.filter(
+                context_id=obj.share_code.context_id,
+                expires_at__isnull=False
+            ).order_by('-id').first()
+            fallback = recent_share_code.expires_at if recent_share_code else None
+
+        return fallback.isoformat() if fallback else None
+
+
+class RedemptionSerializer(ExpiresAtMixin, serializers.ModelSerializer):
     context_label = serializers.CharField(source="share_code.context.label", read_only=True)
     context_given = serializers.CharField(source="share_code.context.given", read_only=True)
     context_family = serializers.CharField(source="share_code.context.family", read_only=True)
@@ -15,24 +36,8 @@ class RedemptionSerializer(serializers.ModelSerializer):
         model = Audit
         fields = ["id", "context_label", "context_given", "context_family", "company_name", "redeemed_at", "expires_at", "visibility"]
 
-    def get_expires_at(self, obj):
-        if obj.share_code.expires_at:
-            return obj.share_code.expires_at.isoformat()
-
-        from api.models import ShareCode
-        context = obj.share_code.context
-        recent_share_code = ShareCode.objects.filter(
-            context=context,
-            expires_at__isnull=False
-        ).order_by('-id').first()
-
-        if recent_share_code and recent_share_code.expires_at:
-            return recent_share_code.expires_at.isoformat()
-
-        return None
 
-
-class CompanyRedemptionSerializer(serializers.ModelSerializer):
+class CompanyRedemptionSerializer(ExpiresAtMixin, serializers.ModelSerializer):
     name = serializers.SerializerMethodField()
     context = serializers.CharField(source="share_code.context.label", read_only=True)
     redeemed_at = serializers.DateTimeField(source="ts", read_only=True)
@@ -47,19 +52,3 @@ class CompanyRedemptionSerializer(serializers.ModelSerializer):
     def get_name(self, obj):
         context = obj.share_code.context
         return f"{context.given} {context.family}".strip()
-
-    def get_expires_at(self, obj):
-        if obj.share_code.expires_at:
-            return obj.share_code.expires_at.isoformat()
-
-        from api.models import ShareCode
-        context = obj.share_code.context
-        recent_share_code = ShareCode.objects.filter(
-            context=context,
-            expires_at__isnull=False
-        ).order_by('-id').first()
-
-        if recent_share_code and recent_share_code.expires_at:
-            return recent_share_code.expires_at.isoformat()
-
-        return None
\ No newline at end of file
@@ -2,8 +2,12 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from api.authentication import PROFILE_CLAIMS
+from api.email_deliverability import check_email_deliverability
+from api.hashers import hash_password
 from api.models import Profile
 from api.validators import (
     CommonValidators, email_validator, password_validator
@@ -19,10 +23,16 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         super().__init__(*args, **kwargs)
         self.fields[self.username_field] = serializers.EmailField()
 
+    # Embeds the email so StatelessJWTAuthentication needs no query, and the profile flags the
+    # client reads at sign-in
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
         token['email'] = user.email
+        profile = Profile.objects.filter(user=user).values(*PROFILE_CLAIMS).first()
+        if profile is not None:
+            for claim in PROFILE_CLAIMS:
+                token[claim] = profile[claim]
         return token
 
 
@@ -50,11 +60,13 @@ class RegisterSerializer(serializers.Serializer):
         password = validated_data["password"]
         role = validated_data["role"]
 
-        user = User.objects.create_user(email=email, password=password)
+        # Hashed on the bounded pool before the user row is written
+        user = User.objects.create_user(email=email, password_hash=hash_password(password))
         profile, created = Profile.objects.get_or_create(user=user, defaults={'role': role})
         if not created:
             profile.role = role
             profile.save()
+        transaction.on_commit(lambda: check_email_deliverability(user))
         return user
 
 
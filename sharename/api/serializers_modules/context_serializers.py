@@ -1,3 +1,4 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from api.models import Context, ShareCode
 from api.validators import (
@@ -24,8 +25,19 @@ class ContextSerializer(serializers.ModelSerializer):
         model = Context
         fields = ["id", "label", "visibility", "given", "family", "created_at", "notify_on_redeem", "auto_archive_expired", "archived", "archived_at", "share_codes"]
 
+    # Prefetch for list views so get_share_codes reads from memory instead of querying per context
+    @staticmethod
+    def share_codes_prefetch():
+        return Prefetch(
+            'sharecode_set',
+            queryset=ShareCode.objects.filter(revoked=False).order_by('-id'),
+            to_attr='active_share_codes'
+        )
+
     def get_share_codes(self, obj):
-        share_codes = ShareCode.objects.filter(context=obj, revoked=False).order_by('-id')
+        share_codes = getattr(obj, 'active_share_codes', None)
+        if share_codes is None:
+            share_codes = ShareCode.objects.filter(context=obj, revoked=False).order_by('-id')
         return [{
             'id': sc.id,
             'code': sc.code,
@@ -34,6 +46,32 @@ class ContextSerializer(serializers.ModelSerializer):
         } for sc in share_codes]
 
 
+class BulkShareCodeSerializer(serializers.Serializer):
+    FORMAT_CHOICES = [("jsonl", "JSON lines"), ("csv", "CSV")]
+
+    context_id = serializers.IntegerField()
+    count = serializers.IntegerField(min_value=1)
+    expires_at = serializers.DateTimeField(required=False, allow_null=True)
+    expires_at_list = serializers.ListField(child=serializers.DateTimeField(), required=False)
+    format = serializers.ChoiceField(choices=FORMAT_CHOICES, default="jsonl")
+
+    def validate_count(self, value):
+        from django.conf import settings
+        limit = getattr(settings, 'SHARE_CODE_BULK_MAX', 100000)
+        if value > limit:
+            raise serializers.ValidationError(f"At most {limit} codes can be minted per request.")
+        return value
+
+    def validate(self, attrs):
+        expires_at_list = attrs.get('expires_at_list')
+        if expires_at_list is not None:
+            if attrs.get('expires_at') is not None:
+                raise serializers.ValidationError("Provide either expires_at or expires_at_list, not both.")
+            if len(expires_at_list) != attrs['count']:
+                raise serializers.ValidationError("expires_at_list must contain one value per code.")
+        return attrs
+
+
 class ShareCodeSerializer(serializers.ModelSerializer):
 
     class Meta:
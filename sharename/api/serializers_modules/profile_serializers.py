@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from api.models import Profile
+from api.countries import country_code
 from api.validators import (
     email_validator, phone_validator, first_name_validator, last_name_validator,
     country_validator, company_name_validator, company_phone_validator,
@@ -10,14 +11,29 @@ from api.validators import (
 User = get_user_model()
 
 
-class PersonalDetailsSerializer(serializers.ModelSerializer):
+class PhoneFieldsMixin:
+    # A value equal to the stored one was validated when it was saved
+    def is_unchanged(self, field_name, value):
+        return self.instance is not None and value == getattr(self.instance, field_name)
+
+    # Region for national phone numbers: the country sent with this request, else the stored one
+    def phone_region(self, country_field):
+        country = getattr(self, 'initial_data', {}).get(country_field)
+        if not country and self.instance is not None:
+            country = getattr(self.instance, country_field)
+        return country_code(country)
+
+
+class PersonalDetailsSerializer(PhoneFieldsMixin, serializers.ModelSerializer):
     phone = serializers.CharField(required=False, allow_blank=True, max_length=20)
     first_name = serializers.CharField(required=False, allow_blank=True, max_length=50)
     last_name = serializers.CharField(required=False, allow_blank=True, max_length=50)
     country = serializers.CharField(required=False, allow_blank=True, max_length=100)
 
     def validate_phone(self, value):
-        return phone_validator(value)
+        if self.is_unchanged('phone', value):
+            return value
+        return phone_validator(value, self.phone_region('country'))
 
     def validate_first_name(self, value):
         return first_name_validator(value)
@@ -69,7 +85,7 @@ class PersonalDetailsSerializer(serializers.ModelSerializer):
         fields = ["first_name", "last_name", "date_of_birth", "phone", "address", "country", "bio", "profile_completed", "profile_picture", "is_public_profile"]
 
 
-class CompanyDetailsSerializer(serializers.ModelSerializer):
+class CompanyDetailsSerializer(PhoneFieldsMixin, serializers.ModelSerializer):
     company_name = serializers.CharField(required=False, allow_blank=True, max_length=200)
     company_phone = serializers.CharField(required=False, allow_blank=True, max_length=20)
     company_country = serializers.CharField(required=False, allow_blank=True, max_length=100)
@@ -79,7 +95,9 @@ class CompanyDetailsSerializer(serializers.ModelSerializer):
         return company_name_validator(value)
 
     def validate_company_phone(self, value):
-        return company_phone_validator(value)
+        if self.is_unchanged('company_phone', value):
+            return value
+        return company_phone_validator(value, self.phone_region('company_country'))
 
     def validate_company_country(self, value):
         return company_country_validator(value)
@@ -1,19 +1,39 @@
 
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Subquery
 from django.contrib.auth import get_user_model
 from .models import Notification, Context
+from .audit_pipeline import flush_pending_audits
+from .code_allocator import allocate_code, allocate_codes
+from .code_filter import remember_codes
+from .events import publish_notifications
 
 
 User = get_user_model()
 
 
 class NotificationService:
+    # Creates a notification and publishes it to the recipient's open streams once committed
+    @staticmethod
+    def create(**fields):
+        notification = Notification.objects.create(**fields)
+        NotificationService.publish([notification])
+        return notification
+
+    # Publishes saved notifications (including bulk-created ones) after the current transaction commits
+    @staticmethod
+    def publish(notifications):
+        notifications = list(notifications)
+        if notifications:
+            transaction.on_commit(lambda: publish_notifications(notifications))
+
     # Creates a notification when someone redeems a share code
     @staticmethod
     def create_redemption_notification(context, requester_email):
         if not context.notify_on_redeem:
             return None
 
-        return Notification.objects.create(
+        return NotificationService.create(
             user=context.user,
             type='redemption',
             title=f'Code Redeemed by {requester_email}',
@@ -27,7 +47,7 @@ class NotificationService:
         if not context.notify_on_redeem:
             return None
 
-        return Notification.objects.create(
+        return NotificationService.create(
             user=context.user,
             type='redemption',
             title=f'Public Context Accessed by {requester_email}',
@@ -38,7 +58,7 @@ class NotificationService:
     # Creates a notification when someone requests consent to access a context
     @staticmethod
     def create_consent_request_notification(consent_request):
-        return Notification.objects.create(
+        return NotificationService.create(
             user=consent_request.context.user,
             type='consent_request',
             title=f'Consent Request from {consent_request.requester.email}',
@@ -49,7 +69,7 @@ class NotificationService:
     # Notifies the requester when their consent request is approved
     @staticmethod
     def create_consent_approved_notification(consent_request):
-        return Notification.objects.create(
+        return NotificationService.create(
             user=consent_request.requester,
             type='consent_approved',
             title=f'Consent Approved for {consent_request.context.label}',
@@ -60,7 +80,7 @@ class NotificationService:
     # Notifies the requester when their consent request is denied
     @staticmethod
     def create_consent_denied_notification(consent_request):
-        return Notification.objects.create(
+        return NotificationService.create(
             user=consent_request.requester,
             type='consent_denied',
             title=f'Consent Denied for {consent_request.context.label}',
@@ -72,9 +92,11 @@ class NotificationService:
     @staticmethod
     def create_access_revoked_notification(audit, context):
         try:
-            company_user = User.objects.get(email=audit.requester)
-            return Notification.objects.create(
-                user=company_user,
+            company_user_id = audit.requester_user_id or User.objects.values_list(
+                'id', flat=True
+            ).get(email=audit.requester)
+            return NotificationService.create(
+                user_id=company_user_id,
                 type='access_revoked',
                 title=f'Access Revoked',
                 message=f'Your access to "{context.label}" context has been revoked by the owner.',
@@ -86,7 +108,7 @@ class NotificationService:
     # Notifies the context owner when their context expires and gets archived
     @staticmethod
     def create_context_expired_notification(user, context_label):
-        return Notification.objects.create(
+        return NotificationService.create(
             user=user,
             type='context_expired',
             title=f'Context Expired',
@@ -94,14 +116,30 @@ class NotificationService:
             context=None
         )
 
+    # Counts unread notifications; served entirely from the (user, created_at, read) index
+    @staticmethod
+    def unread_count(user):
+        return Notification.objects.filter(user=user, read=False).count()
+
+    # Marks the user's unread notifications (optionally only those in ids) as read with one UPDATE
+    @staticmethod
+    def mark_read(user, ids=None):
+        queryset = Notification.objects.filter(user=user, read=False)
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+        return queryset.update(read=True)
+
 
 class AuditQueryService:
 
-    # Gets all redemptions for contexts owned by a specific user
+    # Gets all redemptions for contexts owned by a specific user; flush_pending writes this process's buffered audits first
     @staticmethod
-    def get_user_redemptions(user, include_revoked=False, include_archived=False):
+    def get_user_redemptions(user, include_revoked=False, include_archived=False, flush_pending=False):
         from .models import Audit
 
+        if flush_pending:
+            flush_pending_audits()
+
         queryset = Audit.objects.filter(
             share_code__context__user=user,
             share_code__revoked=False
@@ -113,16 +151,31 @@ class AuditQueryService:
         if not include_archived:
             queryset = queryset.filter(share_code__context__archived=False)
 
-        return queryset.select_related(
+        return AuditQueryService.with_fallback_expiry(queryset.select_related(
             'share_code',
             'share_code__context'
-        ).order_by('-ts')
+        )).order_by('-ts')
 
-    # Gets all redemptions made by a specific company user
+    # Annotates each audit with the expiry of its context's most recent expiring code, so serializers
+    # need no per-row query when the redeemed code itself has no expiry
     @staticmethod
-    def get_company_redemptions(user_email, include_revoked=False, include_archived=False):
+    def with_fallback_expiry(queryset):
+        from .models import ShareCode
+
+        latest_expiry = ShareCode.objects.filter(
+            context=OuterRef('share_code__context'),
+            expires_at__isnull=False
+        ).order_by('-id').values('expires_at')[:1]
+        return queryset.annotate(fallback_expires_at=Subquery(latest_expiry))
+
+    # Gets all redemptions made by a specific company user; flush_pending writes this process's buffered audits first
+    @staticmethod
+    def get_company_redemptions(user_email, include_revoked=False, include_archived=False, flush_pending=False):
         from .models import Audit
 
+        if flush_pending:
+            flush_pending_audits()
+
         queryset = Audit.objects.filter(
             requester=user_email,
             share_code__revoked=False
@@ -134,10 +187,10 @@ class AuditQueryService:
         if not include_archived:
             queryset = queryset.filter(share_code__context__archived=False)
 
-        return queryset.select_related(
+        return AuditQueryService.with_fallback_expiry(queryset.select_related(
             'share_code',
             'share_code__context'
-        ).order_by('-ts')
+        )).order_by('-ts')
 
 
 class ShareCodeService:
@@ -156,18 +209,50 @@ class ShareCodeService:
             share_code = None
 
         if not share_code:
-            share_code = ShareCode.objects.create(
-                context=context,
-                expires_at=expires_at
-            )
+            share_code = ShareCodeService.create_share_code(context, expires_at)
 
         return share_code
 
-    # Creates a new share code for a context
+    # Creates a new share code for a context from the code pool, retrying if the code was taken meanwhile
     @staticmethod
-    def create_share_code(context, expires_at=None):
+    def create_share_code(context, expires_at=None, attempts=3):
         from .models import ShareCode
-        return ShareCode.objects.create(
-            context=context,
-            expires_at=expires_at
-        )
\ No newline at end of file
+
+        for attempt in range(attempts):
+            try:
+                with transaction.atomic():
+                    return ShareCode.objects.create(
+                        context=context,
+                        expires_at=expires_at,
+                        code=allocate_code()
+                    )
+            except IntegrityError:
+                if attempt == attempts - 1:
+                    raise
+
+    # Creates count codes for a context in one transaction; expires_at may be one value or one per code.
+    # bulk_create skips post_save, so the filter update and expiry scheduling its signals do are run explicitly
+    @staticmethod
+    def bulk_create_share_codes(context, count, expires_at=None, attempts=3, batch_size=1000):
+        from .models import ShareCode
+        from .expiry_scheduler import schedule_expiry
+
+        expiries = expires_at if isinstance(expires_at, (list, tuple)) else [expires_at] * count
+
+        for attempt in range(attempts):
+            share_codes = [
+                ShareCode(context=context, code=code, expires_at=expiry)
+                for code, expiry in zip(allocate_codes(count), expiries)
+            ]
+            try:
+                with transaction.atomic():
+                    ShareCode.objects.bulk_create(share_codes, batch_size=batch_size)
+                    remember_codes(*(share_code.code for share_code in share_codes))
+                    deadlines = [expiry for expiry in expiries if expiry is not None]
+                    if deadlines:
+                        deadline = min(deadlines)
+                        transaction.on_commit(lambda: schedule_expiry(context.pk, deadline))
+                return share_codes
+            except IntegrityError:
+                if attempt == attempts - 1:
+                    raise
\ No newline at end of file
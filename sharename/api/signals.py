@@ -1,31 +1,93 @@
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from django.utils import timezone
-from django.core.management import call_command
 from django.contrib.auth import get_user_model
 from .models import Context, ShareCode, Profile
-import threading
+from .caching import ShareCodeCache
+from .code_filter import remember_codes
+from .expiry_scheduler import schedule_expiry
+from .search import build_search_text, remove_from_search_index, update_search_index
+from .prefix_index import forget_profile, index_profile
 
 User = get_user_model()
 
 
-def check_expired_contexts_async():
-    import sys
-    if 'test' in sys.argv or hasattr(sys, '_called_from_test'):
-        return
+@receiver(post_save, sender=ShareCode)
+def check_for_expired_contexts_on_sharecode_change(sender, instance, **kwargs):
+    if instance.expires_at:
+        context_id, expires_at = instance.context_id, instance.expires_at
+        transaction.on_commit(lambda: schedule_expiry(context_id, expires_at))
+
 
-    try:
-        call_command('handle_expired_contexts')
-    except Exception as e:
-        print(f"Error running expired context check: {e}")
+# Clears cache entries now, for the rest of this transaction, and again once it commits, since a
+# concurrent redemption may have re-filled them from the rows as they were before the commit
+def invalidate_on_commit(invalidate):
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+@receiver([post_save, post_delete], sender=ShareCode)
+def invalidate_sharecode_cache(sender, instance, **kwargs):
+    codes = (instance.code, getattr(instance, '_loaded_code', None))
+    invalidate_on_commit(lambda: ShareCodeCache.invalidate(*codes))
 
 
 @receiver(post_save, sender=ShareCode)
-def check_for_expired_contexts_on_sharecode_change(sender, instance, **kwargs):
-    if instance.expires_at and instance.expires_at <= timezone.now():
-        thread = threading.Thread(target=check_expired_contexts_async)
-        thread.daemon = True
-        thread.start()
+def add_code_to_filter(sender, instance, **kwargs):
+    remember_codes(instance.code)
+
+
+# Deleting a context cascades to its codes, whose own post_delete clears their entries
+@receiver(post_save, sender=Context)
+def invalidate_context_sharecode_cache(sender, instance, created, **kwargs):
+    if not created:
+        context_id = instance.pk
+        invalidate_on_commit(lambda: ShareCodeCache.invalidate_contexts([context_id]))
+
+
+@receiver(post_save, sender=User)
+def invalidate_owner_sharecode_cache(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is None or 'email' in update_fields:
+        user_id = instance.pk
+        invalidate_on_commit(lambda: ShareCodeCache.invalidate_owner(user_id))
+
+
+@receiver(pre_save, sender=Profile)
+def update_profile_search_text(sender, instance, **kwargs):
+    instance.search_text = build_search_text(instance)
+
+
+@receiver(post_save, sender=Profile)
+def index_profile_for_search(sender, instance, **kwargs):
+    update_search_index(instance)
+
+
+@receiver(post_delete, sender=Profile)
+def remove_profile_from_search(sender, instance, **kwargs):
+    remove_from_search_index(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+def update_profile_prefix_index(sender, instance, **kwargs):
+    transaction.on_commit(lambda: index_profile(instance))
+
+
+@receiver(post_delete, sender=Profile)
+def remove_profile_from_prefix_index(sender, instance, **kwargs):
+    profile_id = instance.pk
+    transaction.on_commit(lambda: forget_profile(profile_id))
+
+
+@receiver(post_save, sender=User)
+def update_search_text_for_email(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'email' not in update_fields):
+        return
+    profile = Profile.objects.filter(user=instance).first()
+    if profile is not None:
+        profile.user = instance
+        profile.save(update_fields=['search_text', 'updated_at'])
 
 
 @receiver(post_save, sender=User)
@@ -34,8 +96,3 @@ def create_user_profile(sender, instance, created, **kwargs):
         if not hasattr(instance, 'profile'):
             Profile.objects.get_or_create(user=instance, defaults={'role': 'individual'})
 
-
-def startup_expired_context_check():
-    thread = threading.Thread(target=check_expired_contexts_async)
-    thread.daemon = True
-    thread.start()
\ No newline at end of file
@@ -1,5 +1,5 @@
 import json
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
@@ -8,15 +8,33 @@ from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from unittest.mock import patch
 
-from .models import User, Context, ShareCode, Audit, ConsentRequest, Notification, Profile
+from .models import User, Context, ShareCode, Audit, ConsentRequest, Notification, Profile, JobLease, JobCheckpoint
 from .services import NotificationService, AuditQueryService, ShareCodeService
 from .validators import CommonValidators, email_validator, first_name_validator, company_name_validator
 
 User = get_user_model()
 
 
+class QueryCountMixin:
+    """Counts the database queries run by test code"""
+
+    def count_queries(self, func):
+        """Call func and return (query count, its result)"""
+        with CaptureQueriesContext(connection) as ctx:
+            result = func()
+        return len(ctx.captured_queries), result
+
+    def count_get_queries(self, url):
+        """GET url, check it succeeded and return (query count, response)"""
+        queries, response = self.count_queries(lambda: self.client.get(url))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return queries, response
+
+
 class BaseTestCase(APITestCase):
     """Base test case with common setup and utilities"""
 
@@ -1570,7 +1588,7 @@ class ModelExtensiveTestCase(BaseTestCase):
 
 
         share_code = ShareCodeService.get_or_create_share_code(self.public_context)
-        Audit.objects.create(share_code=share_code, requester=self.company_user.email)
+        Audit.objects.create(share_code=share_code, requester=self.company_user.email, requester_user=self.company_user)
 
         users = self.public_context.get_users_with_redemptions()
         self.assertIn(self.company_user, users)
@@ -2126,7 +2144,8 @@ class ModelValidationTestCase(BaseTestCase):
         share_code = ShareCodeService.get_or_create_share_code(self.public_context)
         Audit.objects.create(
             share_code=share_code,
-            requester=self.company_user.email
+            requester=self.company_user.email,
+            requester_user=self.company_user
         )
 
 
@@ -2375,76 +2394,35 @@ class UtilsTestCase(BaseTestCase):
 class SignalsTestCase(BaseTestCase):
     """Comprehensive test cases for api.signals module"""
 
-    @patch('sys.argv', ['manage.py'])
-    @patch('api.signals.call_command')
-    def test_check_expired_contexts_async_success(self, mock_call_command):
-        """Test successful execution of check_expired_contexts_async"""
-        from api.signals import check_expired_contexts_async
-
-
-        mock_call_command.return_value = None
-
-        check_expired_contexts_async()
-
-
-        mock_call_command.assert_called_once_with('handle_expired_contexts')
-
-    @patch('sys.argv', ['manage.py'])
-    @patch('api.signals.call_command')
-    @patch('builtins.print')
-    def test_check_expired_contexts_async_exception_handling(self, mock_print, mock_call_command):
-        """Test exception handling in check_expired_contexts_async"""
-        from api.signals import check_expired_contexts_async
-
-
-        mock_call_command.side_effect = Exception("Database error")
-
-        check_expired_contexts_async()
-
-
-        mock_call_command.assert_called_once_with('handle_expired_contexts')
-        mock_print.assert_called_once_with("Error running expired context check: Database error")
-
-    @patch('api.signals.threading.Thread')
-    def test_check_for_expired_contexts_on_sharecode_change_signal(self, mock_thread):
-        """Test the ShareCode post_save signal with expired code"""
+    def test_check_for_expired_contexts_on_sharecode_change_signal(self):
+        """Test the ShareCode post_save signal schedules an expired code once committed"""
         from django.utils import timezone
         from datetime import timedelta
 
-
         expired_time = timezone.now() - timedelta(hours=1)
-        share_code = ShareCode.objects.create(
-            context=self.public_context,
-            expires_at=expired_time
-        )
-
-
-
-        mock_thread.assert_called()
+        with patch('api.signals.schedule_expiry') as mock_schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                ShareCode.objects.create(
+                    context=self.public_context,
+                    expires_at=expired_time
+                )
 
-
-        call_args = mock_thread.call_args
-        self.assertIn('target', call_args[1])
-
-
-        thread_instance = mock_thread.return_value
-        thread_instance.start.assert_called_once()
+        mock_schedule.assert_called_once_with(self.public_context.id, expired_time)
 
     def test_check_for_expired_contexts_on_sharecode_change_not_expired(self):
-        """Test ShareCode signal with non-expired code doesn't trigger check"""
+        """Test ShareCode signal schedules a future code at its own deadline"""
         from django.utils import timezone
         from datetime import timedelta
 
-        with patch('api.signals.threading.Thread') as mock_thread:
-
-            future_time = timezone.now() + timedelta(hours=1)
-            ShareCode.objects.create(
-                context=self.public_context,
-                expires_at=future_time
-            )
-
+        future_time = timezone.now() + timedelta(hours=1)
+        with patch('api.signals.schedule_expiry') as mock_schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                ShareCode.objects.create(
+                    context=self.public_context,
+                    expires_at=future_time
+                )
 
-            mock_thread.assert_not_called()
+        mock_schedule.assert_called_once_with(self.public_context.id, future_time)
 
     def test_create_user_profile_signal_new_user(self):
         """Test profile creation for new users"""
@@ -2475,42 +2453,13 @@ class SignalsTestCase(BaseTestCase):
         self.assertEqual(profiles.count(), 1)
         self.assertEqual(profiles.first().role, 'company')
 
-    @patch('api.signals.threading.Thread')
-    def test_startup_expired_context_check(self, mock_thread):
-        """Test the startup expired context check function"""
-        from api.signals import startup_expired_context_check
-
-        startup_expired_context_check()
-
-
-        mock_thread.assert_called_once()
-        call_args = mock_thread.call_args
-        self.assertIn('target', call_args[1])
-
-
-        thread_instance = mock_thread.return_value
-        self.assertTrue(thread_instance.daemon)
-        thread_instance.start.assert_called_once()
-
-    @patch('sys.argv', ['manage.py', 'test'])
-    def test_check_expired_contexts_async_skips_during_tests(self):
-        """Test that expiration check is skipped during tests"""
-        from api.signals import check_expired_contexts_async
-
-        with patch('api.signals.call_command') as mock_call_command:
-            check_expired_contexts_async()
-
-
-            mock_call_command.assert_not_called()
-
     def test_sharecode_signal_with_no_expiration(self):
         """Test ShareCode signal with no expiration date"""
-        with patch('api.signals.threading.Thread') as mock_thread:
+        with patch('api.signals.schedule_expiry') as mock_schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                ShareCode.objects.create(context=self.public_context)
 
-            ShareCode.objects.create(context=self.public_context)
-
-
-            mock_thread.assert_not_called()
+        mock_schedule.assert_not_called()
 
     def test_create_user_profile_signal_user_without_profile_attribute(self):
         """Test profile creation when user doesn't have profile attribute"""
@@ -2531,19 +2480,6 @@ class SignalsTestCase(BaseTestCase):
         profile = Profile.objects.get(user=new_user)
         self.assertEqual(profile.role, 'individual')
 
-    @patch('sys.argv', ['manage.py'])
-    @patch('api.signals.threading.Thread')
-    def test_startup_check_function_calls_target(self, mock_thread):
-        """Test startup function creates thread with correct target"""
-        from api.signals import startup_expired_context_check, check_expired_contexts_async
-
-        startup_expired_context_check()
-
-
-        mock_thread.assert_called_once()
-        call_args = mock_thread.call_args
-        self.assertEqual(call_args[1]['target'], check_expired_contexts_async)
-
 
 class MixinExtensiveTestCase(BaseTestCase):
     """Comprehensive test cases for api.mixins module"""
@@ -2842,4 +2778,2548 @@ class MixinExtensiveTestCase(BaseTestCase):
         view.request.user.is_authenticated = False
 
         queryset = view.get_queryset()
-        self.assertEqual(queryset.count(), 0)
\ No newline at end of file
+        self.assertEqual(queryset.count(), 0)
+
+class ShareCodeCacheTestCase(BaseTestCase):
+    """Test the cache-backed redemption fast path"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_warm_hit_runs_no_query(self):
+        """Test a cached code is hydrated with its context and owner without touching the database"""
+        from api.caching import ShareCodeCache
+
+        code = self.valid_share_code.code
+        ShareCodeCache.get(code)
+
+        with self.assertNumQueries(0):
+            share_code = ShareCodeCache.get(code)
+            self.assertTrue(share_code.valid())
+            self.assertEqual(share_code.context.user.email, self.individual_user.email)
+
+    def test_warm_cache_redeems_with_only_the_audit_write(self):
+        """Test a warm anonymous redemption only writes the audit row"""
+        code = self.valid_share_code.code
+        self.client.get(f'/api/codes/{code}/')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/codes/{code}/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Audit.objects.filter(share_code=self.valid_share_code).count(), 2)
+
+    def test_consent_error_uses_cached_owner(self):
+        """Test the consent error includes the owner email without loading the user"""
+        from api.caching import ShareCodeCache
+
+        share_code = ShareCodeCache.get(self.consent_share_code.code)
+        with self.assertNumQueries(0):
+            self.assertEqual(share_code.context.user.email, self.individual_user.email)
+            self.assertEqual(share_code.context.visibility, 'consent')
+
+    def test_unknown_code_is_not_cached(self):
+        """Test unknown codes return None and leave the cache empty"""
+        from api.caching import ShareCodeCache
+
+        self.assertIsNone(ShareCodeCache.get('NOPE0000'))
+        self.assertIsNone(cache.get(ShareCodeCache.key('NOPE0000')))
+
+    def test_revoking_code_invalidates_cache(self):
+        """Test revoking a share code is visible to the next redemption"""
+        code = self.valid_share_code.code
+        self.assertEqual(self.client.get(f'/api/codes/{code}/').status_code, status.HTTP_200_OK)
+
+        self.valid_share_code.revoked = True
+        self.valid_share_code.save()
+
+        response = self.client.get(f'/api/codes/{code}/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cached_code_expires_without_invalidation(self):
+        """Test a cached code is refused once its expiry passes, with no signal involved"""
+        code = self.valid_share_code.code
+        self.assertEqual(self.client.get(f'/api/codes/{code}/').status_code, status.HTTP_200_OK)
+
+        with patch('django.utils.timezone.now', return_value=self.valid_share_code.expires_at + timedelta(seconds=1)):
+            response = self.client.get(f'/api/codes/{code}/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_deleting_code_invalidates_cache(self):
+        """Test a deleted code is not found even though it was cached"""
+        from api.caching import ShareCodeCache
+
+        code = self.valid_share_code.code
+        ShareCodeCache.get(code)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ShareCode.objects.get(pk=self.valid_share_code.pk).delete()
+
+        self.assertIsNone(cache.get(ShareCodeCache.key(code)))
+        self.assertEqual(self.client.get(f'/api/codes/{code}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalidation_repeats_after_commit(self):
+        """Test an entry re-filled before the commit is cleared when the transaction commits"""
+        from api.caching import ShareCodeCache
+
+        code = self.valid_share_code.code
+        with self.captureOnCommitCallbacks(execute=True):
+            self.valid_share_code.revoked = True
+            self.valid_share_code.save()
+            ShareCodeCache.get(code)
+            self.assertIsNotNone(cache.get(ShareCodeCache.key(code)))
+
+        self.assertIsNone(cache.get(ShareCodeCache.key(code)))
+
+    def test_changing_code_value_invalidates_old_key(self):
+        """Test renaming a code removes the cache entry for the old value"""
+        share_code = ShareCode.objects.get(pk=self.valid_share_code.pk)
+        old_code = share_code.code
+        self.client.get(f'/api/codes/{old_code}/')
+
+        share_code.code = 'RENAMED1'
+        share_code.save()
+
+        self.assertEqual(self.client.get(f'/api/codes/{old_code}/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/codes/RENAMED1/').status_code, status.HTTP_200_OK)
+
+    def test_context_change_invalidates_cache(self):
+        """Test editing the context is visible to the next redemption"""
+        code = self.valid_share_code.code
+        self.client.get(f'/api/codes/{code}/')
+
+        self.public_context.given = 'Jonathan'
+        self.public_context.save()
+
+        response = self.client.get(f'/api/codes/{code}/')
+        self.assertEqual(response.data['data']['given'], 'Jonathan')
+
+    def test_deleting_context_invalidates_cache(self):
+        """Test deleting the context removes its cached codes"""
+        code = self.valid_share_code.code
+        self.client.get(f'/api/codes/{code}/')
+
+        self.public_context.delete()
+
+        response = self.client.get(f'/api/codes/{code}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_owner_email_change_invalidates_cache(self):
+        """Test changing the owner email refreshes cached owner metadata"""
+        from api.caching import ShareCodeCache
+
+        ShareCodeCache.get(self.consent_share_code.code)
+
+        self.individual_user.email = 'renamed@test.com'
+        self.individual_user.save()
+
+        share_code = ShareCodeCache.get(self.consent_share_code.code)
+        self.assertEqual(share_code.context.user.email, 'renamed@test.com')
+
+
+class AuditPipelineTestCase(BaseTestCase):
+    """Test the buffered audit write pipeline"""
+
+    def setUp(self):
+        super().setUp()
+        import tempfile
+        self.spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.spool_dir.cleanup)
+
+    def make_pipeline(self, **kwargs):
+        from api.audit_pipeline import AuditPipeline
+        return AuditPipeline(self.spool_dir.name, **kwargs)
+
+    def test_records_are_buffered_until_flush(self):
+        """Test records are only written to the database on flush"""
+        pipeline = self.make_pipeline(batch_size=2)
+        redeemed_at = timezone.now() - timedelta(minutes=5)
+
+        for _ in range(3):
+            pipeline.record(self.valid_share_code.id, 'buffered@test.com', ts=redeemed_at)
+
+        self.assertEqual(pipeline.pending(), 3)
+        self.assertFalse(Audit.objects.filter(requester='buffered@test.com').exists())
+
+        self.assertEqual(pipeline.flush(), 3)
+        audits = Audit.objects.filter(requester='buffered@test.com')
+        self.assertEqual(audits.count(), 3)
+        self.assertTrue(all(audit.ts == redeemed_at for audit in audits))
+        self.assertEqual(pipeline.pending(), 0)
+
+    def test_spooled_records_survive_a_crash(self):
+        """Test a new pipeline replays records spooled by one that never flushed"""
+        crashed = self.make_pipeline()
+        crashed.record(self.valid_share_code.id, 'crashed@test.com')
+        crashed.record(self.valid_share_code.id, 'crashed@test.com')
+
+        recovered = self.make_pipeline()
+        self.assertEqual(recovered.flush(), 2)
+        self.assertEqual(Audit.objects.filter(requester='crashed@test.com').count(), 2)
+
+        self.assertEqual(recovered.flush(), 0)
+        self.assertEqual(Audit.objects.filter(requester='crashed@test.com').count(), 2)
+
+    def test_replayed_segment_does_not_duplicate_audits(self):
+        """Test a segment replayed after its insert committed writes no second copy"""
+        import os
+        from pathlib import Path
+
+        pipeline = self.make_pipeline()
+        pipeline.record(self.valid_share_code.id, 'replayed@test.com')
+        pipeline.record(self.valid_share_code.id, 'replayed@test.com')
+        spooled = pipeline._spool_path.read_text()
+        pipeline.flush()
+
+        # A crash between the insert and the unlink leaves the written segment behind
+        (Path(self.spool_dir.name) / f'audit-{os.getpid()}-deadbeef-00000000.batch').write_text(spooled)
+        self.make_pipeline().flush()
+
+        self.assertEqual(Audit.objects.filter(requester='replayed@test.com').count(), 2)
+
+    def test_inline_pipeline_flushes_full_batches_without_a_thread(self):
+        """Test a pipeline without background writes a batch when it fills and starts no worker"""
+        from api.audit_pipeline import get_audit_pipeline, record_redemption, reset_audit_pipeline
+
+        config = {'ENABLED': True, 'BACKGROUND': False, 'BATCH_SIZE': 2, 'SPOOL_DIR': self.spool_dir.name}
+        with override_settings(AUDIT_PIPELINE=config):
+            reset_audit_pipeline()
+            self.addCleanup(reset_audit_pipeline)
+            record_redemption(self.valid_share_code, 'inline@test.com')
+            self.assertEqual(Audit.objects.filter(requester='inline@test.com').count(), 0)
+            record_redemption(self.valid_share_code, 'inline@test.com')
+
+            self.assertEqual(Audit.objects.filter(requester='inline@test.com').count(), 2)
+            self.assertFalse(get_audit_pipeline().is_running())
+
+    def test_failed_flush_keeps_records_spooled(self):
+        """Test records stay on disk when the insert fails and are written later"""
+        pipeline = self.make_pipeline()
+        pipeline.record(self.valid_share_code.id, 'retry@test.com')
+
+        with patch.object(Audit.objects, 'bulk_create', side_effect=Exception('database is locked')):
+            with self.assertRaises(Exception):
+                pipeline.flush()
+
+        self.assertEqual(pipeline.flush(), 1)
+        self.assertTrue(Audit.objects.filter(requester='retry@test.com').exists())
+
+    def test_flush_skips_deleted_share_codes(self):
+        """Test audits for share codes deleted before the flush are dropped"""
+        pipeline = self.make_pipeline()
+        doomed = ShareCode.objects.create(context=self.public_context)
+        pipeline.record(doomed.id, 'late@test.com')
+        pipeline.record(self.valid_share_code.id, 'late@test.com')
+        doomed.delete()
+
+        self.assertEqual(pipeline.flush(), 1)
+
+    def test_redemption_list_flushes_before_read(self):
+        """Test analytics reads see redemptions still sitting in the buffer"""
+        from django.test import override_settings
+        from api.audit_pipeline import get_audit_pipeline, reset_audit_pipeline
+
+        config = {'ENABLED': True, 'FLUSH_INTERVAL': 60, 'SPOOL_DIR': self.spool_dir.name}
+        with override_settings(AUDIT_PIPELINE=config):
+            self.addCleanup(reset_audit_pipeline, flush=False)
+
+            self.authenticate_user(self.company_user)
+            response = self.client.post('/api/redeem-by-id/', {'context_id': self.public_context.id}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(get_audit_pipeline().pending(), 1)
+            self.assertFalse(Audit.objects.filter(requester=self.company_user.email).exists())
+
+            response = self.client.get('/api/company-redemptions/')
+            response_data = response.data.get('data') if hasattr(response.data, 'get') else response.data
+            self.assertEqual(len(response_data), 1)
+
+
+class ExpirationEngineTestCase(BaseTestCase):
+    """Test the set-based expired context processing"""
+
+    def expire_context(self, label, auto_archive, redeemers=()):
+        context = Context.objects.create(
+            user=self.individual_user,
+            label=label,
+            visibility='code',
+            given='Exp',
+            auto_archive_expired=auto_archive
+        )
+        share_code = ShareCode.objects.create(context=context, expires_at=timezone.now() - timedelta(minutes=1))
+        for email in redeemers:
+            Audit.objects.create(
+                share_code=share_code,
+                requester=email,
+                requester_user=User.objects.filter(email=email).first()
+            )
+        return context
+
+    def test_archives_and_notifies(self):
+        """Test archive contexts are archived and owner and redeemers notified"""
+        from api.expiry import ExpirationEngine
+
+        context = self.expire_context(
+            'Archive Me', True,
+            redeemers=[self.company_user.email, self.company_user.email, self.individual_user.email, 'anon']
+        )
+
+        report = ExpirationEngine().run(context_ids=[context.id])
+
+        context.refresh_from_db()
+        self.assertTrue(context.archived)
+        self.assertTrue(context.expiration_processed)
+        self.assertIsNotNone(context.archived_at)
+        self.assertEqual(report.archived, 1)
+        self.assertEqual(report.notifications, 2)
+        self.assertTrue(Notification.objects.filter(
+            user=self.individual_user, type='context_expired', context=context
+        ).exists())
+        self.assertEqual(Notification.objects.filter(
+            user=self.company_user, type='context_expired', context=context
+        ).count(), 1)
+
+    def test_deletes_non_archive_contexts(self):
+        """Test contexts without auto-archive are deleted after notifying"""
+        from api.expiry import ExpirationEngine
+
+        context = self.expire_context('Delete Me', False, redeemers=[self.company_user.email])
+        context_id = context.id
+
+        report = ExpirationEngine().run(context_ids=[context_id])
+
+        self.assertFalse(Context.objects.filter(id=context_id).exists())
+        self.assertEqual(report.deleted, 1)
+        notification = Notification.objects.get(user=self.company_user, type='context_expired')
+        self.assertIsNone(notification.context)
+        self.assertIn('Delete Me', notification.title)
+
+    def test_skips_unexpired_and_processed_contexts(self):
+        """Test live, archived and already processed contexts are left alone"""
+        from api.expiry import ExpirationEngine
+
+        processed = self.expire_context('Processed', True)
+        processed.expiration_processed = True
+        processed.save()
+
+        ExpirationEngine().run()
+
+        self.assertTrue(Context.objects.filter(id=self.public_context.id, archived=False).exists())
+        self.assertFalse(Notification.objects.filter(context=processed).exists())
+        self.assertFalse(Context.objects.filter(id=self.code_protected_context.id).exists())
+
+    def test_query_count_is_independent_of_batch_size(self):
+        """Test a batch costs the same number of queries for 2 or 40 contexts"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from api.expiry import ExpirationEngine
+
+        def queries_for(count, prefix):
+            ids = [
+                self.expire_context(f'{prefix} {i}', i % 2 == 0, redeemers=[self.company_user.email]).id
+                for i in range(count)
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                report = ExpirationEngine(batch_size=100).run(context_ids=ids)
+            self.assertEqual(report.processed, count)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries_for(2, 'Small'), queries_for(40, 'Large'))
+
+    def test_batches_cover_all_contexts(self):
+        """Test contexts spanning several batches are all processed"""
+        from api.expiry import ExpirationEngine
+
+        ids = [self.expire_context(f'Batch {i}', True).id for i in range(7)]
+
+        report = ExpirationEngine(batch_size=3).run(context_ids=ids)
+
+        self.assertEqual(report.processed, 7)
+        self.assertEqual(report.batches, 3)
+        self.assertEqual(Context.objects.filter(id__in=ids, archived=True).count(), 7)
+
+    def test_command_reports_phase_timings(self):
+        """Test the management command prints a per-phase timing summary"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('handle_expired_contexts', stdout=out)
+        output = out.getvalue()
+
+        self.assertIn('Successfully processed 1 expired contexts', output)
+        for phase in ('select', 'redeemers', 'notify', 'delete', 'total'):
+            self.assertIn(phase, output)
+
+
+class AuditRequesterUserTestCase(BaseTestCase):
+    """Test the requester user link on audits"""
+
+    def test_requester_email_alone_does_not_link_user(self):
+        """Test an anonymous redemption naming someone's email is not attached to their account"""
+        from api.audit_pipeline import record_redemption
+
+        with self.settings(AUDIT_PIPELINE={'ENABLED': False}):
+            response = self.client.get(
+                f'/api/codes/{self.valid_share_code.code}/',
+                HTTP_X_CLIENT=self.company_user.email
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            record_redemption(self.valid_share_code, self.company_user.email)
+
+        audits = Audit.objects.filter(share_code=self.valid_share_code, requester=self.company_user.email)
+        self.assertEqual(audits.count(), 2)
+        self.assertFalse(audits.filter(requester_user__isnull=False).exists())
+
+    def test_redemption_records_requester_user(self):
+        """Test authenticated redemptions store the requester user"""
+        self.authenticate_user(self.company_user)
+        self.client.get(f'/api/codes/{self.valid_share_code.code}/')
+
+        audit = Audit.objects.get(share_code=self.valid_share_code)
+        self.assertEqual(audit.requester_user_id, self.company_user.id)
+
+    def test_users_with_redemptions_is_a_single_query(self):
+        """Test redeemer lookup costs one query regardless of redemption count"""
+        redeemers = [
+            User.objects.create_user(email=f'redeemer{i}@test.com', password='testpass123')
+            for i in range(5)
+        ]
+        for _ in range(10):
+            for user in redeemers:
+                Audit.objects.create(share_code=self.valid_share_code, requester=user.email, requester_user=user)
+
+        with self.assertNumQueries(1):
+            users = list(self.public_context.get_users_with_redemptions())
+
+        self.assertEqual(sorted(user.id for user in users), sorted(user.id for user in redeemers))
+
+    def test_backfill_migration_links_existing_audits(self):
+        """Test the data migration resolves requester emails into the foreign key"""
+        from importlib import import_module
+        from django.apps import apps
+
+        migration = import_module('api.migrations.0024_audit_requester_user')
+        audit = Audit.objects.create(share_code=self.valid_share_code, requester=self.company_user.email)
+        unknown = Audit.objects.create(share_code=self.valid_share_code, requester='ghost@test.com')
+        Audit.objects.update(requester_user=None)
+
+        migration.backfill_requester_user(apps, None)
+
+        audit.refresh_from_db()
+        unknown.refresh_from_db()
+        self.assertEqual(audit.requester_user_id, self.company_user.id)
+        self.assertIsNone(unknown.requester_user_id)
+
+    def test_pipeline_drops_link_to_deleted_requester(self):
+        """Test buffered audits keep the email when the requester was deleted before the flush"""
+        import tempfile
+        from api.audit_pipeline import AuditPipeline
+
+        with tempfile.TemporaryDirectory() as spool_dir:
+            pipeline = AuditPipeline(spool_dir)
+            leaver = User.objects.create_user(email='leaver@test.com', password='testpass123')
+            pipeline.record(self.valid_share_code.id, leaver.email, requester_user_id=leaver.id)
+            leaver.delete()
+
+            self.assertEqual(pipeline.flush(), 1)
+
+        audit = Audit.objects.get(requester='leaver@test.com')
+        self.assertIsNone(audit.requester_user_id)
+
+
+class ContextListQueryCountTestCase(QueryCountMixin, BaseTestCase):
+    """Test context list endpoints do not issue a query per context"""
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user(email='lists@test.com', password='testpass123')
+        self.authenticate_user(self.owner)
+
+    def create_contexts(self, count, archived):
+        contexts = Context.objects.bulk_create([
+            Context(
+                user=self.owner, label=f'Ctx {i}', visibility='code', given='List',
+                archived=archived, archived_at=timezone.now() if archived else None
+            )
+            for i in range(count)
+        ])
+        ShareCode.objects.bulk_create(
+            [ShareCode(context=context) for context in contexts] +
+            [ShareCode(context=context, revoked=True) for context in contexts]
+        )
+
+    def test_active_list_query_count_is_constant(self):
+        """Test the active context list costs the same for 1, 100 and 1000 contexts"""
+        counts = []
+        for total in (1, 100, 1000):
+            Context.objects.filter(user=self.owner).delete()
+            self.create_contexts(total, archived=False)
+            queries, response = self.count_get_queries('/api/contexts/?page_size=100')
+            counts.append(queries)
+            self.assertEqual(len(response.data['data']), min(total, 100))
+            self.assertTrue(all(len(item['share_codes']) == 1 for item in response.data['data']))
+
+        self.assertEqual(len(set(counts)), 1, counts)
+
+    def test_archived_list_query_count_is_constant(self):
+        """Test the archived context list costs the same for 1, 100 and 1000 contexts"""
+        counts = []
+        for total in (1, 100, 1000):
+            Context.objects.filter(user=self.owner).delete()
+            self.create_contexts(total, archived=True)
+            queries, response = self.count_get_queries('/api/contexts/archived/')
+            counts.append(queries)
+            self.assertEqual(len(response.data), total)
+
+        self.assertEqual(len(set(counts)), 1, counts)
+
+    def test_serializer_falls_back_without_prefetch(self):
+        """Test the serializer still lists codes when used on a plain instance"""
+        from api.serializers import ContextSerializer
+
+        data = ContextSerializer(self.public_context).data
+        self.assertEqual([code['code'] for code in data['share_codes']], [self.valid_share_code.code])
+
+
+class RedemptionExpiryQueryCountTestCase(QueryCountMixin, BaseTestCase):
+    """Test redemption lists resolve fallback expiry without a query per row"""
+
+    def create_redemptions(self, count):
+        contexts = Context.objects.bulk_create([
+            Context(user=self.individual_user, label=f'Redeemed {i}', visibility='public', given='Red')
+            for i in range(count)
+        ])
+        expiring = ShareCode.objects.bulk_create([
+            ShareCode(context=context, expires_at=timezone.now() + timedelta(days=3), revoked=True)
+            for context in contexts
+        ])
+        open_codes = ShareCode.objects.bulk_create([ShareCode(context=context) for context in contexts])
+        Audit.objects.bulk_create([
+            Audit(share_code=code, requester=self.company_user.email, requester_user=self.company_user)
+            for code in open_codes
+        ])
+        return expiring
+
+    def test_fallback_expiry_is_annotated(self):
+        """Test a code without expiry reports its context's latest expiring code"""
+        expiring = self.create_redemptions(1)
+        self.authenticate_user(self.company_user)
+
+        _, response = self.count_get_queries('/api/company-redemptions/')
+        row = next(item for item in response.data['data'] if item['context'] == 'Redeemed 0')
+        self.assertEqual(row['expires_at'], expiring[0].expires_at.isoformat())
+
+    def test_query_count_is_constant(self):
+        """Test both redemption lists cost the same for 1 and 100 rows"""
+        for url, user in (('/api/company-redemptions/', self.company_user), ('/api/redemptions/', self.individual_user)):
+            self.authenticate_user(user)
+            counts = []
+            for total in (1, 100):
+                Context.objects.filter(label__startswith='Redeemed').delete()
+                self.create_redemptions(total)
+                queries, _ = self.count_get_queries(f'{url}?page_size=100')
+                counts.append(queries)
+            self.assertEqual(counts[0], counts[1], (url, counts))
+
+    def test_serializer_falls_back_without_annotation(self):
+        """Test the serializer still resolves the fallback for a plain audit"""
+        from api.serializers import CompanyRedemptionSerializer
+
+        expiring = self.create_redemptions(1)
+        audit = Audit.objects.get(share_code__context=expiring[0].context_id)
+        data = CompanyRedemptionSerializer(audit).data
+        self.assertEqual(data['expires_at'], expiring[0].expires_at.isoformat())
+
+
+class QueryPlanIndexTestCase(BaseTestCase):
+    """Test hot queries are served by indexes rather than full table scans"""
+
+    def assert_uses_index(self, queryset, table, index):
+        import re
+        from django.db import connection
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plan assertions are written for SQLite')
+
+        plan = queryset.explain()
+        self.assertIsNone(re.search(r'\bSCAN \w+\s*$', plan, re.MULTILINE), plan)
+        self.assertIn(f'{table} USING INDEX {index}', plan)
+
+    def test_company_redemptions_use_requester_index(self):
+        """Test company redemptions search audits by requester"""
+        queryset = AuditQueryService.get_company_redemptions(self.company_user.email)
+        self.assert_uses_index(queryset, 'api_audit', 'audit_requester_ts_idx')
+
+    def test_user_redemptions_use_indexes(self):
+        """Test individual redemptions walk context, code and audit indexes"""
+        queryset = AuditQueryService.get_user_redemptions(self.individual_user)
+        self.assert_uses_index(queryset, 'api_context', 'context_user_archived_idx')
+        self.assert_uses_index(queryset, 'api_audit', 'audit_code_ts_idx')
+
+    def test_expiry_watermark_scan_uses_index(self):
+        """Test the incremental expiry scan seeks from the watermark on the expiry index"""
+        from .expiry import ExpirationEngine
+
+        queryset = ExpirationEngine().expired_codes_after((timezone.now() - timedelta(days=1), 10))
+        self.assert_uses_index(queryset, 'api_sharecode', 'sharecode_expires_idx')
+
+    def test_notification_list_uses_index(self):
+        """Test the notification list and unread filter use the user index"""
+        queryset = Notification.objects.filter(user=self.individual_user).order_by('-created_at')
+        self.assert_uses_index(queryset, 'api_notification', 'notification_user_created_idx')
+        self.assert_uses_index(queryset.filter(read=False), 'api_notification', 'notification_user_created_idx')
+
+    def test_pending_consent_requests_use_index(self):
+        """Test pending consent requests search by requester and status"""
+        queryset = ConsentRequest.objects.filter(
+            requester=self.company_user,
+            status='pending'
+        ).select_related('context').order_by('-created_at')
+        self.assert_uses_index(queryset, 'api_consentrequest', 'consent_req_status_idx')
+
+    def test_expired_contexts_use_indexes(self):
+        """Test the expired context check uses context and share code indexes"""
+        from .expiry import ExpirationEngine
+
+        queryset = ExpirationEngine().expired_contexts().filter(user=self.individual_user)
+        self.assert_uses_index(queryset, 'api_context', 'context_user_archived_idx')
+        self.assertIn('sharecode_ctx_exp_rev_idx', queryset.explain())
+
+
+class KeysetPaginationTestCase(BaseTestCase):
+    """Test the opt-in cursor mode of list endpoints"""
+
+    def setUp(self):
+        super().setUp()
+        Notification.objects.filter(user=self.individual_user).delete()
+        Notification.objects.bulk_create([
+            Notification(user=self.individual_user, type='redemption', title=f'N{i}', message='m')
+            for i in range(45)
+        ])
+        # Give half the rows the same timestamp so the id tie-breaker is exercised
+        ids = list(Notification.objects.filter(user=self.individual_user).values_list('id', flat=True))
+        Notification.objects.filter(id__in=ids[:20]).update(created_at=timezone.now() - timedelta(hours=1))
+        self.authenticate_user(self.individual_user)
+
+    def walk(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        seen, pages = [], []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(item['id'] for item in response.data['data'])
+            pages.append((response.data['pagination'], [q['sql'] for q in ctx.captured_queries]))
+            url = response.data['pagination']['next']
+        return seen, pages
+
+    def test_cursor_walk_returns_every_row_once_in_order(self):
+        """Test following next links visits all rows once in (created_at, id) order"""
+        seen, pages = self.walk('/api/notifications/?cursor=&page_size=20')
+
+        expected = list(Notification.objects.filter(
+            user=self.individual_user
+        ).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(pages), 3)
+        self.assertFalse(pages[0][0]['has_previous'])
+        self.assertTrue(pages[1][0]['has_previous'])
+        self.assertFalse(pages[-1][0]['has_next'])
+
+    def test_cursor_mode_skips_count_and_offset(self):
+        """Test keyset pages issue no COUNT or OFFSET unless a count is requested"""
+        _, pages = self.walk('/api/notifications/?cursor=&page_size=20')
+        for pagination, queries in pages:
+            self.assertIsNone(pagination['count'])
+            self.assertFalse(any('COUNT(' in sql or 'OFFSET' in sql for sql in queries), queries)
+
+        response = self.client.get('/api/notifications/?cursor=&count=true')
+        self.assertEqual(response.data['pagination']['count'], 45)
+
+    def test_page_number_mode_is_default(self):
+        """Test lists without a cursor keep page-number pagination"""
+        response = self.client.get('/api/notifications/?page=2')
+        self.assertEqual(response.data['pagination']['current_page'], 2)
+        self.assertEqual(response.data['pagination']['count'], 45)
+
+    def test_invalid_cursor_is_rejected(self):
+        """Test a malformed cursor returns 404"""
+        response = self.client.get('/api/notifications/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_malformed_cursor_payloads_are_rejected(self):
+        """Test cursors with values of the wrong type for their fields return 404"""
+        import base64
+
+        payloads = [
+            ['abc', 1], [None, 1], [{'a': 1}, 2], ['2024-01-01T00:00:00+00:00', 'x'],
+            ['2024-01-01T00:00:00+00:00', True], ['2024-01-01T00:00:00+00:00', 10 ** 30], [[1], 1],
+        ]
+        for payload in payloads:
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+            response = self.client.get(f'/api/notifications/?cursor={cursor}')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, payload)
+
+        cursor = base64.urlsafe_b64encode(b'["2024-01-01T00:00:00+00:00",5]').decode().rstrip('=')
+        response = self.client.get(f'/api/notifications/?cursor={cursor}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_redemptions_support_cursor_mode(self):
+        """Test redemption lists page by (ts, id)"""
+        for _ in range(3):
+            Audit.objects.create(share_code=self.valid_share_code, requester=self.company_user.email)
+        self.authenticate_user(self.company_user)
+
+        seen, _ = self.walk('/api/company-redemptions/?cursor=&page_size=2')
+        expected = list(AuditQueryService.get_company_redemptions(
+            self.company_user.email
+        ).order_by('-ts', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+
+class NotificationSyncTestCase(BaseTestCase):
+    """Test notification summary, delta sync and bulk mark-read endpoints"""
+
+    def setUp(self):
+        super().setUp()
+        Notification.objects.filter(user=self.individual_user).delete()
+        self.notifications = [
+            Notification.objects.create(user=self.individual_user, type='redemption', title=f'N{i}', message='m')
+            for i in range(5)
+        ]
+        Notification.objects.filter(id=self.notifications[0].id).update(read=True)
+        Notification.objects.create(user=self.company_user, type='redemption', title='Other', message='m')
+        self.authenticate_user(self.individual_user)
+
+    def test_summary_returns_unread_count_and_latest_id(self):
+        """Test the summary reports only the user's own unread notifications"""
+        response = self.client.get('/api/notifications/summary/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['unread_count'], 4)
+        self.assertEqual(response.data['data']['latest_id'], self.notifications[-1].id)
+
+    def test_since_returns_only_newer_notifications(self):
+        """Test delta mode returns rows created after the given id, oldest first"""
+        response = self.client.get(f'/api/notifications/?since={self.notifications[2].id}')
+
+        data = response.data['data']
+        self.assertEqual([item['id'] for item in data['results']], [self.notifications[3].id, self.notifications[4].id])
+        self.assertEqual(data['latest_id'], self.notifications[4].id)
+        self.assertEqual(data['unread_count'], 4)
+        self.assertFalse(data['has_more'])
+
+    def test_since_with_nothing_new_keeps_latest_id(self):
+        """Test an up-to-date client gets an empty delta"""
+        response = self.client.get(f'/api/notifications/?since={self.notifications[-1].id}')
+
+        self.assertEqual(response.data['data']['results'], [])
+        self.assertEqual(response.data['data']['latest_id'], self.notifications[-1].id)
+
+    def test_since_pages_forward_when_more_remain(self):
+        """Test a capped delta ends at the last returned row so the next request continues after it"""
+        from .response_serializers import KeysetPagination
+
+        seen = []
+        since = self.notifications[0].id
+        with patch.object(KeysetPagination, 'max_page_size', 2):
+            while True:
+                data = self.client.get(f'/api/notifications/?since={since}').data['data']
+                seen.extend(item['id'] for item in data['results'])
+                since = data['latest_id']
+                if not data['has_more']:
+                    break
+
+        self.assertEqual(seen, [notification.id for notification in self.notifications[1:]])
+
+    def test_since_rejects_non_integer(self):
+        """Test delta mode validates the since parameter"""
+        response = self.client.get('/api/notifications/?since=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_mark_all_read_uses_single_update(self):
+        """Test bulk mark-read clears every unread notification in one UPDATE"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/notifications/mark-read/', {}, format='json')
+
+        self.assertEqual(response.data['data']['updated'], 4)
+        self.assertEqual(sum(1 for q in ctx.captured_queries if q['sql'].startswith('UPDATE')), 1)
+        self.assertEqual(NotificationService.unread_count(self.individual_user), 0)
+        self.assertFalse(Notification.objects.get(user=self.company_user).read)
+
+    def test_mark_selected_read(self):
+        """Test bulk mark-read can target specific ids owned by the user"""
+        other = Notification.objects.get(user=self.company_user)
+        response = self.client.post(
+            '/api/notifications/mark-read/',
+            {'ids': [self.notifications[1].id, other.id]},
+            format='json'
+        )
+
+        self.assertEqual(response.data['data']['updated'], 1)
+        self.assertFalse(Notification.objects.get(id=other.id).read)
+        self.assertEqual(NotificationService.unread_count(self.individual_user), 3)
+
+    def test_mark_read_rejects_invalid_ids(self):
+        """Test bulk mark-read validates the ids payload"""
+        for ids in ('all', [True], [1.5], ['1']):
+            response = self.client.post('/api/notifications/mark-read/', {'ids': ids}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, ids)
+
+
+@override_settings(NOTIFICATION_STREAM={'ENABLED': True})
+class NotificationStreamTestCase(BaseTestCase):
+    """Test the notification event bus and SSE stream"""
+
+    def setUp(self):
+        super().setUp()
+        import asyncio
+        from .events import InMemoryBroker, reset_broker
+
+        reset_broker()
+        self.addCleanup(reset_broker)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.broker = InMemoryBroker()
+
+    def drain(self, subscription):
+        import asyncio
+
+        self.loop.run_until_complete(asyncio.sleep(0))
+        events = []
+        while not subscription.queue.empty():
+            events.append(subscription.queue.get_nowait())
+        return events
+
+    def test_broker_delivers_only_to_recipient(self):
+        """Test events reach the user's subscriptions and no one else's"""
+        mine = self.broker.subscribe(1, loop=self.loop)
+        other = self.broker.subscribe(2, loop=self.loop)
+
+        self.broker.publish(1, {'id': 10})
+
+        self.assertEqual(self.drain(mine), [{'id': 10}])
+        self.assertEqual(self.drain(other), [])
+
+    def test_full_queue_marks_overflow(self):
+        """Test a slow subscriber drops events and is flagged for resync"""
+        subscription = self.broker.subscribe(1, maxsize=2, loop=self.loop)
+        for event_id in range(5):
+            self.broker.publish(1, {'id': event_id})
+
+        self.assertEqual(len(self.drain(subscription)), 2)
+        self.assertTrue(subscription.overflowed)
+
+    def test_unsubscribe_stops_delivery(self):
+        """Test unsubscribed streams receive nothing"""
+        subscription = self.broker.subscribe(1, loop=self.loop)
+        self.broker.unsubscribe(subscription)
+
+        self.broker.publish(1, {'id': 1})
+        self.assertFalse(self.broker.has_subscribers(1))
+        self.assertEqual(self.drain(subscription), [])
+
+    def test_service_publishes_on_commit(self):
+        """Test NotificationService publishes created and bulk-created notifications after commit"""
+        with patch('api.events.get_broker', return_value=self.broker):
+            subscription = self.broker.subscribe(self.individual_user.id, loop=self.loop)
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                notification = NotificationService.create_consent_request_notification(
+                    ConsentRequest.objects.create(context=self.consent_context, requester=self.company_user)
+                )
+            self.assertEqual(self.drain(subscription), [])
+
+            for callback in callbacks:
+                callback()
+            events = self.drain(subscription)
+
+        self.assertEqual([event['id'] for event in events], [notification.id])
+        self.assertEqual(events[0]['context_label'], self.consent_context.label)
+
+    def test_expiry_engine_publishes_bulk_notifications(self):
+        """Test notifications bulk-created by the expiry engine reach open streams"""
+        from .expiry import ExpirationEngine
+
+        self.code_protected_context.auto_archive_expired = True
+        self.code_protected_context.save()
+        with patch('api.events.get_broker', return_value=self.broker):
+            subscription = self.broker.subscribe(self.individual_user.id, loop=self.loop)
+            with self.captureOnCommitCallbacks(execute=True):
+                ExpirationEngine().run()
+            events = self.drain(subscription)
+
+        self.assertEqual([event['type'] for event in events], ['context_expired'])
+
+    def test_stream_replays_then_streams_live_events(self):
+        """Test the stream resumes after Last-Event-ID, then forwards live events and heartbeats"""
+        from asgiref.sync import async_to_sync
+        from .events import notification_stream
+
+        Notification.objects.filter(user=self.individual_user).delete()
+        seen = Notification.objects.create(user=self.individual_user, type='redemption', title='Seen', message='m')
+        missed = Notification.objects.create(user=self.individual_user, type='redemption', title='Missed', message='m')
+
+        async def consume():
+            subscription = self.broker.subscribe(self.individual_user.id)
+            stream = notification_stream(subscription, last_event_id=seen.id, heartbeat_interval=0.01)
+            frames = [await stream.__anext__(), await stream.__anext__()]
+            self.broker.publish(self.individual_user.id, {'id': missed.id})
+            self.broker.publish(self.individual_user.id, {'id': missed.id + 100, 'title': 'Live'})
+            frames.append(await stream.__anext__())
+            frames.append(await stream.__anext__())
+            await stream.aclose()
+            return frames
+
+        retry, replayed, live, heartbeat = async_to_sync(consume)()
+
+        self.assertTrue(retry.startswith('retry:'))
+        self.assertIn(f'id: {missed.id}\n', replayed)
+        self.assertIn(f'id: {missed.id + 100}\n', live)
+        self.assertEqual(heartbeat, ': heartbeat\n\n')
+
+    def test_stream_resyncs_from_database_after_overflow(self):
+        """Test events dropped by a full queue are recovered from the database"""
+        from asgiref.sync import async_to_sync, sync_to_async
+        from .events import notification_stream
+
+        Notification.objects.filter(user=self.individual_user).delete()
+
+        async def consume():
+            subscription = self.broker.subscribe(self.individual_user.id, maxsize=1)
+            stream = notification_stream(subscription, heartbeat_interval=0.01)
+            await stream.__anext__()
+            created = await sync_to_async(lambda: [
+                Notification.objects.create(user=self.individual_user, type='redemption', title=f'N{i}', message='m')
+                for i in range(3)
+            ])()
+            for notification in created:
+                self.broker.publish(self.individual_user.id, {'id': notification.id})
+            frames = [await stream.__anext__() for _ in range(3)]
+            await stream.aclose()
+            return created, frames
+
+        created, frames = async_to_sync(consume)()
+
+        for notification, frame in zip(created, frames):
+            self.assertTrue(frame.startswith(f'id: {notification.id}\n'), frame)
+
+    def test_database_broker_delivers_rows_written_elsewhere(self):
+        """Test notifications saved without publishing, as by another process, reach open streams once"""
+        from .events import DatabaseBroker
+
+        broker = DatabaseBroker()
+        broker._ensure_poller = lambda: None
+        subscription = broker.subscribe(self.individual_user.id, loop=self.loop)
+        broker.poll()
+        self.drain(subscription)
+
+        notification = Notification.objects.create(user=self.individual_user, type='redemption', title='Cron', message='m')
+        Notification.objects.create(user=self.company_user, type='redemption', title='Other', message='m')
+        broker.poll()
+        broker.poll()
+
+        self.assertEqual([event['id'] for event in self.drain(subscription)], [notification.id])
+
+    def test_stream_is_not_served_under_wsgi(self):
+        """Test WSGI requests get 404 from the stream and ticket endpoints so clients poll"""
+        self.authenticate_user(self.individual_user)
+
+        self.assertEqual(self.client.get('/api/notifications/stream/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.post('/api/notifications/stream/ticket/').status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_stream_is_off_by_default(self):
+        """Test the stream stays off unless NOTIFICATION_STREAM['ENABLED'] is set"""
+        from django.test import AsyncClient
+
+        with self.settings(NOTIFICATION_STREAM={}):
+            response = await AsyncClient().get('/api/notifications/stream/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_stream_requires_credentials(self):
+        """Test the stream rejects missing or invalid tickets and access tokens in the URL"""
+        from asgiref.sync import sync_to_async
+        from django.test import AsyncClient
+
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.individual_user).access_token))()
+        for url in ('', '?ticket=invalid', f'?token={token}'):
+            response = await AsyncClient().get(f'/api/notifications/stream/{url}')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED, url)
+
+    async def test_stream_accepts_ticket(self):
+        """Test EventSource clients open the stream with a ticket issued for their access token"""
+        from asgiref.sync import sync_to_async
+        from django.test import AsyncClient
+
+        client = AsyncClient()
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.individual_user).access_token))()
+        ticket = await client.post('/api/notifications/stream/ticket/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(ticket.status_code, status.HTTP_200_OK)
+
+        response = await client.get(f"/api/notifications/stream/?ticket={ticket.json()['data']['ticket']}")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        first = await response.streaming_content.__anext__()
+        self.assertTrue(first.startswith(b'retry:'))
+        await response.streaming_content.aclose()
+
+    def test_expired_ticket_is_rejected(self):
+        """Test tickets stop working after TICKET_MAX_AGE"""
+        from .events import issue_stream_ticket, read_stream_ticket
+
+        ticket = issue_stream_ticket(self.individual_user.id)
+        self.assertEqual(read_stream_ticket(ticket), self.individual_user.id)
+        with self.settings(NOTIFICATION_STREAM={'TICKET_MAX_AGE': -1}):
+            self.assertIsNone(read_stream_ticket(ticket))
+
+
+class CodeAllocatorTestCase(BaseTestCase):
+    """Test the pre-generated share code pool"""
+
+    def setUp(self):
+        super().setUp()
+        from .code_allocator import reset_code_allocator
+
+        reset_code_allocator()
+        self.addCleanup(reset_code_allocator)
+
+    def make_allocator(self, codes, **kwargs):
+        from .code_allocator import CodeAllocator
+
+        supply = iter(codes)
+        return CodeAllocator(background=False, generator=lambda: next(supply), **kwargs)
+
+    def test_generate_code_format(self):
+        """Test generated codes are 8 characters from the share code alphabet"""
+        from .models import ALPHABET, generate_code
+
+        codes = {generate_code() for _ in range(200)}
+        self.assertEqual(len(codes), 200)
+        self.assertTrue(all(len(code) == 8 and set(code) <= set(ALPHABET) for code in codes))
+
+    def test_pool_skips_codes_already_in_use(self):
+        """Test a refill rejects codes that exist in the database and duplicates in the batch"""
+        existing = self.valid_share_code.code
+        allocator = self.make_allocator([existing, 'AAAA0001', 'AAAA0001', 'AAAA0002', 'AAAA0003'], batch_size=3, low_water=0)
+
+        allocator.refill()
+        allocated = {allocator.allocate(), allocator.allocate()}
+
+        self.assertEqual(allocated, {'AAAA0001', 'AAAA0002'})
+        self.assertEqual(allocator.stats()['rejected'], 1)
+
+    def test_refill_below_low_water(self):
+        """Test the pool is topped up once it drops below the low-water mark"""
+        allocator = self.make_allocator((f'CODE{i:04d}' for i in range(100)), batch_size=5, low_water=3)
+
+        codes = [allocator.allocate() for _ in range(8)]
+
+        self.assertEqual(len(set(codes)), 8)
+        self.assertGreaterEqual(allocator.available(), 2)
+        self.assertGreaterEqual(allocator.refills, 2)
+
+    def test_refill_uses_one_query_per_chunk(self):
+        """Test uniqueness is checked in bulk rather than per code"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .code_allocator import CodeAllocator, LOOKUP_CHUNK
+
+        allocator = CodeAllocator(batch_size=LOOKUP_CHUNK * 2, low_water=1, background=False)
+        with CaptureQueriesContext(connection) as ctx:
+            allocator.refill()
+
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(allocator.available(), LOOKUP_CHUNK * 2)
+
+    def test_service_uses_pool(self):
+        """Test ShareCodeService mints codes from the allocator"""
+        with patch('api.services.allocate_code', return_value='POOL0001'):
+            share_code = ShareCodeService.create_share_code(self.public_context)
+
+        self.assertEqual(share_code.code, 'POOL0001')
+
+    def test_service_retries_on_collision(self):
+        """Test a code taken since it was pooled is replaced instead of failing the request"""
+        codes = iter([self.valid_share_code.code, 'FRESH001'])
+        with patch('api.services.allocate_code', side_effect=lambda: next(codes)):
+            share_code = ShareCodeService.create_share_code(self.public_context)
+
+        self.assertEqual(share_code.code, 'FRESH001')
+
+    def test_service_gives_up_after_repeated_collisions(self):
+        """Test persistent collisions surface as an IntegrityError"""
+        from django.db import IntegrityError
+
+        with patch('api.services.allocate_code', return_value=self.valid_share_code.code):
+            with self.assertRaises(IntegrityError):
+                ShareCodeService.create_share_code(self.public_context)
+
+
+class BulkShareCodeTestCase(BaseTestCase):
+    """Test bulk share code minting"""
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_user(self.individual_user)
+
+    def mint(self, **payload):
+        payload.setdefault('context_id', self.code_protected_context.id)
+        return self.client.post('/api/sharecodes/bulk/', payload, format='json')
+
+    def read_lines(self, response):
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_bulk_mint_streams_json_lines(self):
+        """Test codes are created and returned one JSON object per line"""
+        expires_at = timezone.now() + timedelta(days=7)
+        response = self.mint(count=25, expires_at=expires_at.isoformat())
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.read_lines(response)]
+        self.assertEqual(len({row['code'] for row in rows}), 25)
+        self.assertEqual(
+            ShareCode.objects.filter(context=self.code_protected_context, code__in=[row['code'] for row in rows],
+                                     expires_at=expires_at).count(),
+            25
+        )
+
+    def test_bulk_mint_csv_with_per_code_expiry(self):
+        """Test per-code expiries are applied and returned as CSV"""
+        expiries = [(timezone.now() + timedelta(days=i + 1)).isoformat() for i in range(3)]
+        response = self.mint(count=3, expires_at_list=expiries, format='csv')
+
+        lines = self.read_lines(response)
+        self.assertEqual(lines[0], 'code,expires_at')
+        codes = [line.split(',')[0] for line in lines[1:]]
+        stored = dict(ShareCode.objects.filter(code__in=codes).values_list('code', 'expires_at'))
+        self.assertEqual(sorted(stored.values()), sorted(
+            ShareCode._meta.get_field('expires_at').to_python(value) for value in expiries
+        ))
+
+    def test_bulk_mint_uses_batched_queries(self):
+        """Test thousands of codes are minted without a query per code"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.mint(count=2000)
+            self.read_lines(response)
+
+        self.assertEqual(ShareCode.objects.filter(context=self.code_protected_context).count(), 2001)
+        self.assertLess(len(ctx.captured_queries), 40)
+
+    def test_bulk_mint_validation(self):
+        """Test counts, limits and expiry lists are validated"""
+        self.assertEqual(self.mint(count=0).status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(SHARE_CODE_BULK_MAX=10):
+            self.assertEqual(self.mint(count=11).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.mint(count=2, expires_at_list=[timezone.now().isoformat()])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_mint_requires_context_owner(self):
+        """Test codes cannot be minted for another user's context"""
+        self.authenticate_user(self.company_user)
+        self.assertEqual(self.mint(count=5).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_mint_retries_on_collision(self):
+        """Test a colliding batch is regenerated rather than failing"""
+        batches = iter([[self.valid_share_code.code, 'BULK0001'], ['BULK0002', 'BULK0003']])
+        with patch('api.services.allocate_codes', side_effect=lambda count: next(batches)):
+            share_codes = ShareCodeService.bulk_create_share_codes(self.public_context, 2)
+
+        self.assertEqual([code.code for code in share_codes], ['BULK0002', 'BULK0003'])
+
+    def test_bulk_mint_schedules_earliest_expiry(self):
+        """Test bulk codes schedule their context once, at the earliest deadline, as the post_save signal would"""
+        earliest = timezone.now() - timedelta(minutes=1)
+        with patch('api.expiry_scheduler.schedule_expiry') as mock_schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                ShareCodeService.bulk_create_share_codes(
+                    self.public_context, 2, expires_at=[earliest + timedelta(days=1), earliest]
+                )
+
+        mock_schedule.assert_called_once_with(self.public_context.pk, earliest)
+
+
+class ShareCodeFilterTestCase(QueryCountMixin, BaseTestCase):
+    """Test the share code membership filter"""
+
+    def setUp(self):
+        super().setUp()
+        from .code_filter import reset_code_filter
+
+        reset_code_filter()
+        self.addCleanup(reset_code_filter)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test every added value is reported present and the error rate stays near target"""
+        from .code_filter import BloomFilter
+
+        bloom = BloomFilter(capacity=5000, error_rate=0.01)
+        added = [f'IN{i:06d}' for i in range(5000)]
+        for value in added:
+            bloom.add(value)
+
+        self.assertTrue(all(value in bloom for value in added))
+        false_positives = sum(f'OUT{i:06d}' in bloom for i in range(20000))
+        self.assertLess(false_positives / 20000, 0.02)
+        self.assertAlmostEqual(bloom.estimated_error_rate(), 0.01, delta=0.005)
+
+    def test_unknown_code_rejected_without_a_query(self):
+        """Test a never-issued code gets a 404 from the built filter without touching the database"""
+        from .code_filter import get_code_filter
+
+        get_code_filter().build()
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/codes/NOPE0000/')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_saved_and_bulk_created_codes_are_added(self):
+        """Test codes created after the build pass the filter"""
+        from .code_filter import get_code_filter
+
+        code_filter = get_code_filter()
+        code_filter.build()
+        saved = ShareCode.objects.create(context=self.public_context)
+        bulk = ShareCodeService.bulk_create_share_codes(self.public_context, 3)
+
+        queries, found = self.count_queries(
+            lambda: [code_filter.might_exist(code) for code in [saved.code, *(share_code.code for share_code in bulk)]]
+        )
+        self.assertTrue(all(found))
+        self.assertEqual(queries, 0)
+
+        response = self.client.get(f'/api/codes/{bulk[0].code}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_codes_from_other_processes_are_caught_up_by_id(self):
+        """Test codes inserted without signals are added by the next catch-up, including late commits"""
+        from .code_filter import ShareCodeFilter
+
+        code_filter = ShareCodeFilter(catch_up_interval=60, catch_up_overlap=5, background=False)
+        code_filter.build()
+        ShareCode.objects.bulk_create([ShareCode(context=self.public_context, code='ELSEWHRE')])
+        self.assertFalse(code_filter.might_exist('ELSEWHRE'))
+
+        code_filter._caught_up_monotonic -= 60
+        queries, found = self.count_queries(lambda: code_filter.might_exist('ELSEWHRE'))
+        self.assertTrue(found)
+        self.assertEqual(queries, 1)
+
+        # A row committed after a catch-up with an id below the highest one seen is re-read
+        top = ShareCode.objects.order_by('-id').values_list('id', flat=True).first()
+        ShareCode.objects.bulk_create([ShareCode(id=top + 3, context=self.public_context, code='NEWERONE')])
+        code_filter.catch_up()
+        ShareCode.objects.bulk_create([ShareCode(id=top + 2, context=self.public_context, code='LATECMT1')])
+        code_filter.catch_up()
+        self.assertTrue(code_filter.might_exist('LATECMT1'))
+
+    def test_rebuild_swaps_in_a_new_filter(self):
+        """Test the filter is rebuilt once its rebuild interval has passed, serving the old one until then"""
+        from .code_filter import ShareCodeFilter
+
+        code_filter = ShareCodeFilter(rebuild_interval=60, catch_up_interval=60, background=False)
+        code_filter.might_exist(self.valid_share_code.code)
+        first = code_filter._bloom
+        code_filter.might_exist(self.valid_share_code.code)
+        self.assertIs(code_filter._bloom, first)
+
+        code_filter._built_monotonic -= 60
+        code_filter.might_exist(self.valid_share_code.code)
+        self.assertIsNot(code_filter._bloom, first)
+
+    def test_background_filter_never_builds_on_the_request(self):
+        """Test a lookup with background maintenance starts the worker and answers without a query"""
+        from .code_filter import ShareCodeFilter
+
+        code_filter = ShareCodeFilter(background=True)
+        with patch.object(ShareCodeFilter, 'start') as start:
+            queries, found = self.count_queries(lambda: code_filter.might_exist('NOPE0000'))
+
+        start.assert_called_once_with()
+        self.assertTrue(found)
+        self.assertEqual(queries, 0)
+
+    def test_warmup_starts_filter_after_first_request(self):
+        """Test warm-up starts the filter's worker on the worker's first request only"""
+        from django.core.signals import request_started
+        from .warmup import build_code_filter_in_background, CODE_FILTER_DISPATCH_UID
+
+        request_started.connect(build_code_filter_in_background, dispatch_uid=CODE_FILTER_DISPATCH_UID)
+        with patch('api.code_filter.start_code_filter') as start_code_filter:
+            self.client.get('/api/codes/NOPE0000/')
+            self.client.get('/api/codes/NOPE0000/')
+
+        start_code_filter.assert_called_once_with()
+
+    def test_filter_resizes_past_capacity(self):
+        """Test a full filter keeps serving and is rebuilt with room for the current codes"""
+        from .code_filter import ShareCodeFilter
+
+        code_filter = ShareCodeFilter(min_capacity=4, background=False)
+        first = code_filter.build()
+        code_filter.add(*(f'GROW{i:04d}' for i in range(10)))
+
+        self.assertIs(code_filter._bloom, first)
+        self.assertTrue(code_filter.might_exist(self.valid_share_code.code))
+        self.assertIsNot(code_filter._bloom, first)
+        self.assertGreaterEqual(code_filter.report()['capacity'], 2 * ShareCode.objects.count())
+
+    def test_disabled_filter_defers_to_database(self):
+        """Test lookups hit the database when the filter is disabled"""
+        from .code_filter import code_might_exist
+
+        with self.settings(SHARECODE_FILTER={'ENABLED': False}):
+            self.assertTrue(code_might_exist('NOPE0000'))
+
+
+class ExpirySchedulerTestCase(BaseTestCase):
+    """Test the per-process expiry scheduler"""
+
+    def setUp(self):
+        super().setUp()
+        from .expiry_scheduler import ExpiryScheduler
+
+        self.scheduler = ExpiryScheduler(background=False)
+
+    def make_context(self, label, expires_at):
+        context = Context.objects.create(
+            user=self.individual_user,
+            label=label,
+            visibility='code',
+            given='Exp',
+            auto_archive_expired=True
+        )
+        ShareCode.objects.create(context=context, expires_at=expires_at)
+        return context
+
+    def test_only_due_contexts_are_expired(self):
+        """Test a run processes contexts whose deadline passed and keeps later ones scheduled"""
+        from .expiry import ExpirationReport
+
+        now = timezone.now()
+        due = self.make_context('Due', now - timedelta(minutes=1))
+        later = self.make_context('Later', now + timedelta(minutes=30))
+        self.scheduler.schedule(due.id, now - timedelta(minutes=1))
+        self.scheduler.schedule(later.id, now + timedelta(minutes=30))
+
+        with patch('api.expiry.ExpirationEngine.run_sharded', autospec=True, return_value=ExpirationReport()) as mock_run:
+            self.scheduler.run_once(now=now)
+
+        self.assertIn(due.id, mock_run.call_args.kwargs['context_ids'])
+        self.assertNotIn(later.id, mock_run.call_args.kwargs['context_ids'])
+        self.assertEqual(self.scheduler._scheduled[later.id], now + timedelta(minutes=30))
+
+    def test_failed_run_puts_deadlines_back(self):
+        """Test deadlines taken by a run that raised are retried by the next run"""
+        from .expiry import ExpirationReport
+
+        now = timezone.now()
+        due = self.make_context('Due', now - timedelta(minutes=1))
+        self.scheduler.schedule(due.id, now - timedelta(minutes=1))
+
+        with patch('api.expiry.ExpirationEngine.run_sharded', side_effect=RuntimeError('database is down')):
+            with self.assertRaises(RuntimeError):
+                self.scheduler.run_once(now=now)
+        self.assertIn(due.id, self.scheduler._scheduled)
+
+        with patch('api.expiry.ExpirationEngine.run_sharded', autospec=True, return_value=ExpirationReport()) as mock_run:
+            self.scheduler.run_once(now=now + timedelta(seconds=1))
+        self.assertIn(due.id, mock_run.call_args.kwargs['context_ids'])
+
+    def test_failed_sweep_is_requested_again(self):
+        """Test a sweep that raised stays requested"""
+        self.scheduler.request_sweep()
+        with patch('api.expiry.ExpirationEngine.run_incremental', side_effect=RuntimeError('database is down')):
+            with self.assertRaises(RuntimeError):
+                self.scheduler.run_once()
+        self.assertTrue(self.scheduler._sweep_requested)
+
+    def test_backoff_doubles_up_to_limit(self):
+        """Test consecutive failures wait exponentially longer, capped at max_backoff"""
+        from .expiry_scheduler import ExpiryScheduler
+
+        scheduler = ExpiryScheduler(retry_delay=5, max_backoff=30, background=False)
+        self.assertEqual([scheduler.backoff(failures) for failures in range(1, 6)], [5, 10, 20, 30, 30])
+
+    def test_worker_backs_off_when_runs_fail(self):
+        """Test the background thread sleeps between failing runs instead of spinning"""
+        import time
+        from .expiry_scheduler import ExpiryScheduler
+
+        scheduler = ExpiryScheduler(retry_delay=60, background=True)
+        with patch.object(ExpiryScheduler, 'load_upcoming', side_effect=RuntimeError('database is down')) as load, \
+                self.assertLogs('api.expiry_scheduler', level='ERROR'):
+            scheduler.request_sweep()
+            time.sleep(0.2)
+            scheduler.stop()
+
+        self.assertEqual(load.call_count, 1)
+
+    def test_due_context_is_archived(self):
+        """Test the scheduled run archives the context through the expiration engine"""
+        now = timezone.now()
+        context = self.make_context('Due', now - timedelta(minutes=1))
+        self.scheduler.schedule(context.id, now - timedelta(minutes=1))
+
+        self.scheduler.run_once()
+
+        context.refresh_from_db()
+        self.assertTrue(context.archived)
+        self.assertTrue(context.expiration_processed)
+        self.assertEqual(self.scheduler.pending(), 0)
+
+    def test_duplicate_deadlines_coalesce(self):
+        """Test a context is held once, at its earliest deadline"""
+        now = timezone.now()
+        self.assertTrue(self.scheduler.schedule(1, now + timedelta(minutes=10)))
+        self.assertFalse(self.scheduler.schedule(1, now + timedelta(minutes=20)))
+        self.assertTrue(self.scheduler.schedule(1, now + timedelta(minutes=5)))
+
+        self.assertEqual(self.scheduler.pending(), 1)
+        self.assertEqual(self.scheduler.due(now + timedelta(minutes=6)), {1})
+        self.assertEqual(self.scheduler.due(now + timedelta(minutes=30)), set())
+
+    def test_sweep_requests_coalesce(self):
+        """Test repeated sweep requests run the engine once from the watermark"""
+        from .expiry import ExpirationReport
+
+        for _ in range(3):
+            self.scheduler.request_sweep()
+
+        with patch('api.expiry.ExpirationEngine.run_incremental', autospec=True, return_value=ExpirationReport()) as mock_run:
+            self.scheduler.run_once()
+            self.scheduler.run_once()
+
+        mock_run.assert_called_once()
+        self.assertNotIn('context_ids', mock_run.call_args.kwargs)
+
+    def test_horizon_loads_unprocessed_deadlines(self):
+        """Test deadlines inside the horizon are loaded from the database and later ones are not"""
+        now = timezone.now()
+        soon = self.make_context('Soon', now + timedelta(minutes=5))
+        distant = self.make_context('Distant', now + timedelta(days=2))
+
+        self.scheduler.load_upcoming(now)
+
+        self.assertIn(soon.id, self.scheduler._scheduled)
+        self.assertNotIn(distant.id, self.scheduler._scheduled)
+        self.assertFalse(self.scheduler.schedule(distant.id, now + timedelta(days=2)))
+
+    def test_contexts_in_skipped_shards_are_retried(self):
+        """Test due contexts whose shard another worker holds are rescheduled after the retry delay"""
+        from .expiry import ExpirationReport
+
+        now = timezone.now()
+        report = ExpirationReport()
+        report.skipped_shards = [1]
+        self.scheduler.schedule(5, now - timedelta(minutes=1))
+        self.scheduler.schedule(8, now - timedelta(minutes=1))
+
+        with patch('api.expiry.ExpirationEngine.run_sharded', autospec=True, return_value=report):
+            self.scheduler.run_once(now=now)
+
+        self.assertEqual(self.scheduler._scheduled, {5: now + self.scheduler.retry_delay})
+
+    def test_disabled_scheduler_is_not_created(self):
+        """Test scheduling is a no-op when the scheduler is disabled"""
+        from .expiry_scheduler import get_expiry_scheduler, schedule_expiry
+
+        self.assertIsNone(get_expiry_scheduler())
+        schedule_expiry(self.public_context.id, timezone.now())
+
+    def test_check_endpoint_requests_sweep(self):
+        """Test the manual check endpoint asks the scheduler for a sweep"""
+        self.authenticate_user(self.individual_user)
+
+        with patch('api.views.context_views.request_expiry_sweep') as mock_sweep:
+            response = self.client.post('/api/check-expired-contexts/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_sweep.assert_called_once()
+
+
+
+class JobLeaseTestCase(BaseTestCase):
+    """Test database job leases and sharded expiry runs"""
+
+    def expire_context(self, label):
+        context = Context.objects.create(
+            user=self.individual_user, label=label, visibility='code', given='Exp', auto_archive_expired=True
+        )
+        ShareCode.objects.create(context=context, expires_at=timezone.now() - timedelta(minutes=1))
+        return context
+
+    def test_only_one_owner_holds_a_lease(self):
+        """Test a held lease cannot be acquired by another owner until released"""
+        from .leases import Lease
+
+        first = Lease('job', owner='worker-1')
+        second = Lease('job', owner='worker-2')
+
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertTrue(first.acquire())
+
+        first.release()
+        self.assertTrue(second.acquire())
+        self.assertEqual(JobLease.objects.get(name='job').owner, 'worker-2')
+
+    def test_expired_lease_is_taken_over(self):
+        """Test a crashed holder's lease is taken over once it expires, and the old holder cannot renew"""
+        from .leases import Lease
+
+        crashed = Lease('job', owner='worker-1')
+        crashed.acquire()
+        JobLease.objects.filter(name='job').update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        survivor = Lease('job', owner='worker-2')
+        self.assertTrue(survivor.acquire())
+        with self.assertLogs('api.leases', 'WARNING'):
+            self.assertFalse(crashed.renew())
+        self.assertTrue(survivor.renew())
+
+    def test_lease_is_released_by_context_manager(self):
+        """Test leaving the with block frees the lease for other workers"""
+        from .leases import Lease
+
+        with Lease('job', owner='worker-1') as acquired:
+            self.assertTrue(acquired)
+            self.assertFalse(Lease('job', owner='worker-2').acquire())
+
+        self.assertTrue(Lease('job', owner='worker-2').acquire())
+
+    def test_sharded_run_skips_shards_held_elsewhere(self):
+        """Test a sweep processes free shards and leaves a held shard to its owner"""
+        from .expiry import ExpirationEngine
+        from .leases import Lease
+
+        contexts = [self.expire_context(f'Shard {i}') for i in range(4)]
+        held = contexts[0].id % 2
+        Lease(f'expire-contexts:{held}/2', owner='other-worker').acquire()
+
+        report = ExpirationEngine().run_sharded(context_ids=[c.id for c in contexts], shards=2)
+
+        self.assertEqual(report.skipped_shards, [held])
+        for context in contexts:
+            context.refresh_from_db()
+            self.assertEqual(context.archived, context.id % 2 != held)
+        self.assertFalse(JobLease.objects.exclude(owner='').exclude(owner='other-worker').exists())
+
+    def test_run_stops_when_lease_is_lost(self):
+        """Test a run whose lease was taken over stops before its next batch"""
+        from .expiry import ExpirationEngine
+        from .leases import Lease
+
+        ids = [self.expire_context(f'Lost {i}').id for i in range(3)]
+        lease = Lease('expire-contexts:0/1', owner='worker-1')
+        lease.acquire()
+        JobLease.objects.filter(name=lease.name).update(owner='worker-2')
+
+        with self.assertLogs('api.leases', 'WARNING'):
+            report = ExpirationEngine(batch_size=1).run(context_ids=ids, shard=(0, 1), lease=lease)
+
+        self.assertEqual(report.processed, 0)
+        self.assertFalse(Context.objects.filter(id__in=ids, archived=True).exists())
+
+    def test_command_reports_skipped_shards(self):
+        """Test the command reports shards it could not lease"""
+        from io import StringIO
+        from django.core.management import call_command
+        from .leases import Lease
+
+        Lease('expire-contexts:2/4', owner='other-worker').acquire()
+        out = StringIO()
+        call_command('handle_expired_contexts', '--full', stdout=out)
+
+        self.assertIn('Skipped shards held by another worker: 2', out.getvalue())
+
+
+
+class IncrementalExpiryTestCase(BaseTestCase):
+    """Test watermark-based incremental expiry processing"""
+
+    def expire_context(self, label, expired_ago):
+        context = Context.objects.create(
+            user=self.individual_user, label=label, visibility='code', given='Exp', auto_archive_expired=True
+        )
+        ShareCode.objects.create(context=context, expires_at=timezone.now() - expired_ago)
+        return context
+
+    def test_watermark_skips_codes_already_seen(self):
+        """Test a second run scans only codes that expired after the first"""
+        from .expiry import ExpirationEngine
+
+        first = ExpirationEngine().run_incremental()
+        self.assertGreater(first.codes_scanned, 0)
+
+        context = self.expire_context('Fresh', timedelta(seconds=1))
+        second = ExpirationEngine().run_incremental()
+
+        self.assertEqual(second.codes_scanned, 1)
+        self.assertEqual(second.processed, 1)
+        context.refresh_from_db()
+        self.assertTrue(context.archived)
+        checkpoint = JobCheckpoint.objects.get(name='expire-contexts')
+        self.assertEqual(second.watermark, (checkpoint.position_at, checkpoint.position_id))
+
+        self.assertEqual(ExpirationEngine().run_incremental().codes_scanned, 0)
+
+    def test_expiry_moved_behind_watermark_is_processed(self):
+        """Test a code whose expiry is moved before the watermark is found by the changed-code re-scan"""
+        from .expiry import ExpirationEngine
+
+        self.expire_context('Recent', timedelta(seconds=1))
+        ExpirationEngine().run_incremental()
+        ExpirationEngine().run_incremental()
+        watermark = JobCheckpoint.objects.get(name='expire-contexts').position_at
+
+        context = Context.objects.create(
+            user=self.individual_user, label='Moved', visibility='code', given='Exp', auto_archive_expired=True
+        )
+        share_code = ShareCode.objects.create(context=context, expires_at=timezone.now() + timedelta(days=1))
+        share_code.expires_at = watermark - timedelta(hours=1)
+        share_code.save()
+
+        report = ExpirationEngine().run_incremental()
+
+        self.assertEqual(report.processed, 1)
+        context.refresh_from_db()
+        self.assertTrue(context.archived)
+        self.assertEqual(JobCheckpoint.objects.get(name='expire-contexts').position_at, watermark)
+        self.assertEqual(ExpirationEngine().run_incremental().codes_scanned, 0)
+
+    def test_dry_run_changes_nothing(self):
+        """Test a dry run counts pending contexts without processing them or moving the watermark"""
+        from .expiry import ExpirationEngine
+
+        context = self.expire_context('Pending', timedelta(minutes=5))
+
+        report = ExpirationEngine().run_incremental(dry_run=True)
+
+        self.assertGreaterEqual(report.candidates, 1)
+        self.assertEqual(report.processed, 0)
+        self.assertFalse(JobCheckpoint.objects.exists())
+        context.refresh_from_db()
+        self.assertFalse(context.archived)
+
+    def test_max_runtime_stops_and_resumes(self):
+        """Test a run cut short by --max-runtime persists its progress and the next run resumes"""
+        from .expiry import ExpirationEngine
+
+        ids = [self.expire_context(f'Slow {i}', timedelta(minutes=10 + i)).id for i in range(3)]
+
+        report = ExpirationEngine(batch_size=1).run_incremental(max_runtime=0)
+        self.assertTrue(report.timed_out)
+        self.assertEqual(report.codes_scanned, 1)
+
+        ExpirationEngine(batch_size=100).run_incremental()
+        self.assertEqual(Context.objects.filter(id__in=ids, archived=True).count(), 3)
+
+    def test_watermark_holds_when_shard_is_leased_elsewhere(self):
+        """Test codes in a shard another worker holds keep the watermark where it was"""
+        from .expiry import ExpirationEngine
+        from .leases import Lease
+
+        context = self.expire_context('Held', timedelta(minutes=1))
+        ShareCode.objects.filter(expires_at__lt=timezone.now()).exclude(context=context).delete()
+        Lease(f'expire-contexts:{context.id % 4}/4', owner='other-worker').acquire()
+
+        report = ExpirationEngine().run_incremental()
+
+        self.assertEqual(report.skipped_shards, [context.id % 4])
+        self.assertFalse(JobCheckpoint.objects.filter(position_at__isnull=False).exists())
+
+    def test_watermark_never_moves_backwards(self):
+        """Test an older position does not overwrite a newer one"""
+        from .expiry import ExpirationEngine
+
+        now = timezone.now()
+        ExpirationEngine.advance_checkpoint('job', (now, 5))
+        ExpirationEngine.advance_checkpoint('job', (now - timedelta(minutes=1), 9))
+        ExpirationEngine.advance_checkpoint('job', (now, 3))
+
+        checkpoint = JobCheckpoint.objects.get(name='job')
+        self.assertEqual((checkpoint.position_at, checkpoint.position_id), (now, 5))
+
+    def test_command_options(self):
+        """Test the command's dry run and throughput output"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('handle_expired_contexts', '--dry-run', '--batch-size', '10', stdout=out)
+        self.assertIn('Dry run: 1 expired contexts would be processed', out.getvalue())
+
+        out = StringIO()
+        call_command('handle_expired_contexts', '--max-runtime', '30', stdout=out)
+        output = out.getvalue()
+        self.assertIn('Successfully processed 1 expired contexts', output)
+        self.assertIn('codes scanned', output)
+        self.assertIn('watermark', output)
+
+
+
+class ProfileSearchIndexTestCase(BaseTestCase):
+    """Test the profile search index behind UserSearchView"""
+
+    def make_profile(self, email, public=True, **fields):
+        user = User.objects.create_user(email=email, password='testpass123')
+        profile = user.profile
+        for name, value in fields.items():
+            setattr(profile, name, value)
+        profile.is_public_profile = public
+        profile.save()
+        return profile
+
+    def search(self, query, **params):
+        self.authenticate_user(self.company_user)
+        response = self.client.get('/api/search/users/', {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [result['email'] for result in response.data['data']]
+
+    def test_signals_keep_search_text_in_sync(self):
+        """Test search text follows profile names and the user's email"""
+        self.individual_profile.refresh_from_db()
+        self.assertEqual(self.individual_profile.search_text, 'john doe individual')
+
+        self.individual_user.email = 'renamed@test.com'
+        self.individual_user.save()
+        self.individual_profile.refresh_from_db()
+        self.assertEqual(self.individual_profile.search_text, 'john doe renamed')
+        self.assertEqual(self.search('renamed'), ['renamed@test.com'])
+
+    def test_substring_and_accent_insensitive_match(self):
+        """Test terms match inside names regardless of case and accents"""
+        self.make_profile('jose@test.com', first_name='José', last_name='Álvarez')
+
+        self.assertEqual(self.search('ohn'), ['individual@test.com'])
+        self.assertEqual(self.search('JOSE alva'), ['jose@test.com'])
+        self.assertEqual(self.search('Test Company'), ['company@test.com'])
+
+    def test_private_profiles_are_excluded(self):
+        """Test profiles that are not public never appear in results"""
+        self.make_profile('hidden@test.com', public=False, first_name='Johnny')
+
+        self.assertEqual(self.search('john'), ['individual@test.com'])
+
+    def test_index_follows_visibility(self):
+        """Test a profile leaves the full-text index when made private and returns when made public"""
+        from django.db import connection
+        from .search import FTS_TABLE
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('The full-text table is SQLite-specific')
+
+        def indexed():
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE} WHERE rowid = %s", [self.individual_profile.pk])
+                return cursor.fetchone()[0]
+
+        self.assertEqual(indexed(), 1)
+        self.individual_profile.is_public_profile = False
+        self.individual_profile.save()
+        self.assertEqual(indexed(), 0)
+        self.individual_profile.is_public_profile = True
+        self.individual_profile.save()
+        self.assertEqual(indexed(), 1)
+
+    def test_short_terms(self):
+        """Test terms shorter than a trigram still filter, alone or alongside longer terms"""
+        self.make_profile('jodie@test.com', first_name='Jodie', last_name='Smith')
+
+        self.assertEqual(sorted(self.search('jo')), ['individual@test.com', 'jodie@test.com'])
+        self.assertEqual(self.search('jo smith'), ['jodie@test.com'])
+
+    def test_ranking_and_limit(self):
+        """Test closer matches rank first and ?limit= caps the results"""
+        for i in range(5):
+            self.make_profile(f'anna{i}@test.com', first_name='Anna', last_name=f'Smithson Longer Surname {i}')
+        self.make_profile('exact@test.com', first_name='Anna', last_name='Smith')
+
+        results = self.search('anna smith', limit=3)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0], 'exact@test.com')
+
+    def test_search_is_two_queries(self):
+        """Test a search costs an index lookup and one profile fetch however many rows match"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .search import search_profiles
+
+        for i in range(10):
+            self.make_profile(f'member{i}@test.com', first_name='Member')
+
+        with CaptureQueriesContext(connection) as ctx:
+            results = search_profiles('member')
+            [profile.user.email for profile in results]
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_deleted_profiles_leave_the_index(self):
+        """Test deleting a user removes their profile from search"""
+        profile = self.make_profile('gone@test.com', first_name='Vanishing')
+        profile.user.delete()
+
+        self.assertEqual(self.search('vanish'), [])
+
+    def test_rebuild_command_repairs_bulk_updates(self):
+        """Test the rebuild command catches up with updates that bypassed signals"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        Profile.objects.filter(pk=self.individual_profile.pk).update(first_name='Jonathan')
+        self.assertEqual(self.search('jonathan'), [])
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+
+        self.assertIn('1 profiles updated', out.getvalue())
+        self.assertEqual(self.search('jonathan'), ['individual@test.com'])
+
+
+@override_settings(PROFILE_PREFIX_INDEX={'ENABLED': True, 'REFRESH_INTERVAL': 60, 'BACKGROUND': False})
+class ProfilePrefixIndexTestCase(QueryCountMixin, BaseTestCase):
+    """Test the in-memory typeahead index"""
+
+    def setUp(self):
+        super().setUp()
+        from .prefix_index import get_prefix_index, reset_prefix_index
+
+        reset_prefix_index()
+        self.addCleanup(reset_prefix_index)
+        self.index = get_prefix_index()
+
+    def emails(self, query, **kwargs):
+        return [result['email'] for result in self.index.search(query, **kwargs)]
+
+    def test_prefix_matches_names_company_and_email(self):
+        """Test every term must prefix a display name word or the email"""
+        self.assertEqual(self.emails('jo'), ['individual@test.com'])
+        self.assertEqual(self.emails('DOE joh'), ['individual@test.com'])
+        self.assertEqual(self.emails('test comp'), ['company@test.com'])
+        self.assertEqual(self.emails('company@'), ['company@test.com'])
+        self.assertEqual(self.emails('ohn'), [])
+
+    def test_search_does_not_query_after_build(self):
+        """Test lookups are answered from memory once the index is built"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.index.build()
+        with CaptureQueriesContext(connection) as ctx:
+            self.emails('john')
+            self.emails('test')
+
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_signals_update_the_index_incrementally(self):
+        """Test saved, hidden and deleted profiles are reflected without a rebuild"""
+        self.index.build()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create_user(email='jolene@test.com', password='testpass123')
+            user.profile.first_name = 'Jolene'
+            user.profile.is_public_profile = True
+            user.profile.save()
+        self.assertEqual(self.emails('jol'), ['jolene@test.com'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.profile.is_public_profile = False
+            user.profile.save()
+        self.assertEqual(self.emails('jol'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.individual_user.delete()
+        self.assertEqual(self.emails('john'), [])
+
+    def test_refresh_picks_up_changes_from_other_processes(self):
+        """Test profiles updated without this process's signals are re-read after the refresh interval"""
+        self.index.build()
+        Profile.objects.filter(pk=self.individual_profile.pk).update(first_name='Zachary', updated_at=timezone.now())
+
+        self.assertEqual(self.emails('zach'), [])
+        self.index._last_refresh = 0.0
+        self.assertEqual(self.emails('zach'), ['individual@test.com'])
+        self.assertEqual(self.emails('john'), [])
+
+    def test_refresh_rereads_saves_committed_late(self):
+        """Test a save stamped before the last refresh but committed after it is still re-read"""
+        self.index.build()
+        self.index._last_refresh = 0.0
+        self.emails('john')
+        Profile.objects.filter(pk=self.individual_profile.pk).update(
+            first_name='Zachary', updated_at=timezone.now() - timedelta(seconds=30)
+        )
+
+        self.index._last_refresh = 0.0
+        self.assertEqual(self.emails('zach'), ['individual@test.com'])
+
+    def test_rebuild_drops_profiles_deleted_elsewhere(self):
+        """Test profiles deleted without this process's signals leave the index at the next rebuild"""
+        self.index.build()
+        Profile.objects.filter(pk=self.individual_profile.pk)._raw_delete(Profile.objects.db)
+
+        self.index._last_refresh = 0.0
+        self.assertEqual(self.emails('john'), ['individual@test.com'])
+        self.index._last_build = 0.0
+        self.assertEqual(self.emails('john'), [])
+
+    def test_maintenance_reads_the_database_outside_the_index_lock(self):
+        """Test builds and refreshes only hold the index lock to swap in what they read"""
+        from django.db import connection
+
+        locked_queries = []
+
+        def record(execute, sql, params, many, context):
+            if self.index._lock._is_owned():
+                locked_queries.append(sql)
+            return execute(sql, params, many, context)
+
+        Profile.objects.filter(pk=self.individual_profile.pk).update(first_name='Zachary', updated_at=timezone.now())
+        with connection.execute_wrapper(record):
+            self.index.build()
+            self.index.refresh()
+
+        self.assertEqual(locked_queries, [])
+        self.assertEqual(self.emails('zach'), ['individual@test.com'])
+
+    def test_search_keeps_the_snapshot_while_another_thread_maintains(self):
+        """Test a search that finds maintenance due skips it while another thread holds the build"""
+        self.index.build()
+        Profile.objects.filter(pk=self.individual_profile.pk).update(first_name='Zachary', updated_at=timezone.now())
+        self.index._last_refresh = 0.0
+
+        with self.index._build_lock:
+            queries, results = self.count_queries(lambda: self.emails('john'))
+
+        self.assertEqual(queries, 0)
+        self.assertEqual(results, ['individual@test.com'])
+        self.assertEqual(self.emails('zach'), ['individual@test.com'])
+
+    def test_background_index_never_builds_on_the_request(self):
+        """Test searches start the worker and answer None until its first build, without a query"""
+        from .prefix_index import ProfilePrefixIndex
+
+        index = ProfilePrefixIndex(background=True)
+        with patch.object(ProfilePrefixIndex, 'start') as start:
+            queries, results = self.count_queries(lambda: index.search('john'))
+
+        start.assert_called_once_with()
+        self.assertIsNone(results)
+        self.assertEqual(queries, 0)
+
+    def test_prefix_mode_falls_back_until_the_index_is_built(self):
+        """Test ?mode=prefix answers from the search index while the prefix index is still loading"""
+        from .prefix_index import ProfilePrefixIndex
+
+        self.authenticate_user(self.company_user)
+        with patch.object(ProfilePrefixIndex, 'search', return_value=None):
+            response = self.client.get('/api/search/users/', {'q': 'john', 'mode': 'prefix'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['email'] for result in response.data['data']], ['individual@test.com'])
+
+    def test_limit_and_repeated_tokens(self):
+        """Test results are distinct profiles capped at the limit"""
+        for i in range(5):
+            profile = User.objects.create_user(email=f'mara{i}@test.com', password='testpass123').profile
+            profile.first_name = 'Mara'
+            profile.last_name = 'Marek'
+            profile.is_public_profile = True
+            profile.save()
+
+        results = self.emails('mar', limit=3)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len(set(results)), 3)
+
+    def test_prefix_mode_view_skips_profile_queries(self):
+        """Test ?mode=prefix answers in the serializer's shape without querying profiles"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.authenticate_user(self.company_user)
+        self.index.build()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/search/users/', {'q': 'john', 'mode': 'prefix'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in ctx.captured_queries if 'api_profile' in query['sql']])
+        full = self.client.get('/api/search/users/', {'q': 'john'}).data['data']
+        self.assertEqual(response.data['data'], full)
+
+    def test_memory_report(self):
+        """Test the index reports its size per profile"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        report = self.index.report()
+        self.assertEqual(report['profiles'], 2)
+        self.assertGreater(report['bytes_per_profile'], 0)
+
+        out = StringIO()
+        call_command('prefix_index_report', stdout=out)
+        self.assertIn('per 100k profiles', out.getvalue())
+
+
+
+class CountryIndexTestCase(TestCase):
+    """Test the precomputed country index matches pycountry's fuzzy search"""
+
+    def setUp(self):
+        from .countries import get_country_index, normalize_country_name
+        self.index = get_country_index()
+        normalize_country_name.cache_clear()
+
+    def test_ranking_matches_search_fuzzy(self):
+        """Test every tier ranks countries exactly as search_fuzzy does"""
+        import pycountry
+
+        queries = [
+            'United States', 'UK', 'de', 'DEU', 'germany', 'Bavaria', 'state', 'new',
+            'côte', 'Île-de-France', 'land', 'korea', 'o', '  ', 'zzz', 'Country123',
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                try:
+                    expected = [country.alpha_2 for country in pycountry.countries.search_fuzzy(query)]
+                except LookupError:
+                    expected = []
+                self.assertEqual([country.alpha_2 for country in self.index.search(query)], expected)
+
+    def test_validator_uses_cache(self):
+        """Test repeated inputs are answered from the LRU cache"""
+        from .countries import normalize_country_name
+
+        self.assertEqual(CommonValidators.validate_country_name('germany'), 'Germany')
+        with patch.object(self.index, 'search') as search:
+            self.assertEqual(CommonValidators.validate_country_name('germany'), 'Germany')
+        search.assert_not_called()
+        self.assertEqual(normalize_country_name.cache_info().hits, 1)
+
+    def test_rejection_unchanged(self):
+        """Test unmatched names still fall back to title case or are rejected"""
+        self.assertEqual(CommonValidators.validate_country_name('Testcountry'), 'Testcountry')
+        with self.assertRaises(Exception):
+            CommonValidators.validate_country_name('Country123')
+
+
+
+class StartupWarmupTestCase(TestCase):
+    """Test validator dependencies load lazily unless warm-up is enabled"""
+
+    HEAVY_MODULES = ('phonenumbers', 'pycountry', 'nameparser', 'email_validator')
+
+    def loaded_after_import(self, warmup):
+        import os
+        import subprocess
+        import sys
+        from django.conf import settings
+
+        script = (
+            "import os, sys, django; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sharename.settings'); "
+            "django.setup(); import api.urls; "
+            f"print(','.join(m for m in {self.HEAVY_MODULES!r} if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            env={**os.environ, 'SHARENAME_WARMUP': warmup},
+        )
+        return [name for name in result.stdout.strip().split(',') if name]
+
+    def test_url_import_skips_validator_dependencies(self):
+        """Test importing the URLconf does not load the validator libraries"""
+        self.assertEqual(self.loaded_after_import('0'), [])
+
+    def test_warmup_loads_validator_dependencies(self):
+        """Test web workers load every validator library at boot"""
+        self.assertEqual(self.loaded_after_import('1'), list(self.HEAVY_MODULES))
+
+    def test_environment_overrides_setting(self):
+        """Test SHARENAME_WARMUP takes precedence over API_WARMUP"""
+        import os
+        from .warmup import get_warmup_settings
+
+        with override_settings(API_WARMUP={'ENABLED': True}), patch.dict(os.environ):
+            os.environ['SHARENAME_WARMUP'] = '0'
+            self.assertFalse(get_warmup_settings()['ENABLED'])
+            del os.environ['SHARENAME_WARMUP']
+            self.assertTrue(get_warmup_settings()['ENABLED'])
+
+
+
+class FieldChecksTestCase(TestCase):
+    """Test the precompiled character checks agree with the per-character rules they replace"""
+
+    SAMPLES = [
+        '', 'Maria', "Jean-Pierre O'Neil", 'New Zealand', 'Acme & Sons (Europe) Ltd.', 'Work_contacts-2024',
+        '(415) 555-0100', 'Country123', 'José Ñandú', 'Ægir', 'half ½', 'x²', 'Ⅻ', '٣', 'tab\there',
+        'John@Smith', 'Correct-Horse-9', 'ÉCOLE', 'straße', '漢字', 'a\u00a0b',
+    ]
+
+    def test_matches_generator_checks(self):
+        """Test fullmatch and search agree with all() and any() over every sample"""
+        from .field_checks import (
+            NAME_CHARS, COUNTRY_CHARS, COMPANY_NAME_CHARS, CONTEXT_LABEL_CHARS, PHONE_CHARS,
+            UPPERCASE, LOWERCASE, DIGITS, PASSWORD_SPECIALS,
+        )
+
+        for charset in (NAME_CHARS, COUNTRY_CHARS, COMPANY_NAME_CHARS, CONTEXT_LABEL_CHARS, PHONE_CHARS):
+            for value in self.SAMPLES:
+                with self.subTest(extra=charset.extra, value=value):
+                    expected = all(charset.predicate(c) or c in charset.extra for c in value)
+                    self.assertEqual(charset.fullmatch(value), expected)
+
+        for charset, predicate in ((UPPERCASE, str.isupper), (LOWERCASE, str.islower), (DIGITS, str.isdigit)):
+            for value in self.SAMPLES:
+                with self.subTest(predicate=predicate.__name__, value=value):
+                    self.assertEqual(charset.search(value), any(predicate(c) for c in value))
+        self.assertTrue(PASSWORD_SPECIALS.search('abc!'))
+        self.assertFalse(PASSWORD_SPECIALS.search('abc_é'))
+
+    def test_single_token_names_skip_parser(self):
+        """Test one-word names are title-cased without invoking HumanName"""
+        with patch('nameparser.HumanName') as human_name:
+            self.assertEqual(CommonValidators.validate_name_field('maria'), 'Maria')
+            self.assertEqual(CommonValidators.validate_name_field('dr'), 'Dr')
+        human_name.assert_not_called()
+        self.assertEqual(CommonValidators.validate_name_field('mary ann'), 'Mary')
+
+    def test_model_validators_use_shared_checks(self):
+        """Test the model-level validators keep their messages"""
+        from django.core.exceptions import ValidationError
+        from .models import validate_name_chars, validate_context_label_chars
+
+        validate_name_chars("O'Neil")
+        with self.assertRaisesMessage(ValidationError, 'Name can only contain letters'):
+            validate_name_chars('Neil2')
+        with self.assertRaisesMessage(ValidationError, 'Label can only contain'):
+            validate_context_label_chars('work/home')
+
+
+
+class PhoneNormalizationTestCase(TestCase):
+    """Test phone numbers are normalized once per input and region"""
+
+    def setUp(self):
+        from .validators import normalize_phone_number
+        normalize_phone_number.cache_clear()
+        self.user = User.objects.create_user(email='phone@example.com', password='TestPass123!')
+        self.profile = Profile.objects.get(user=self.user)
+        self.profile.country = 'Germany'
+        self.profile.phone = '+49301234567'
+        self.profile.save()
+
+    def test_region_normalizes_national_numbers(self):
+        """Test a region turns national numbers into E.164 while no region keeps them as typed"""
+        self.assertEqual(CommonValidators.validate_phone_number('(030) 1234567', region='DE'), '+49301234567')
+        self.assertEqual(CommonValidators.validate_phone_number('(030) 1234567'), '(030) 1234567')
+        with self.assertRaisesMessage(Exception, 'Phone number format is invalid.'):
+            CommonValidators.validate_phone_number('123abc', region='DE')
+
+    def test_results_are_cached(self):
+        """Test repeated inputs skip phonenumbers"""
+        from .validators import normalize_phone_number
+
+        CommonValidators.validate_phone_number('+44 20 7946 0958')
+        with patch('phonenumbers.parse') as parse:
+            self.assertEqual(CommonValidators.validate_phone_number('+44 20 7946 0958'), '+442079460958')
+        parse.assert_not_called()
+        self.assertEqual(normalize_phone_number.cache_info().hits, 1)
+
+    def test_unchanged_phone_skips_validation(self):
+        """Test a partial update resending the stored number does not revalidate it"""
+        from .serializers_modules.profile_serializers import PersonalDetailsSerializer
+
+        with patch('api.serializers_modules.profile_serializers.phone_validator') as validator:
+            serializer = PersonalDetailsSerializer(self.profile, data={'phone': '+49301234567'}, partial=True)
+            self.assertTrue(serializer.is_valid())
+        validator.assert_not_called()
+
+    def test_region_follows_profile_country(self):
+        """Test the stored country, or the one sent alongside, sets the phone region"""
+        from .serializers_modules.profile_serializers import CompanyDetailsSerializer, PersonalDetailsSerializer
+
+        serializer = PersonalDetailsSerializer(self.profile, data={'phone': '030 7654321'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data['phone'], '+49307654321')
+
+        serializer = CompanyDetailsSerializer(
+            self.profile, data={'company_phone': '(415) 555-0100', 'company_country': 'United States'}, partial=True
+        )
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data['company_phone'], '+14155550100')
+
+
+
+class StubResolver:
+    """Answers DNS queries from a fixed table so deliverability checks never leave the process"""
+
+    def __init__(self, records):
+        self.records = records
+        self.queries = []
+
+    def resolve(self, name, rdtype):
+        import dns.exception
+        import dns.resolver
+
+        self.queries.append((name, rdtype))
+        if name not in self.records:
+            raise dns.resolver.NXDOMAIN()
+        answer = self.records[name].get(rdtype)
+        if answer == 'timeout':
+            raise dns.exception.Timeout()
+        if answer is None:
+            raise dns.resolver.NoAnswer()
+        return answer
+
+
+def stub_deliverability_resolver():
+    from types import SimpleNamespace
+    return StubResolver({
+        'example.com': {'MX': [SimpleNamespace(preference=10, exchange='mx.example.com.')]},
+        'slow.example': {'MX': 'timeout'},
+    })
+
+
+@override_settings(EMAIL_DELIVERABILITY={
+    'ENABLED': True, 'BACKGROUND': False, 'RESOLVER': 'api.tests.stub_deliverability_resolver',
+})
+class EmailDeliverabilityTestCase(APITestCase):
+    """Test email deliverability is checked off the request path and flagged on the user"""
+
+    def setUp(self):
+        from .email_deliverability import reset_deliverability_queue
+        reset_deliverability_queue()
+        cache.clear()
+        self.addCleanup(reset_deliverability_queue)
+
+    def create_user(self, email):
+        return User.objects.create_user(email=email, password='TestPass123!')
+
+    def test_registration_checks_syntax_only(self):
+        """Test registering does no DNS lookups inline when checks are disabled"""
+        with override_settings(EMAIL_DELIVERABILITY={'ENABLED': False}):
+            with patch('email_validator.deliverability.validate_email_deliverability') as lookup:
+                response = self.client.post(
+                    '/api/register/', {'email': 'new@unknown-domain.org', 'password': 'TestPass123!', 'role': 'individual'},
+                    format='json',
+                )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        lookup.assert_not_called()
+        self.assertIsNone(User.objects.get(email='new@unknown-domain.org').email_deliverable)
+
+    def test_registration_flags_user_after_commit(self):
+        """Test the check runs once the registration commits and flags the new user"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/register/', {'email': 'new@example.com', 'password': 'TestPass123!', 'role': 'individual'},
+                format='json',
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = User.objects.get(email='new@example.com')
+        self.assertTrue(user.email_deliverable)
+        self.assertIsNotNone(user.email_checked_at)
+
+    def test_outcomes(self):
+        """Test missing domains are undeliverable and timeouts leave the flag unset"""
+        from .email_deliverability import get_deliverability_queue
+
+        missing = self.create_user('someone@missing.test')
+        slow = self.create_user('someone@slow.example')
+        deliverability_queue = get_deliverability_queue()
+        deliverability_queue.submit(missing.pk, missing.email)
+        deliverability_queue.submit(slow.pk, slow.email)
+
+        missing.refresh_from_db()
+        slow.refresh_from_db()
+        self.assertIs(missing.email_deliverable, False)
+        self.assertIsNone(slow.email_deliverable)
+        self.assertIsNotNone(slow.email_checked_at)
+
+    def test_domain_results_are_cached(self):
+        """Test a burst of signups on one domain costs a single lookup"""
+        from .email_deliverability import get_deliverability_queue
+
+        deliverability_queue = get_deliverability_queue()
+        for index in range(3):
+            user = self.create_user(f'user{index}@example.com')
+            deliverability_queue.submit(user.pk, user.email)
+        self.assertEqual(deliverability_queue.lookups, 1)
+        self.assertEqual(User.objects.filter(email_deliverable=True).count(), 3)
+
+    def test_changed_email_is_not_flagged(self):
+        """Test a result for an address the user has since changed is discarded"""
+        from .email_deliverability import get_deliverability_queue
+
+        user = self.create_user('before@missing.test')
+        get_deliverability_queue().submit(user.pk, 'other@missing.test')
+        user.refresh_from_db()
+        self.assertIsNone(user.email_deliverable)
+
+    def test_background_worker_drains_queue(self):
+        """Test submissions return at once and are processed by the worker thread"""
+        from .email_deliverability import DeliverabilityQueue
+
+        deliverability_queue = DeliverabilityQueue(resolver=stub_deliverability_resolver(), background=True)
+        self.addCleanup(deliverability_queue.stop)
+        with patch.object(deliverability_queue, 'process') as process:
+            deliverability_queue.submit(1, 'a@example.com')
+            deliverability_queue._queue.join()
+        process.assert_called_once_with(1, 'a@example.com')
+
+    def test_sweep_checks_users_left_unchecked(self):
+        """Test the sweep checks users lost from the queue and retries stale inconclusive results"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        never = self.create_user('never@example.com')
+        self.create_user('checked@missing.test')
+        stale = self.create_user('stale@slow.example')
+        self.create_user('fresh@slow.example')
+        User.objects.filter(email='checked@missing.test').update(email_deliverable=False, email_checked_at=timezone.now())
+        User.objects.filter(email='stale@slow.example').update(email_checked_at=timezone.now() - timedelta(hours=1))
+        User.objects.filter(email='fresh@slow.example').update(email_checked_at=timezone.now())
+
+        out = StringIO()
+        call_command('sweep_email_deliverability', stdout=out)
+
+        self.assertIn('Checked 2 email addresses', out.getvalue())
+        never.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertTrue(never.email_deliverable)
+        self.assertGreater(stale.email_checked_at, timezone.now() - timedelta(minutes=1))
+
+
+@override_settings(
+    PASSWORD_HASHERS=['api.hashers.TunedScryptPasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher'],
+    PASSWORD_HASHING={'SCRYPT_WORK_FACTOR': 2 ** 4, 'WORKERS': 2, 'QUEUE_SIZE': 4},
+)
+class PasswordHashingTestCase(APITestCase):
+    """Test the tuned hasher, rehash on login and the bounded hash pool"""
+
+    def setUp(self):
+        from .hashers import reset_hash_pool
+        reset_hash_pool()
+        self.addCleanup(reset_hash_pool)
+
+    def create_user(self, hasher):
+        from django.contrib.auth.hashers import make_password
+        return User.objects.create(email='hash@example.com', password=make_password('TestPass123!', hasher=hasher))
+
+    def login(self):
+        return self.client.post('/api/token/', {'email': 'hash@example.com', 'password': 'TestPass123!'}, format='json')
+
+    def test_legacy_hash_is_replaced_on_login(self):
+        """Test a hash from an older hasher is re-made with the configured one"""
+        user = self.create_user('md5')
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$16$'))
+        self.assertTrue(user.check_password('TestPass123!'))
+
+    def test_changed_parameters_trigger_rehash(self):
+        """Test raising the work factor upgrades hashes made with the old one"""
+        user = self.create_user('scrypt')
+        with override_settings(PASSWORD_HASHING={'SCRYPT_WORK_FACTOR': 2 ** 5}):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$32$'))
+
+    def test_costs_past_openssl_default_memory_limit(self):
+        """Test hashes needing more than OpenSSL's default 32 MiB are made and verified"""
+        from django.contrib.auth.hashers import check_password, make_password
+
+        with override_settings(PASSWORD_HASHING={'SCRYPT_WORK_FACTOR': 2 ** 15, 'SCRYPT_BLOCK_SIZE': 8}):
+            encoded = make_password('TestPass123!', hasher='scrypt')
+            self.assertTrue(encoded.startswith('scrypt$32768$'))
+            self.assertTrue(check_password('TestPass123!', encoded))
+            self.assertFalse(check_password('wrong', encoded))
+
+    def test_wrong_password_and_unknown_email(self):
+        """Test failed logins are rejected and unknown emails still pay for a hash"""
+        self.create_user('scrypt')
+        response = self.client.post('/api/token/', {'email': 'hash@example.com', 'password': 'wrong'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with patch('api.auth_backends.hash_password') as hash_password:
+            response = self.client.post('/api/token/', {'email': 'nobody@example.com', 'password': 'x'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        hash_password.assert_called_once_with('x')
+
+    def test_pool_sheds_excess_work(self):
+        """Test work beyond the workers and queue is rejected rather than queued"""
+        import threading
+        from .hashers import HashPool, PasswordHashingBusy
+
+        pool = HashPool(workers=1, queue_size=1, timeout=5)
+        self.addCleanup(pool.stop)
+        release = threading.Event()
+        threads = [threading.Thread(target=pool.run, args=(release.wait,)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        while pool._slots._value:
+            release.wait(0.01)
+        with self.assertRaises(PasswordHashingBusy):
+            pool.run(lambda: None)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(pool.run(lambda: 'ok'), 'ok')
+        self.assertEqual(pool.rejected, 1)
+
+    def test_registration_stores_pool_hash_through_manager(self):
+        """Test registration hands the pool's hash to create_user, which stores it unchanged"""
+        with patch('api.serializers_modules.auth_serializers.hash_password', return_value='md5$salt$hash') as hashed:
+            with patch.object(User.objects, 'create_user', wraps=User.objects.create_user) as create_user:
+                response = self.client.post(
+                    '/api/register/', {'email': 'hash@example.com', 'password': 'TestPass123!', 'role': 'individual'},
+                    format='json',
+                )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        hashed.assert_called_once_with('TestPass123!')
+        create_user.assert_called_once_with(email='hash@example.com', password_hash='md5$salt$hash')
+        self.assertEqual(User.objects.get(email='hash@example.com').password, 'md5$salt$hash')
+
+    def test_busy_login_returns_503(self):
+        """Test a saturated pool answers logins with 503 and Retry-After"""
+        from .hashers import PasswordHashingBusy
+
+        self.create_user('scrypt')
+        with patch('api.auth_backends.check_password_hash', side_effect=PasswordHashingBusy()):
+            response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+
+
+
+class StatelessJWTAuthenticationTestCase(APITestCase):
+    """Test requests authenticate from token claims without loading the user"""
+
+    def setUp(self):
+        from .serializers import CustomTokenObtainPairSerializer
+        self.user = User.objects.create_user(email='stateless@example.com', password='TestPass123!')
+        self.profile = Profile.objects.get(user=self.user)
+        self.profile.first_name = 'Ada'
+        self.profile.save()
+        self.token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+
+    def test_token_carries_email_and_profile_claims(self):
+        """Test issued tokens embed the email and the profile flags clients read at sign-in"""
+        self.assertEqual(self.token['email'], 'stateless@example.com')
+        self.assertEqual(self.token['role'], self.profile.role)
+        self.assertEqual(self.token['profile_completed'], self.profile.profile_completed)
+        self.assertEqual(self.token['is_public_profile'], self.profile.is_public_profile)
+
+    def test_authentication_runs_no_query(self):
+        """Test the user is built from claims with every other field deferred"""
+        from rest_framework.test import APIRequestFactory
+        from .authentication import StatelessJWTAuthentication
+
+        request = APIRequestFactory().get('/api/profile/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        with self.assertNumQueries(0):
+            user, _ = StatelessJWTAuthentication().authenticate(request)
+        self.assertEqual((user.pk, user.email), (self.user.pk, 'stateless@example.com'))
+        self.assertIn('is_active', user.get_deferred_fields())
+
+        with self.assertNumQueries(1):
+            self.assertTrue(user.is_active)
+            self.assertTrue(user.password)
+        self.assertFalse(user.get_deferred_fields())
+
+    def test_deferred_load_fails_authentication_for_missing_or_inactive_users(self):
+        """Test reading a deferred field of a deleted or deactivated user raises a 401, not DoesNotExist"""
+        from rest_framework.exceptions import AuthenticationFailed
+        from rest_framework.test import APIRequestFactory
+        from .authentication import StatelessJWTAuthentication
+
+        request = APIRequestFactory().get('/api/profile/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        user, _ = StatelessJWTAuthentication().authenticate(request)
+        with self.assertRaisesMessage(AuthenticationFailed, 'User is inactive'):
+            user.is_active
+
+        self.user.delete()
+        user, _ = StatelessJWTAuthentication().authenticate(request)
+        with self.assertRaisesMessage(AuthenticationFailed, 'User not found'):
+            user.is_active
+
+    def test_deleted_user_gets_401_instead_of_a_new_profile(self):
+        """Test a deleted user's token is refused rather than creating a profile pointing at no user"""
+        self.user.delete()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+        for path in ('/api/profile/', '/api/personal-details/'):
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.patch('/api/personal-details/', {'first_name': 'Grace'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(Profile.objects.filter(user_id=self.user.pk).exists())
+
+    def test_writes_load_the_stored_user(self):
+        """Test a write rebuilds search text from the stored email, not the token's stale one"""
+        User.objects.filter(pk=self.user.pk).update(email='renamed@example.com')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+        response = self.client.patch('/api/personal-details/', {'first_name': 'Grace'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.search_text, 'grace renamed')
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.patch('/api/personal-details/', {'first_name': 'Ada'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_redemption_refuses_deleted_or_deactivated_users(self):
+        """Test redeeming, a GET that records an audit, loads the user and refuses a stale token"""
+        owner = User.objects.create_user(email='owner@example.com', password='TestPass123!')
+        context = Context.objects.create(user=owner, label='Public', visibility='public', given='Ada', family='Lovelace')
+        share_code = ShareCode.objects.create(context=context, expires_at=timezone.now() + timedelta(days=1))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.get(f'/api/codes/{share_code.code}/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(Audit.objects.filter(share_code=share_code).exists())
+
+        self.user.delete()
+        response = self.client.get(f'/api/codes/{share_code.code}/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(Audit.objects.filter(share_code=share_code).exists())
+
+    def test_profile_view_uses_one_query(self):
+        """Test the profile endpoint reads only the profile row"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/profile/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['first_name'], 'Ada')
+        self.assertEqual(response.data['data']['email'], 'stateless@example.com')
+
+    def test_tokens_without_email_load_the_user(self):
+        """Test older tokens fall back to loading the user row"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/profile/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_registration_issues_claims(self):
+        """Test tokens returned by registration are ready for the stateless path"""
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        response = self.client.post(
+            '/api/register/', {'email': 'fresh@example.com', 'password': 'TestPass123!', 'role': 'company'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        token = AccessToken(response.data['data']['access'])
+        self.assertEqual(token['email'], 'fresh@example.com')
+        self.assertEqual(token['role'], 'company')
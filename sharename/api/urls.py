@@ -5,7 +5,7 @@ from api.views import (
     ContextListCreate, ContextRetrieveDestroy, ArchivedContextListView,
     ArchivedContextDeleteView, CheckExpiredContextsView,
 
-    ShareCodeCreate, RedeemCode, RedeemByContextIdView,
+    ShareCodeCreate, BulkShareCodeCreate, RedeemCode, RedeemByContextIdView,
 
     ConsentRequestListView, ConsentRequestCreateView, ConsentRequestUpdateView,
     ConsentRequestByCodeView, CompanyPendingRequestsView,
@@ -15,7 +15,8 @@ from api.views import (
     IndividualRedemptionsView, CompanyRedemptionsView, CompanyRedemptionDeleteView,
     RevokeAccessView,
 
-    NotificationListView, NotificationUpdateView,
+    NotificationListView, NotificationUpdateView, NotificationSummaryView, NotificationMarkReadView,
+    NotificationStreamView, NotificationStreamTicketView,
 
     UserSearchView, PublicProfileDetailView,
 )
@@ -26,6 +27,7 @@ urlpatterns = [
     path("contexts/archived/", ArchivedContextListView.as_view()),
     path("contexts/archived/<int:pk>/", ArchivedContextDeleteView.as_view()),
     path("sharecodes/", ShareCodeCreate.as_view()),
+    path("sharecodes/bulk/", BulkShareCodeCreate.as_view()),
     path("codes/<str:code>/", RedeemCode.as_view()),
     path("register/", RegisterView.as_view()),
     path("profile/",   MyProfileView.as_view()), 
@@ -39,6 +41,10 @@ urlpatterns = [
     path("consent-requests/<int:pk>/", ConsentRequestUpdateView.as_view()),
     path("consent-request-by-code/", ConsentRequestByCodeView.as_view()),
     path("notifications/", NotificationListView.as_view()),
+    path("notifications/summary/", NotificationSummaryView.as_view()),
+    path("notifications/mark-read/", NotificationMarkReadView.as_view()),
+    path("notifications/stream/", NotificationStreamView.as_view()),
+    path("notifications/stream/ticket/", NotificationStreamTicketView.as_view()),
     path("notifications/<int:pk>/", NotificationUpdateView.as_view()),
     path("company-pending-requests/", CompanyPendingRequestsView.as_view()),
     path("personal-details/", PersonalDetailsView.as_view()),
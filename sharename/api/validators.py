@@ -1,32 +1,48 @@
-import phonenumbers
-import pycountry
-from nameparser import HumanName
 from django.core.exceptions import ValidationError as DjangoValidationError
-from django.core.validators import URLValidator
 from rest_framework import serializers
 from datetime import datetime
-from email_validator import validate_email, EmailNotValidError
+from functools import lru_cache
+from .countries import normalize_country_name
+from .field_checks import (
+    NAME_CHARS, COUNTRY_CHARS, COMPANY_NAME_CHARS, CONTEXT_LABEL_CHARS, PHONE_CHARS,
+    UPPERCASE, LOWERCASE, DIGITS, PASSWORD_SPECIALS, PASSWORD_SPECIAL_CHARS, url_validator,
+)
+
+
+# phonenumbers, nameparser and email_validator are imported where they are used, so
+# importing the serializers does not load them; see api.warmup for web workers
+PHONE_CACHE_SIZE = 4096
+
+
+# E.164 form of a phone number, the raw value when it only passes the character check, or None.
+# A region lets national numbers such as "(030) 1234567" parse instead of falling through
+@lru_cache(maxsize=PHONE_CACHE_SIZE)
+def normalize_phone_number(value, region=None):
+    import phonenumbers
+
+    try:
+        parsed = phonenumbers.parse(value, region)
+        if phonenumbers.is_valid_number(parsed):
+            return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+    except phonenumbers.NumberParseException:
+        pass
+
+    if PHONE_CHARS.fullmatch(value) and 7 <= len(value) <= 20:
+        return value
+    return None
 
 
 class CommonValidators:
 
     @staticmethod
-    def validate_phone_number(value, field_name="phone"):
+    def validate_phone_number(value, field_name="phone", region=None):
         if not value:
             return value
 
-        try:
-            parsed = phonenumbers.parse(value, None)
-            if phonenumbers.is_valid_number(parsed):
-                return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
-            else:
-                raise serializers.ValidationError(f'Invalid {field_name} number format.')
-        except (phonenumbers.NumberParseException, Exception):
-            valid_chars = all(c.isdigit() or c in ' -()+ ' for c in value)
-            if valid_chars and 7 <= len(value) <= 20:
-                return value
-            else:
-                raise serializers.ValidationError(f'{field_name.title()} number format is invalid.')
+        normalized = normalize_phone_number(value, region)
+        if normalized is None:
+            raise serializers.ValidationError(f'{field_name.title()} number format is invalid.')
+        return normalized
 
     @staticmethod
     def validate_name_field(value, field_name="name", min_length=1, max_length=50, use_title_case=True):
@@ -41,13 +57,20 @@ class CommonValidators:
         if len(value) < min_length:
             raise serializers.ValidationError(f'{field_name.title()} is required.')
 
-        valid_chars = all(c.isalpha() or c in " -'" for c in value)
+        valid_chars = NAME_CHARS.fullmatch(value)
         if not valid_chars:
             raise serializers.ValidationError(
                 f'{field_name.title()} can only contain letters, spaces, hyphens, and apostrophes.'
             )
 
         if use_title_case:
+            # A single run of letters parses to itself, or to nothing when it is a title such as
+            # "Dr"; either way the result is its title case, so HumanName is only needed for more
+            if value.isalpha():
+                return value.title()
+
+            from nameparser import HumanName
+
             try:
                 parsed_name = HumanName(value)
                 if parsed_name.first:
@@ -63,14 +86,11 @@ class CommonValidators:
         if not value:
             return value
 
-        try:
-            countries = pycountry.countries.search_fuzzy(value)
-            if countries:
-                return countries[0].name
-        except LookupError:
-            pass
+        country_name = normalize_country_name(value)
+        if country_name:
+            return country_name
 
-        valid_chars = all(c.isalpha() or c in ' -' for c in value)
+        valid_chars = COUNTRY_CHARS.fullmatch(value)
         if valid_chars and 1 <= len(value) <= 100:
             return value.strip().title()
 
@@ -89,7 +109,7 @@ class CommonValidators:
         if len(value) < 1:
             raise serializers.ValidationError('Company name is required.')
 
-        valid_chars = all(c.isalnum() or c in " -&.',()  " for c in value)
+        valid_chars = COMPANY_NAME_CHARS.fullmatch(value)
         if not valid_chars:
             raise serializers.ValidationError('Company name contains invalid characters.')
 
@@ -104,7 +124,6 @@ class CommonValidators:
             value = f'https://{value}'
 
         try:
-            url_validator = URLValidator()
             url_validator(value)
             return value
         except DjangoValidationError:
@@ -139,8 +158,12 @@ class CommonValidators:
         if not value:
             return value
 
+        from email_validator import validate_email, EmailNotValidError
+
+        # Syntax only: whether the domain accepts mail is checked off the request path
+        # by api.email_deliverability
         try:
-            validated_email = validate_email(value)
+            validated_email = validate_email(value, check_deliverability=False)
             return validated_email.email.lower()
         except EmailNotValidError as e:
             raise serializers.ValidationError(f'Invalid email address: {str(e)}')
@@ -155,18 +178,17 @@ class CommonValidators:
         if len(value) < 8:
             errors.append('Password must be at least 8 characters long.')
 
-        if not any(c.isupper() for c in value):
+        if not UPPERCASE.search(value):
             errors.append('Password must contain at least one uppercase letter.')
 
-        if not any(c.islower() for c in value):
+        if not LOWERCASE.search(value):
             errors.append('Password must contain at least one lowercase letter.')
 
-        if not any(c.isdigit() for c in value):
+        if not DIGITS.search(value):
             errors.append('Password must contain at least one digit.')
 
-        special_chars = '!@#$%^&*(),.?":{}|<>'
-        if not any(c in special_chars for c in value):
-            errors.append(f'Password must contain at least one special character ({special_chars}).')
+        if not PASSWORD_SPECIALS.search(value):
+            errors.append(f'Password must contain at least one special character ({PASSWORD_SPECIAL_CHARS}).')
 
         if errors:
             raise serializers.ValidationError(errors)
@@ -183,17 +205,17 @@ class CommonValidators:
         if len(value) > max_length:
             raise serializers.ValidationError(f'Label must be {max_length} characters or less.')
 
-        if not all(c.isalnum() or c in ' -_' for c in value):
+        if not CONTEXT_LABEL_CHARS.fullmatch(value):
             raise serializers.ValidationError('Label can only contain letters, numbers, spaces, hyphens, and underscores.')
 
         return value
 
 
-def phone_validator(value):
-    return CommonValidators.validate_phone_number(value, "phone")
+def phone_validator(value, region=None):
+    return CommonValidators.validate_phone_number(value, "phone", region)
 
-def company_phone_validator(value):
-    return CommonValidators.validate_phone_number(value, "company phone")
+def company_phone_validator(value, region=None):
+    return CommonValidators.validate_phone_number(value, "company phone", region)
 
 def first_name_validator(value):
     return CommonValidators.validate_name_field(value, "first name")
@@ -3,7 +3,7 @@ from api.views.context_views import (
     ContextListCreate, ContextRetrieveDestroy, ArchivedContextListView,
     ArchivedContextDeleteView, CheckExpiredContextsView
 )
-from api.views.sharecode_views import ShareCodeCreate, RedeemCode, RedeemByContextIdView
+from api.views.sharecode_views import ShareCodeCreate, BulkShareCodeCreate, RedeemCode, RedeemByContextIdView
 from api.views.consent_views import (
     ConsentRequestListView, ConsentRequestCreateView, ConsentRequestUpdateView,
     ConsentRequestByCodeView, CompanyPendingRequestsView
@@ -13,7 +13,10 @@ from api.views.analytics_views import (
     IndividualRedemptionsView, CompanyRedemptionsView, CompanyRedemptionDeleteView,
     RevokeAccessView
 )
-from api.views.notification_views import NotificationListView, NotificationUpdateView
+from api.views.notification_views import (
+    NotificationListView, NotificationUpdateView, NotificationSummaryView, NotificationMarkReadView,
+    NotificationStreamView, NotificationStreamTicketView
+)
 from api.views.search_views import UserSearchView, PublicProfileDetailView
 
 __all__ = [
@@ -22,7 +25,7 @@ __all__ = [
     'ContextListCreate', 'ContextRetrieveDestroy', 'ArchivedContextListView',
     'ArchivedContextDeleteView', 'CheckExpiredContextsView',
 
-    'ShareCodeCreate', 'RedeemCode', 'RedeemByContextIdView',
+    'ShareCodeCreate', 'BulkShareCodeCreate', 'RedeemCode', 'RedeemByContextIdView',
 
     'ConsentRequestListView', 'ConsentRequestCreateView', 'ConsentRequestUpdateView',
     'ConsentRequestByCodeView', 'CompanyPendingRequestsView',
@@ -32,7 +35,8 @@ __all__ = [
     'IndividualRedemptionsView', 'CompanyRedemptionsView', 'CompanyRedemptionDeleteView',
     'RevokeAccessView',
 
-    'NotificationListView', 'NotificationUpdateView',
+    'NotificationListView', 'NotificationUpdateView', 'NotificationSummaryView', 'NotificationMarkReadView',
+    'NotificationStreamView', 'NotificationStreamTicketView',
 
     'UserSearchView', 'PublicProfileDetailView',
 ]
\ No newline at end of file
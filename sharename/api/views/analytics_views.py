@@ -5,22 +5,26 @@ from django.shortcuts import get_object_or_404
 from api.models import Audit, ConsentRequest
 from api.serializers import RedemptionSerializer, CompanyRedemptionSerializer
 from api.services import AuditQueryService, NotificationService
-from api.response_serializers import create_success_response, create_error_response
+from api.response_serializers import create_success_response, create_error_response, KeysetPagination
 from api.base_views import BaseAPIView
 
 
 class IndividualRedemptionsView(BaseAPIView, generics.ListAPIView):
     serializer_class = RedemptionSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-ts', '-id')
 
     def get_queryset(self):
-        return AuditQueryService.get_user_redemptions(self.request.user)
+        return AuditQueryService.get_user_redemptions(self.request.user, flush_pending=True)
 
 
 class CompanyRedemptionsView(BaseAPIView, generics.ListAPIView):
     serializer_class = CompanyRedemptionSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-ts', '-id')
 
     def get_queryset(self):
-        return AuditQueryService.get_company_redemptions(self.request.user.email)
+        return AuditQueryService.get_company_redemptions(self.request.user.email, flush_pending=True)
 
 
 class CompanyRedemptionDeleteView(BaseAPIView, generics.DestroyAPIView):
@@ -30,7 +34,8 @@ class CompanyRedemptionDeleteView(BaseAPIView, generics.DestroyAPIView):
         return AuditQueryService.get_company_redemptions(
             self.request.user.email,
             include_revoked=False,
-            include_archived=False
+            include_archived=False,
+            flush_pending=True
         )
 
 
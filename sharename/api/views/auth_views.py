@@ -1,8 +1,8 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
+from api.hashers import PasswordHashingBusy
 from api.models import Profile
 from api.serializers import (
     RegisterSerializer, MyProfileSerializer, CustomTokenObtainPairSerializer
@@ -10,12 +10,22 @@ from api.serializers import (
 from api.response_serializers import create_success_response, create_error_response
 
 
+# 503 with Retry-After when the password hash pool is saturated
+def hashing_busy_response(exc):
+    response = create_error_response(str(exc.detail), status_code=exc.status_code)
+    response['Retry-After'] = str(exc.wait)
+    return response
+
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
     # Handles user login and returns JWT tokens with standardized response format
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
+        try:
+            response = super().post(request, *args, **kwargs)
+        except PasswordHashingBusy as exc:
+            return hashing_busy_response(exc)
         if response.status_code == 200:
             return create_success_response(response.data)
         return create_error_response("Invalid credentials", status_code=401)
@@ -29,8 +39,11 @@ class RegisterView(generics.CreateAPIView):
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            try:
+                user = serializer.save()
+            except PasswordHashingBusy as exc:
+                return hashing_busy_response(exc)
+            refresh = CustomTokenObtainPairSerializer.get_token(user)
             tokens = {
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
@@ -43,10 +56,17 @@ class MyProfileView(generics.RetrieveAPIView):
     serializer_class = MyProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-    # Ensures a profile exists for the current user and returns the user object
+    # Ensures a profile exists for the current user and attaches it, so serializing reads no more rows
     def get_object(self):
-        Profile.objects.get_or_create(user=self.request.user)
-        return self.request.user
+        user = self.request.user
+        try:
+            profile = Profile.objects.get(user=user)
+        except Profile.DoesNotExist:
+            # A missing profile may mean the user is gone; reloading it fails authentication then
+            user.refresh_from_db()
+            profile, created = Profile.objects.get_or_create(user=user)
+        user.profile = profile
+        return user
 
     # Returns the current user's profile information
     def retrieve(self, request, *args, **kwargs):
@@ -6,12 +6,14 @@ from rest_framework.exceptions import PermissionDenied
 from api.models import ConsentRequest, Context, ShareCode, Audit
 from api.serializers import ConsentRequestSerializer, ConsentRequestCreateSerializer
 from api.services import NotificationService, ShareCodeService
-from api.response_serializers import create_success_response, create_error_response
+from api.response_serializers import create_success_response, create_error_response, KeysetPagination
 from api.base_views import BaseAPIView
 
 
 class ConsentRequestListView(BaseAPIView, generics.ListAPIView):
     serializer_class = ConsentRequestSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         return ConsentRequest.objects.filter(
@@ -87,7 +89,8 @@ class ConsentRequestUpdateView(BaseAPIView, generics.UpdateAPIView):
 
             Audit.objects.create(
                 share_code=share_code,
-                requester=consent_request.requester.email
+                requester=consent_request.requester.email,
+                requester_user=consent_request.requester
             )
         except Exception:
             pass
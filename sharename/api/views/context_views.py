@@ -1,49 +1,32 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from django.core.management import call_command
-from django.core.cache import cache
-import threading
 from datetime import datetime
 from django.utils.dateparse import parse_datetime
 from django.utils import timezone
+from django.db.models import Max, Q
 
-from api.models import Context, ShareCode
+from api.models import Context
+from api.services import ShareCodeService
 from api.serializers import ContextSerializer
 from api.response_serializers import create_success_response, create_error_response
 from api.mixins import ContextOwnerMixin
 from api.base_views import BaseListCreateView, BaseRetrieveUpdateDestroyView
+from api.expiry import ExpirationEngine
+from api.expiry_scheduler import request_expiry_sweep
 
 
-# Triggers an asynchronous check for expired contexts to avoid blocking the main thread
+# Asks this process's expiry scheduler for a sweep; requests made while one is pending coalesce
 def trigger_expiration_check():
-    import sys
-    if 'test' in sys.argv or hasattr(sys, '_called_from_test'):
-        return
-
-    cache_key = 'expiration_check_running'
-    if cache.get(cache_key):
-        return
-
-    cache.set(cache_key, True, 30)
-
-    def run_check():
-        try:
-            call_command('handle_expired_contexts')
-        except Exception as e:
-            print(f"Error running expired context check: {e}")
-        finally:
-            cache.delete(cache_key)
-
-    thread = threading.Thread(target=run_check)
-    thread.daemon = True
-    thread.start()
+    request_expiry_sweep()
 
 
 class ContextListCreate(ContextOwnerMixin, BaseListCreateView):
     serializer_class = ContextSerializer
 
     def get_queryset(self):
-        return super().get_queryset().filter(archived=False)
+        return super().get_queryset().filter(archived=False).prefetch_related(
+            ContextSerializer.share_codes_prefetch()
+        )
 
     # Handles context creation and optionally creates an automatic share code
     def perform_create(self, serializer):
@@ -61,10 +44,7 @@ class ContextListCreate(ContextOwnerMixin, BaseListCreateView):
             if expires_at is None:
                 expires_at = datetime.fromisoformat(expires_at_str.replace('Z', '+00:00'))
 
-            ShareCode.objects.create(
-                context=context,
-                expires_at=expires_at
-            )
+            ShareCodeService.create_share_code(context, expires_at)
         except (ValueError, TypeError):
             pass
 
@@ -80,7 +60,9 @@ class ArchivedContextListView(ContextOwnerMixin, generics.ListAPIView):
     serializer_class = ContextSerializer
 
     def get_queryset(self):
-        return super().get_queryset().filter(archived=True).order_by('-archived_at')
+        return super().get_queryset().filter(archived=True).order_by('-archived_at').prefetch_related(
+            ContextSerializer.share_codes_prefetch()
+        )
 
 
 class ArchivedContextDeleteView(ContextOwnerMixin, generics.DestroyAPIView):
@@ -100,30 +82,21 @@ class CheckExpiredContextsView(generics.GenericAPIView):
 
     # Returns a list of contexts that have expired codes for the current user
     def get(self, request):
-        user = request.user
-        from django.utils import timezone
         now = timezone.now()
 
-        expired_list = []
-        user_contexts = Context.objects.filter(
-            user=user,
-            archived=False
-        )
-
-        for context in user_contexts:
-            if context.has_expired_codes():
-                expired_code = context.sharecode_set.filter(
-                    expires_at__lt=now
-                ).order_by('-expires_at').first()
+        user_contexts = ExpirationEngine(now=now).expired_contexts().filter(
+            user=request.user
+        ).annotate(
+            latest_expired_at=Max('sharecode__expires_at', filter=Q(sharecode__expires_at__lt=now))
+        ).values('id', 'label', 'latest_expired_at')
 
-                if expired_code:
-                    expired_list.append({
-                        'id': context.id,
-                        'label': context.label,
-                        'expires_at': expired_code.expires_at
-                    })
+        expired_list = [{
+            'id': context['id'],
+            'label': context['label'],
+            'expires_at': context['latest_expired_at']
+        } for context in user_contexts]
 
         return create_success_response({
             'expired_contexts': expired_list,
             'count': len(expired_list)
-        })
\ No newline at end of file
+        })
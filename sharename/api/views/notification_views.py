@@ -1,18 +1,163 @@
-from rest_framework import generics
-from api.models import Notification
+from asgiref.sync import sync_to_async
+from django.db.models import Max
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
+from rest_framework import generics, status
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed, TokenError
+from api.events import (
+    get_broker, get_stream_settings, issue_stream_ticket, notification_stream, read_stream_ticket, stream_available
+)
+from api.models import Notification, User
 from api.serializers import NotificationSerializer
+from api.services import NotificationService
 from api.base_views import BaseAPIView
+from api.response_serializers import KeysetPagination, create_success_response, create_error_response
 
 
 class NotificationListView(BaseAPIView, generics.ListAPIView):
     serializer_class = NotificationSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user).order_by('-created_at')
 
+    # ?since=<latest_id> returns notifications newer than the client's latest one, oldest first; when
+    # has_more is set, latest_id is the last row returned and the client asks again from there
+    def list(self, request, *args, **kwargs):
+        if 'since' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+
+        try:
+            since = int(request.query_params['since'])
+        except ValueError:
+            return create_error_response("since must be a notification id", status_code=status.HTTP_400_BAD_REQUEST)
+
+        limit = KeysetPagination.max_page_size
+        new_notifications = list(
+            self.get_queryset().filter(id__gt=since).order_by('id')[:limit + 1]
+        )
+        has_more = len(new_notifications) > limit
+        new_notifications = new_notifications[:limit]
+
+        return create_success_response(data={
+            'results': self.get_serializer(new_notifications, many=True).data,
+            'latest_id': new_notifications[-1].id if new_notifications else since,
+            'has_more': has_more,
+            'unread_count': NotificationService.unread_count(request.user),
+        })
+
+
+class NotificationSummaryView(BaseAPIView):
+
+    def get(self, request):
+        latest_id = Notification.objects.filter(user=request.user).aggregate(latest_id=Max('id'))['latest_id']
+        return create_success_response(data={
+            'unread_count': NotificationService.unread_count(request.user),
+            'latest_id': latest_id or 0,
+        })
+
+
+class NotificationMarkReadView(BaseAPIView):
+
+    # Marks the listed notification ids as read, or every unread notification when ids is omitted
+    def post(self, request):
+        ids = request.data.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+                return create_error_response("ids must be a list of notification ids", status_code=status.HTTP_400_BAD_REQUEST)
+
+        updated = NotificationService.mark_read(request.user, ids)
+        return create_success_response(data={'updated': updated})
+
 
 class NotificationUpdateView(BaseAPIView, generics.UpdateAPIView):
     serializer_class = NotificationSerializer
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user)
\ No newline at end of file
+        return Notification.objects.filter(user=self.request.user)
+
+
+class NotificationStreamTicketView(BaseAPIView):
+
+    # Issues a short-lived ticket for opening the stream, or 404 when clients should poll instead
+    def post(self, request):
+        if not stream_available(request):
+            return create_error_response("Notification stream is not enabled", status_code=status.HTTP_404_NOT_FOUND)
+        return create_success_response(data={
+            'ticket': issue_stream_ticket(request.user.id),
+            'expires_in': get_stream_settings()['TICKET_MAX_AGE'],
+        })
+
+
+class NotificationStreamView(View):
+    """Server-Sent Events stream of the user's new notifications.
+
+    Only served when NOTIFICATION_STREAM['ENABLED'] is set and the app runs
+    under an ASGI server; otherwise clients keep polling. Browsers'
+    EventSource cannot send headers, so besides the Authorization header the
+    stream accepts ?ticket= from notifications/stream/ticket/, which expires
+    within a minute. Reconnects resume from the Last-Event-ID header.
+    """
+
+    async def get(self, request):
+        if not stream_available(request):
+            return JsonResponse({
+                'success': False,
+                'message': 'Notification stream is not enabled',
+                'timestamp': timezone.now().isoformat()
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        user = await self.authenticate(request)
+        if user is None:
+            return JsonResponse({
+                'success': False,
+                'message': 'Authentication credentials were not provided or are invalid.',
+                'timestamp': timezone.now().isoformat()
+            }, status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            last_event_id = int(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id') or 0)
+        except ValueError:
+            last_event_id = 0
+
+        config = get_stream_settings()
+        broker = get_broker()
+        subscription = broker.subscribe(user.id, maxsize=config['QUEUE_SIZE'])
+
+        async def stream():
+            try:
+                async for frame in notification_stream(
+                    subscription,
+                    last_event_id=last_event_id,
+                    heartbeat_interval=config['HEARTBEAT_INTERVAL'],
+                    replay_batch_size=config['REPLAY_BATCH_SIZE'],
+                ):
+                    yield frame
+            finally:
+                broker.unsubscribe(subscription)
+
+        response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def authenticate(self, request):
+        authentication = JWTAuthentication()
+        header = authentication.get_header(request)
+        raw_token = authentication.get_raw_token(header) if header else None
+        if raw_token:
+            try:
+                validated_token = authentication.get_validated_token(raw_token)
+                return await sync_to_async(authentication.get_user)(validated_token)
+            except (InvalidToken, AuthenticationFailed, TokenError):
+                return None
+
+        user_id = read_stream_ticket(request.GET.get('ticket', ''))
+        if user_id is None:
+            return None
+        return await sync_to_async(
+            lambda: User.objects.filter(pk=user_id, is_active=True).first()
+        )()
\ No newline at end of file
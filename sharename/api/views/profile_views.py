@@ -6,10 +6,17 @@ from api.base_views import BaseAPIView
 
 class BaseProfileView(BaseAPIView):
     def get_object(self):
-        profile, created = Profile.objects.get_or_create(
-            user=self.request.user,
-            defaults=self._get_default_profile_data()
-        )
+        user = self.request.user
+        try:
+            profile = Profile.objects.get(user=user)
+        except Profile.DoesNotExist:
+            # Profiles are created with their user, so a missing one may mean the user is gone;
+            # reloading it fails authentication then, before a profile is written for it
+            user.refresh_from_db()
+            profile, created = Profile.objects.get_or_create(user=user, defaults=self._get_default_profile_data())
+        # Saves rebuild search text from the owner's email; writes authenticate with the stored row,
+        # so reuse it rather than loading it again
+        profile.user = user
         return profile
 
     def _get_default_profile_data(self):
@@ -1,32 +1,43 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from django.db.models import Q
 
 from api.models import Profile
 from api.serializers import UserSearchResultSerializer, PublicProfileSerializer
 from api.response_serializers import create_success_response, create_error_response
+from api.search import clamp_limit, search_profiles
+from api.prefix_index import get_prefix_index
 
 
 class UserSearchView(generics.ListAPIView):
     serializer_class = UserSearchResultSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    # Ranked matches from the profile search index, capped by ?limit= (default 20, at most 100)
     def get_queryset(self):
         query = self.request.query_params.get('q', '').strip()
 
         if not query:
             return Profile.objects.none()
 
-        return Profile.objects.filter(
-            is_public_profile=True
-        ).filter(
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(user__email__istartswith=query) |
-            Q(company_name__icontains=query)
-        ).select_related('user')
+        return search_profiles(query, limit=clamp_limit(self.request.query_params.get('limit')))
 
+    # ?mode=prefix serves typeahead from the in-memory prefix index without touching the database,
+    # falling back to the search index until the prefix index has been built
     def list(self, request, *args, **kwargs):
+        index = get_prefix_index()
+        results = None
+        if request.query_params.get('mode') == 'prefix' and index is not None:
+            results = index.search(
+                request.query_params.get('q', '').strip(),
+                limit=clamp_limit(request.query_params.get('limit'))
+            )
+        if results is not None:
+            return create_success_response([
+                {**result, 'profile_picture': request.build_absolute_uri(result['profile_picture'])
+                 if result['profile_picture'] else None}
+                for result in results
+            ])
+
         queryset = self.get_queryset()
         serializer = self.get_serializer(queryset, many=True)
         return create_success_response(serializer.data)
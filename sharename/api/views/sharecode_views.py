@@ -1,11 +1,19 @@
+import csv
+import io
+import json
+
+from django.http import StreamingHttpResponse
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.exceptions import NotFound, PermissionDenied
 from django.shortcuts import get_object_or_404
 
-from api.models import Context, ShareCode, Audit, ConsentRequest
-from api.serializers import ShareCodeSerializer
+from api.models import Context, ShareCode, ConsentRequest
+from api.serializers import ShareCodeSerializer, BulkShareCodeSerializer
 from api.services import NotificationService, ShareCodeService
+from api.caching import ShareCodeCache
+from api.code_filter import code_might_exist
+from api.audit_pipeline import record_redemption
 from api.response_serializers import create_success_response, create_error_response
 
 
@@ -24,13 +32,68 @@ class ShareCodeCreate(generics.CreateAPIView):
         return create_success_response(serializer.data, status_code=201)
 
 
+class BulkShareCodeCreate(generics.GenericAPIView):
+    serializer_class = BulkShareCodeSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    # Mints many codes for one context in a single transaction and streams them back as JSON lines or CSV
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return create_error_response("Validation failed", errors=serializer.errors, status_code=400)
+
+        data = serializer.validated_data
+        context = get_object_or_404(Context, id=data['context_id'], user=request.user)
+        share_codes = ShareCodeService.bulk_create_share_codes(
+            context,
+            data['count'],
+            expires_at=data.get('expires_at_list') or data.get('expires_at'),
+        )
+
+        if data['format'] == 'csv':
+            response = StreamingHttpResponse(self.csv_rows(share_codes), content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="sharecodes-{context.id}.csv"'
+        else:
+            response = StreamingHttpResponse(self.json_lines(share_codes), content_type='application/x-ndjson')
+        response['X-Share-Code-Count'] = str(len(share_codes))
+        response.status_code = status.HTTP_201_CREATED
+        return response
+
+    @staticmethod
+    def json_lines(share_codes):
+        for share_code in share_codes:
+            yield json.dumps({
+                'code': share_code.code,
+                'expires_at': share_code.expires_at.isoformat() if share_code.expires_at else None,
+            }) + '\n'
+
+    @staticmethod
+    def csv_rows(share_codes, chunk_size=1000):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['code', 'expires_at'])
+        for index, share_code in enumerate(share_codes, 1):
+            writer.writerow([share_code.code, share_code.expires_at.isoformat() if share_code.expires_at else ''])
+            if index % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+
 class RedeemCode(generics.GenericAPIView):
     permission_classes = [permissions.AllowAny]
+    # Redeeming records an audit and a notification for the user, so the token's user is loaded and
+    # checked even though this is a GET
+    load_user = True
 
+    # Codes the filter has never seen are rejected before touching the cache or database
     def get(self, request, code):
-        try:
-            share_code = ShareCode.objects.select_related("context").get(code=code)
-        except ShareCode.DoesNotExist:
+        if not code_might_exist(code):
+            raise NotFound("Code not found")
+
+        share_code = ShareCodeCache.get(code)
+        if share_code is None:
             raise NotFound("Code not found")
 
         if not share_code.valid():
@@ -42,13 +105,12 @@ class RedeemCode(generics.GenericAPIView):
             if not request.user.is_authenticated:
                 raise PermissionDenied("Authentication required for consent-gate contexts")
 
-            try:
-                ConsentRequest.objects.get(
-                    context=context,
-                    requester=request.user,
-                    status='approved'
-                )
-            except ConsentRequest.DoesNotExist:
+            has_consent = ConsentRequest.objects.filter(
+                context=context,
+                requester=request.user,
+                status='approved'
+            ).exists()
+            if not has_consent:
                 return create_error_response(
                     message="This context requires consent. You need to request access first.",
                     errors={
@@ -59,10 +121,10 @@ class RedeemCode(generics.GenericAPIView):
                     status_code=403
                 )
 
-        requester_info = request.user.email if request.user.is_authenticated else request.headers.get("X-Client", "anon")
-        Audit.objects.create(
-            share_code=share_code, requester=requester_info
-        )
+        if request.user.is_authenticated:
+            record_redemption(share_code, request.user.email, requester_user=request.user)
+        else:
+            record_redemption(share_code, request.headers.get("X-Client", "anon"))
 
         if request.user.is_authenticated:
             NotificationService.create_redemption_notification(context, request.user.email)
@@ -104,10 +166,7 @@ class RedeemByContextIdView(generics.GenericAPIView):
 
         share_code = ShareCodeService.get_or_create_share_code(context)
 
-        Audit.objects.create(
-            share_code=share_code,
-            requester=request.user.email
-        )
+        record_redemption(share_code, request.user.email, requester_user=request.user)
 
         NotificationService.create_redemption_notification(context, request.user.email)
 
@@ -0,0 +1,56 @@
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.signals import request_started
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'ENABLED': False,
+}
+
+
+# The WSGI and ASGI entry points turn warm-up on through SHARENAME_WARMUP; management
+# commands and cron jobs leave it off and only load what they use
+def get_warmup_settings():
+    config = {**DEFAULTS, **getattr(settings, 'API_WARMUP', {})}
+    if 'SHARENAME_WARMUP' in os.environ:
+        config['ENABLED'] = os.environ['SHARENAME_WARMUP'] == '1'
+    return config
+
+
+# Loads the validators' lazily imported dependencies so the first request does not pay for them.
+# Nothing here touches the database, which is not safe to query from AppConfig.ready; the share
+# code filter's worker thread is started once the worker receives its first request
+def warm_up():
+    started = time.perf_counter()
+
+    import phonenumbers
+    from email_validator import validate_email
+    from nameparser import HumanName
+    from .countries import get_country_index
+
+    # phonenumbers loads region metadata on first use of each region
+    phonenumbers.is_valid_number(phonenumbers.parse('+14155550100', None))
+    HumanName('Warm Up')
+    validate_email('warm-up@example.com', check_deliverability=False)
+    get_country_index()
+    request_started.connect(build_code_filter_in_background, dispatch_uid=CODE_FILTER_DISPATCH_UID)
+
+    elapsed = time.perf_counter() - started
+    logger.info('Warmed up validator dependencies in %.0f ms', elapsed * 1000)
+    return elapsed
+
+
+CODE_FILTER_DISPATCH_UID = 'api.warmup.build_code_filter'
+
+
+# Runs once per worker process, so a forked worker builds its own filter
+def build_code_filter_in_background(sender=None, **kwargs):
+    from .code_filter import start_code_filter
+
+    request_started.disconnect(dispatch_uid=CODE_FILTER_DISPATCH_UID)
+    start_code_filter()
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sharename.settings')
+# Web workers load validator dependencies at boot rather than on their first request
+os.environ.setdefault('SHARENAME_WARMUP', '1')
 
 application = get_asgi_application()
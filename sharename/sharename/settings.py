@@ -37,7 +37,7 @@ INSTALLED_APPS = [
 ]
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.StatelessJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
@@ -91,6 +91,33 @@ DATABASES = {
 
 
 
+# New hashes use the first hasher; put api.hashers.TunedArgon2PasswordHasher first instead to hash
+# with argon2 (needs argon2-cffi). Hashes made by the others still verify and are replaced at login
+PASSWORD_HASHERS = [
+    'api.hashers.TunedScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'api.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+# scrypt cost tuned to about 105 ms and 32 MiB per hash, ~9.5 logins/s per core; see api/hashers.py
+PASSWORD_HASHING = {
+    'SCRYPT_WORK_FACTOR': 2 ** 15,
+    'SCRYPT_BLOCK_SIZE': 8,
+    'SCRYPT_PARALLELISM': 1,
+    'ARGON2_TIME_COST': 2,
+    'ARGON2_MEMORY_COST': 102400,
+    'ARGON2_PARALLELISM': 8,
+    'WORKERS': 2,
+    'QUEUE_SIZE': 32,
+    'TIMEOUT': 10,
+}
+
+AUTHENTICATION_BACKENDS = [
+    'api.auth_backends.BoundedModelBackend',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -148,8 +175,98 @@ CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_ALL_ORIGINS = True
 
 
+# Redemption reads are served entirely from the cache; invalidations reach other workers only
+# through a shared backend, so with the default per-process cache a revocation can take this long
+SHARECODE_CACHE_TIMEOUT = 300
+
+# Redemption audits are written in batches; audits buffered by other workers reach redemption lists
+# normally within FLUSH_INTERVAL seconds, so set ENABLED to False where those lists must be exact
+AUDIT_PIPELINE = {
+    'ENABLED': True,
+    'BACKGROUND': True,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,
+    'SPOOL_DIR': BASE_DIR / 'audit_spool',
+    'FSYNC': False,
+}
+
+SHARE_CODE_POOL = {
+    'ENABLED': True,
+    'BATCH_SIZE': 1000,
+    'LOW_WATER': 200,
+    'BACKGROUND': True,
+}
+
+SHARE_CODE_BULK_MAX = 100000
+
+SHARECODE_FILTER = {
+    'ENABLED': True,
+    'ERROR_RATE': 0.01,
+    'MIN_CAPACITY': 100000,
+    'REBUILD_INTERVAL': 3600,
+    'CATCH_UP_INTERVAL': 1.0,
+    'CATCH_UP_OVERLAP': 500,
+    'BACKGROUND': True,
+}
+
+EXPIRY_SCHEDULER = {
+    'ENABLED': True,
+    'HORIZON': 3600,
+    'RETRY_DELAY': 5,
+    'MAX_BACKOFF': 300,
+}
+
+EXPIRY_LOCK = {
+    'SHARDS': 4,
+    'LEASE_TTL': 60,
+    'CHANGE_OVERLAP': 300,
+}
+
+PROFILE_PREFIX_INDEX = {
+    'ENABLED': True,
+    'REFRESH_INTERVAL': 1.0,
+    'REFRESH_OVERLAP': 60,
+    'REBUILD_INTERVAL': 300,
+    'BACKGROUND': True,
+}
+
+EMAIL_DELIVERABILITY = {
+    'ENABLED': True,
+    'BACKGROUND': True,
+    'TIMEOUT': 5,
+    'CACHE_TTL': 86400,
+    'UNKNOWN_TTL': 300,
+    'RESOLVER': None,
+}
+
+API_WARMUP = {
+    'ENABLED': False,
+}
+
+# Server-sent notification events need an ASGI server (uvicorn, daphne) serving sharename.asgi; under
+# runserver or gunicorn's WSGI workers the stream stays off and clients poll
+NOTIFICATION_STREAM = {
+    'ENABLED': False,
+    'BROKER': 'api.events.DatabaseBroker',
+    'HEARTBEAT_INTERVAL': 15,
+    'QUEUE_SIZE': 100,
+    'REPLAY_BATCH_SIZE': 100,
+    'POLL_INTERVAL': 2,
+    'POLL_OVERLAP': 60,
+    'TICKET_MAX_AGE': 60,
+}
+
+
 import sys
 if 'test' in sys.argv:
+    AUDIT_PIPELINE['ENABLED'] = False
+    SHARE_CODE_POOL['BACKGROUND'] = False
+    SHARECODE_FILTER['BACKGROUND'] = False
+    PROFILE_PREFIX_INDEX['BACKGROUND'] = False
+    EXPIRY_SCHEDULER['ENABLED'] = False
+    EMAIL_DELIVERABILITY['ENABLED'] = False
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
     LOGGING = {
         'version': 1,
         'disable_existing_loggers': False,